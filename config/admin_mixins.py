@@ -0,0 +1,35 @@
+from django.contrib import admin
+
+
+class AnnotatedListMixin:
+    """
+    ModelAdmin mixin that computes changelist aggregates in the list query.
+
+    Declare ``list_annotations`` as {name: expression}; every expression is
+    added to ``get_queryset`` with ``annotate()``, so a column built with
+    ``annotated_column`` reads its value from the row instead of running a
+    COUNT/SUM (or a related-object fetch) per row, and sorts in the database.
+    """
+
+    list_annotations = {}
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.list_annotations:
+            queryset = queryset.annotate(**self.list_annotations)
+        return queryset
+
+
+def annotated_column(name, description, render=None):
+    """
+    Build a sortable list_display column for the ``name`` annotation.
+
+    ``render`` optionally formats the value; it is called with (obj, value).
+    """
+
+    @admin.display(description=description, ordering=name)
+    def column(self, obj):
+        value = getattr(obj, name)
+        return render(obj, value) if render else value
+
+    return column
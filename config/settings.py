@@ -18,6 +18,7 @@ from datetime import timedelta
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
 from oscar.defaults import *
 
 env = environ.Env(DEBUG=(bool, False))
@@ -167,6 +168,9 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+# Serve with an ASGI server (e.g. ``uvicorn config.asgi:application``) for
+# live location pages: the change feed holds a connection per open page,
+# which under WSGI would be a worker thread each, so it's only offered there.
 
 
 # Database
@@ -205,7 +209,8 @@ OSCAR_DEFAULT_CURRENCY = "USD"
 OSCAR_USER_MODEL = "auth.User"
 
 WHOOSH_INDEX_PATH = os.path.join(BASE_DIR, "whoosh_index")
-HAYSTACK_SIGNAL_PROCESSOR = "haystack.signals.RealtimeSignalProcessor"
+# Index writes are queued and applied by pantry.tasks.process_search_index_queue
+HAYSTACK_SIGNAL_PROCESSOR = "pantry.search_queue.QueuedSignalProcessor"
 HAYSTACK_CONNECTIONS = {
     "default": {
         "ENGINE": "haystack.backends.whoosh_backend.WhooshEngine",
@@ -279,6 +284,36 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("REDIS_CACHE_URL", default="redis://localhost:6379/1"),
+    }
+}
+
+# Pub/sub transport for the live pantry change feed (pantry.change_feed)
+PANTRY_CHANGE_FEED = {
+    "BACKEND": "pantry.change_feed.RedisChangeFeed",
+    "location": env("REDIS_PUBSUB_URL", default="redis://localhost:6379/2"),
+}
+
+# Minutes without readings after which a storage unit's open temperature
+# excursion is closed (pantry.telemetry). Keep it well above the longest
+# interval at which sensors report.
+PANTRY_SENSOR_SILENCE_MINUTES = env(
+    "PANTRY_SENSOR_SILENCE_MINUTES", cast=int, default=60
+)
+
+if "pytest" in sys.modules or "test" in sys.argv:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    PANTRY_CHANGE_FEED = {"BACKEND": "pantry.change_feed.LocalChangeFeed"}
+    HAYSTACK_CONNECTIONS = {
+        "default": {
+            "ENGINE": "haystack.backends.whoosh_backend.WhooshEngine",
+            "STORAGE": "ram",
+        },
+    }
+
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
 
@@ -292,4 +327,40 @@ CELERY_BEAT_SCHEDULE = {
         "task": "github_feed.tasks.sync_all_github_data",
         "schedule": timedelta(hours=1),
     },
+    "send-pantry-alerts-every-hour": {
+        "task": "pantry.tasks.send_pantry_alert_digests",
+        "schedule": timedelta(hours=1),
+    },
+    "forecast-pantry-consumption-every-day": {
+        "task": "pantry.tasks.forecast_pantry_consumption",
+        "schedule": timedelta(days=1),
+    },
+    "refresh-expired-stock-summaries-after-midnight": {
+        "task": "pantry.tasks.refresh_expired_summaries",
+        "schedule": crontab(hour=0, minute=5),
+    },
+    "snapshot-stock-ledger-every-day": {
+        "task": "pantry.tasks.snapshot_stock_ledger",
+        "schedule": timedelta(days=1),
+    },
+    "process-search-index-queue": {
+        "task": "pantry.tasks.process_search_index_queue",
+        "schedule": timedelta(seconds=15),
+    },
+    "rollup-temperatures-every-minute": {
+        "task": "pantry.tasks.rollup_temperature_minutes",
+        "schedule": timedelta(minutes=1),
+    },
+    "rollup-temperatures-every-hour": {
+        "task": "pantry.tasks.rollup_temperature_hours",
+        "schedule": timedelta(hours=1),
+    },
+    "prune-temperature-telemetry-every-day": {
+        "task": "pantry.tasks.prune_temperature_telemetry",
+        "schedule": timedelta(days=1),
+    },
+    "match-ingredients-to-pantry-every-day": {
+        "task": "meals.tasks.match_ingredients_to_pantry",
+        "schedule": timedelta(days=1),
+    },
 }
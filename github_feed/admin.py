@@ -1,19 +1,21 @@
 # github_feed/admin.py
 from django.contrib import admin
+from django.db.models import F
+
+from config.admin_mixins import AnnotatedListMixin, annotated_column
 
 from .models import Commit, Repository
 
 
 # Optional: Customize the admin display for better readability
-class CommitAdmin(admin.ModelAdmin):
+class CommitAdmin(AnnotatedListMixin, admin.ModelAdmin):
     list_display = ("sha", "repository_name", "author_name", "date")
     list_filter = ("repository__name", "date")
     search_fields = ("message", "author_name", "sha")
+    # Joined into the list query rather than fetching each commit's repository
+    list_annotations = {"repository_name": F("repository__name")}
 
-    def repository_name(self, obj):
-        return obj.repository.name
-
-    repository_name.admin_order_field = "repository__name"
+    repository_name = annotated_column("repository_name", "Repository name")
 
 
 class RepositoryAdmin(admin.ModelAdmin):
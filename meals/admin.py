@@ -1,7 +1,24 @@
 from django.contrib import admin
 
-from .models import Ingredient, MealLog, Recipe
+from .models import Ingredient, IngredientMatch, MealChoiceRollup, MealLog, Recipe
 
 admin.site.register(Recipe)
 admin.site.register(MealLog)
 admin.site.register(Ingredient)
+
+
+@admin.register(IngredientMatch)
+class IngredientMatchAdmin(admin.ModelAdmin):
+    list_display = ("ingredient", "pantry_item", "score", "source")
+    list_filter = ("source",)
+    list_select_related = ("ingredient", "pantry_item")
+    search_fields = ("ingredient__name", "pantry_item__name")
+    raw_id_fields = ("ingredient", "pantry_item")
+
+
+@admin.register(MealChoiceRollup)
+class MealChoiceRollupAdmin(admin.ModelAdmin):
+    list_display = ("recipe", "user", "period", "period_start", "count")
+    list_filter = ("period",)
+    list_select_related = ("recipe", "user")
+    date_hierarchy = "period_start"
@@ -0,0 +1,72 @@
+"""
+Which Ingredients the pantry can currently supply.
+
+Built from IngredientMatch rows joined to StockSummary in one query, then
+cached for everyone until stock or matches change. Each cached map has a
+``token``, which per-user caches derived from it (such as the cookable
+recipes in meals.suggestions) store to detect that it was rebuilt.
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import IngredientMatch
+
+PANTRY_INGREDIENTS_KEY = "meals:pantry-ingredients"
+# Safety net only: stock and match changes invalidate the cache directly
+PANTRY_INGREDIENTS_SECONDS = 60 * 60
+
+
+def compute_pantry_ingredients(today):
+    """
+    Map each Ingredient id the pantry has to its soonest expiry date.
+
+    An ingredient is available when a matched pantry item has stock on
+    hand that hasn't expired (the summary's fresh_quantity); its date is
+    None when none of that stock expires. Summaries not yet refreshed past
+    an expiry before ``today`` are left out rather than counted as fresh.
+    """
+    rows = (
+        IngredientMatch.objects.exclude(source=IngredientMatch.REJECTED)
+        .filter(pantry_item__stock_summary__fresh_quantity__gt=0)
+        .filter(
+            Q(pantry_item__stock_summary__soonest_expiry__isnull=True)
+            | Q(pantry_item__stock_summary__soonest_expiry__gte=today)
+        )
+        .values_list("ingredient_id", "pantry_item__stock_summary__soonest_expiry")
+    )
+    available = {}
+    for ingredient_id, expiry in rows:
+        current = available.get(ingredient_id)
+        if ingredient_id not in available or (
+            expiry is not None and (current is None or expiry < current)
+        ):
+            available[ingredient_id] = expiry
+    return available
+
+
+def get_pantry_ingredients(today=None):
+    """
+    Return ``{"token", "date", "ingredients"}`` for today, from the cache
+    when possible; ``ingredients`` is compute_pantry_ingredients().
+    """
+    today = today or timezone.now().date()
+    cached = cache.get(PANTRY_INGREDIENTS_KEY)
+    if cached is not None and cached["date"] == today:
+        return cached
+    pantry = {
+        "token": uuid.uuid4().hex,
+        "date": today,
+        "ingredients": compute_pantry_ingredients(today),
+    }
+    cache.set(PANTRY_INGREDIENTS_KEY, pantry, PANTRY_INGREDIENTS_SECONDS)
+    return pantry
+
+
+def invalidate_pantry_ingredients():
+    """Drop the cached map once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(PANTRY_INGREDIENTS_KEY))
@@ -3,16 +3,52 @@ from django import forms
 from .models import Ingredient, Recipe
 
 
+class SelectedOptionsWidget(forms.SelectMultiple):
+    """
+    SelectMultiple that renders an <option> for each selected value only,
+    so the size of the page doesn't depend on the size of the catalogue.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        ids = [pk for pk in value if str(pk).isdigit()]
+        self.choices = [
+            (obj.pk, str(obj)) for obj in choices.queryset.filter(pk__in=ids)
+        ]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
+class IngredientChoiceField(forms.ModelMultipleChoiceField):
+    """
+    Ingredient picker that never loads the whole Ingredient table.
+
+    Validation looks up only the submitted ids, in one query, and the
+    widget renders only the selected ingredients; others are fetched on
+    demand by the ingredient_search typeahead.
+    """
+
+    widget = SelectedOptionsWidget
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Ingredient.objects.order_by("name"))
+        super().__init__(**kwargs)
+
+
 class RecipeForm(forms.ModelForm):
     """
     Form for creating and updating Recipe instances.
-    The ingredients field is a ManyToManyField, which is automatically handled by
-    ModelForm using a ModelMultipleChoiceField.
+    The ingredients field is a ManyToManyField, picked with a typeahead
+    dual-listbox (see IngredientChoiceField).
     """
 
-    ingredients = forms.ModelMultipleChoiceField(
-        queryset=Ingredient.objects.all().order_by("name"),
+    ingredients = IngredientChoiceField(
         required=False,
+        widget=SelectedOptionsWidget(
+            attrs={"id": "selected-ingredients", "size": 10, "style": "width: 100%"}
+        ),
     )
 
     class Meta:
@@ -0,0 +1,123 @@
+"""
+Meal history: recording choices and reading them back from rollups.
+
+record_meal_choice writes the MealLog row, Recipe.last_chosen and the
+day/week MealChoiceRollup counters in one transaction. The history
+queries below read the rollups, one row per user, recipe and day (or
+week) cooked, rather than scanning every MealLog row.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import MealChoiceRollup, MealLog, Recipe
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def period_starts(day):
+    return {MealChoiceRollup.DAY: day, MealChoiceRollup.WEEK: week_start(day)}
+
+
+@transaction.atomic
+def record_meal_choice(user, recipe, chosen_date=None):
+    """Log that ``user`` chose ``recipe`` and count it in the rollups."""
+    chosen_date = chosen_date or timezone.now().date()
+    log = MealLog.objects.create(user=user, recipe=recipe, chosen_date=chosen_date)
+    Recipe.objects.filter(pk=recipe.pk).filter(
+        Q(last_chosen__isnull=True) | Q(last_chosen__lt=chosen_date)
+    ).update(last_chosen=chosen_date)
+    if recipe.last_chosen is None or recipe.last_chosen < chosen_date:
+        recipe.last_chosen = chosen_date
+
+    starts = period_starts(chosen_date)
+    MealChoiceRollup.objects.bulk_create(
+        [
+            MealChoiceRollup(
+                user=user, recipe=recipe, period=period, period_start=start
+            )
+            for period, start in starts.items()
+        ],
+        ignore_conflicts=True,
+    )
+    MealChoiceRollup.objects.filter(user=user, recipe=recipe).filter(
+        Q(period=MealChoiceRollup.DAY, period_start=starts[MealChoiceRollup.DAY])
+        | Q(period=MealChoiceRollup.WEEK, period_start=starts[MealChoiceRollup.WEEK])
+    ).update(count=F("count") + 1)
+    return log
+
+
+def times_chosen(recipe):
+    """Total times a recipe was chosen, from its weekly rollups."""
+    return (
+        MealChoiceRollup.objects.filter(
+            recipe=recipe, period=MealChoiceRollup.WEEK
+        ).aggregate(total=Sum("count"))["total"]
+        or 0
+    )
+
+
+def most_cooked(user, since=None, limit=10):
+    """
+    The user's most chosen recipes, as ``{"recipe_id", "title", "times"}``
+    dicts, counting choices on or after ``since`` (or all of them).
+    """
+    rollups = MealChoiceRollup.objects.filter(user=user)
+    if since is None:
+        rollups = rollups.filter(period=MealChoiceRollup.WEEK)
+    else:
+        rollups = rollups.filter(period=MealChoiceRollup.DAY, period_start__gte=since)
+    return list(
+        rollups.values("recipe_id", title=F("recipe__title"))
+        .annotate(times=Sum("count"))
+        .order_by("-times", "title")[:limit]
+    )
+
+
+def cooking_streaks(user, today=None):
+    """
+    The user's cooking streaks, in consecutive days with a meal chosen.
+
+    Returns ``{"current", "longest", "last_cooked"}``; the current streak
+    is still running if it ended today or yesterday.
+    """
+    today = today or timezone.now().date()
+    days = (
+        MealChoiceRollup.objects.filter(user=user, period=MealChoiceRollup.DAY)
+        .values_list("period_start", flat=True)
+        .distinct()
+        .order_by("period_start")
+    )
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    current = run if previous and (today - previous).days <= 1 else 0
+    return {"current": current, "longest": longest, "last_cooked": previous}
+
+
+def not_cooked_since(user, days, today=None):
+    """
+    The user's recipes not chosen in the last ``days`` days, least recently
+    cooked first (never-cooked ones leading), each with ``last_cooked``.
+    """
+    today = today or timezone.now().date()
+    cutoff = today - timedelta(days=days)
+    return (
+        Recipe.objects.filter(user=user)
+        .annotate(
+            last_cooked=Max(
+                "choice_rollups__period_start",
+                filter=Q(choice_rollups__period=MealChoiceRollup.DAY),
+            )
+        )
+        .filter(Q(last_cooked__isnull=True) | Q(last_cooked__lte=cutoff))
+        .order_by(F("last_cooked").asc(nulls_first=True), "title")
+    )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from meals.matching import match_ingredients
+
+
+class Command(BaseCommand):
+    help = "Match recipe ingredients to pantry items by name."
+
+    def handle(self, *args, **options):
+        created, deleted = match_ingredients()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {created} and removed {deleted} automatic matches."
+            )
+        )
@@ -0,0 +1,143 @@
+"""
+Bulk matching of meals Ingredients to pantry PantryItems.
+
+Names are normalized to token sets (case, punctuation, simple plurals and
+a few descriptive words dropped). An ingredient matches a pantry item when
+all of its tokens appear in the item's name ("eggs" matches "Free range
+eggs"), or when their token sets overlap by at least MATCH_THRESHOLD
+(Jaccard). Candidates come from an inverted token index, so each
+ingredient is only compared with items sharing a word with it.
+
+Matching runs as a job (the match_ingredients_to_pantry task, or the
+match_ingredients command), never per request; pages read the resulting
+IngredientMatch rows through meals.availability.
+"""
+
+import re
+from collections import defaultdict
+
+from django.db import transaction
+
+from pantry.models import PantryItem
+
+from .availability import invalidate_pantry_ingredients
+from .models import Ingredient, IngredientMatch
+
+MATCH_THRESHOLD = 0.6
+
+STOP_WORDS = frozenset(
+    [
+        "a",
+        "and",
+        "chopped",
+        "fresh",
+        "large",
+        "of",
+        "organic",
+        "small",
+        "the",
+    ]
+)
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def singular(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def name_tokens(name):
+    """Normalized word set of a name: "Fresh Tomatoes" -> {"tomato"}."""
+    return frozenset(
+        singular(word)
+        for word in _WORD.findall(name.casefold())
+        if word not in STOP_WORDS
+    )
+
+
+def match_score(ingredient_tokens, item_tokens):
+    """
+    Return the Jaccard similarity of two token sets, or None if they don't
+    match. Items containing every ingredient token always match.
+    """
+    overlap = len(ingredient_tokens & item_tokens)
+    if not overlap:
+        return None
+    score = overlap / len(ingredient_tokens | item_tokens)
+    if overlap == len(ingredient_tokens) or score >= MATCH_THRESHOLD:
+        return score
+    return None
+
+
+def find_matches(ingredients, items):
+    """
+    Match (id, name) pairs of ingredients against (id, name) pantry items.
+
+    Returns {(ingredient_id, item_id): score}.
+    """
+    item_tokens = {}
+    index = defaultdict(set)
+    for item_id, name in items:
+        tokens = name_tokens(name)
+        item_tokens[item_id] = tokens
+        for token in tokens:
+            index[token].add(item_id)
+
+    matches = {}
+    for ingredient_id, name in ingredients:
+        tokens = name_tokens(name)
+        candidates = set().union(*(index.get(token, ()) for token in tokens))
+        for item_id in candidates:
+            score = match_score(tokens, item_tokens[item_id])
+            if score is not None:
+                matches[ingredient_id, item_id] = score
+    return matches
+
+
+def match_ingredients():
+    """
+    Rebuild the AUTO IngredientMatch rows for every ingredient and item.
+
+    MANUAL and REJECTED rows are kept as they are, and take precedence over
+    automatic matches for the same pair. Returns (created, deleted).
+    """
+    matches = find_matches(
+        Ingredient.objects.values_list("pk", "name").iterator(),
+        PantryItem.objects.values_list("pk", "name").iterator(),
+    )
+    existing = {
+        (ingredient_id, item_id): (pk, source)
+        for pk, ingredient_id, item_id, source in IngredientMatch.objects.values_list(
+            "pk", "ingredient_id", "pantry_item_id", "source"
+        ).iterator()
+    }
+    stale = [
+        pk
+        for pair, (pk, source) in existing.items()
+        if source == IngredientMatch.AUTO and pair not in matches
+    ]
+    new = [
+        IngredientMatch(
+            ingredient_id=ingredient_id,
+            pantry_item_id=item_id,
+            score=score,
+            source=IngredientMatch.AUTO,
+        )
+        for (ingredient_id, item_id), score in matches.items()
+        if (ingredient_id, item_id) not in existing
+    ]
+
+    with transaction.atomic():
+        deleted, _ = IngredientMatch.objects.filter(pk__in=stale).delete()
+        created = IngredientMatch.objects.bulk_create(
+            new, batch_size=1000, ignore_conflicts=True
+        )
+        if stale or new:
+            invalidate_pantry_ingredients()
+    return len(created), deleted
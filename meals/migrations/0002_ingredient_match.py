@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0001_initial"),
+        ("pantry", "0012_search_index_update"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngredientMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(default=1.0)),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("auto", "Automatic"),
+                            ("manual", "Manual"),
+                            ("rejected", "Rejected"),
+                        ],
+                        default="auto",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pantry_matches",
+                        to="meals.ingredient",
+                    ),
+                ),
+                (
+                    "pantry_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ingredient_matches",
+                        to="pantry.pantryitem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("ingredient", "pantry_item"),
+                        name="unique_ingredient_match",
+                    )
+                ],
+            },
+        ),
+    ]
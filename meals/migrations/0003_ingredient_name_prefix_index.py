@@ -0,0 +1,34 @@
+from django.db import migrations
+
+INDEX_NAME = "meals_ingredient_name_prefix_idx"
+
+
+def add_prefix_index(apps, schema_editor):
+    """
+    PostgreSQL only: case-insensitive prefix index for name__istartswith,
+    which compiles to UPPER(name::text) LIKE UPPER(...). The pattern_ops
+    opclass lets LIKE use it under any collation.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX {INDEX_NAME} ON meals_ingredient"
+        " (UPPER(name::text) text_pattern_ops)"
+    )
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0002_ingredient_match"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_index, drop_prefix_index),
+    ]
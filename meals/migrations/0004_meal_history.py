@@ -0,0 +1,86 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:45
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0003_ingredient_name_prefix_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MealChoiceRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "Day"), ("week", "Week")], max_length=10
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="meallog",
+            name="chosen_date",
+            field=models.DateField(default=datetime.date.today),
+        ),
+        migrations.AddIndex(
+            model_name="meallog",
+            index=models.Index(
+                fields=["user", "chosen_date"], name="meallog_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="meallog",
+            index=models.Index(
+                fields=["recipe", "chosen_date"], name="meallog_recipe_date_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mealchoicerollup",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="choice_rollups",
+                to="meals.recipe",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mealchoicerollup",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mealchoicerollup",
+            index=models.Index(
+                fields=["user", "period", "period_start"],
+                name="meal_rollup_user_period_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="mealchoicerollup",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe", "period", "period_start"),
+                name="unique_meal_choice_rollup",
+            ),
+        ),
+    ]
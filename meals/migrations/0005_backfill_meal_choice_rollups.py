@@ -0,0 +1,51 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build MealChoiceRollup counters from the existing MealLog rows."""
+    MealLog = apps.get_model("meals", "MealLog")
+    MealChoiceRollup = apps.get_model("meals", "MealChoiceRollup")
+
+    counts = Counter()
+    daily = (
+        MealLog.objects.values_list("user_id", "recipe_id", "chosen_date")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    for user_id, recipe_id, day, count in daily.iterator():
+        week = day - timedelta(days=day.weekday())
+        counts[user_id, recipe_id, "day", day] += count
+        counts[user_id, recipe_id, "week", week] += count
+
+    MealChoiceRollup.objects.bulk_create(
+        (
+            MealChoiceRollup(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                period=period,
+                period_start=start,
+                count=count,
+            )
+            for (user_id, recipe_id, period, start), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+def clear_rollups(apps, schema_editor):
+    apps.get_model("meals", "MealChoiceRollup").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0004_meal_history"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
@@ -1,3 +1,5 @@
+from datetime import date
+
 from django.contrib.auth.models import User
 from django.db import models
 
@@ -17,14 +19,107 @@ class Recipe(models.Model):
 class MealLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
-    chosen_date = models.DateField(default=models.DateField(auto_now_add=True))
+    chosen_date = models.DateField(default=date.today)
+
+    class Meta:
+        indexes = [
+            # A user's meal history, newest first
+            models.Index(fields=["user", "chosen_date"], name="meallog_user_date_idx"),
+            # A recipe's log on its detail page
+            models.Index(
+                fields=["recipe", "chosen_date"], name="meallog_recipe_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.recipe.title} chosen on {self.chosen_date}"
 
 
+class MealChoiceRollup(models.Model):
+    """
+    How many times a user chose a recipe in a day or in a week (starting
+    Monday). Maintained by meals.history.record_meal_choice alongside each
+    MealLog row; history pages read these instead of scanning the log.
+    """
+
+    DAY = "day"
+    WEEK = "week"
+    PERIODS = [
+        (DAY, "Day"),
+        (WEEK, "Week"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="choice_rollups"
+    )
+    period = models.CharField(max_length=10, choices=PERIODS)
+    period_start = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe", "period", "period_start"],
+                name="unique_meal_choice_rollup",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "period", "period_start"],
+                name="meal_rollup_user_period_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} x{self.count} in {self.period} of {self.period_start}"
+
+
 class Ingredient(models.Model):
+    """
+    A shared ingredient. On PostgreSQL, names also have a case-insensitive
+    prefix index for the recipe form's typeahead (see migration 0003).
+    """
+
     name = models.CharField(max_length=100, unique=True)
 
     def __str__(self):
         return self.name
+
+
+class IngredientMatch(models.Model):
+    """
+    Links an Ingredient to a pantry item that can stand in for it.
+
+    AUTO rows are maintained by meals.matching.match_ingredients, which
+    leaves MANUAL and REJECTED rows alone, so corrections made in the
+    admin survive re-matching.
+    """
+
+    AUTO = "auto"
+    MANUAL = "manual"
+    REJECTED = "rejected"
+    SOURCES = [
+        (AUTO, "Automatic"),
+        (MANUAL, "Manual"),
+        (REJECTED, "Rejected"),
+    ]
+
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="pantry_matches"
+    )
+    pantry_item = models.ForeignKey(
+        "pantry.PantryItem", on_delete=models.CASCADE, related_name="ingredient_matches"
+    )
+    score = models.FloatField(default=1.0)
+    source = models.CharField(max_length=10, choices=SOURCES, default=AUTO)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ingredient", "pantry_item"], name="unique_ingredient_match"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient} -> {self.pantry_item} ({self.source})"
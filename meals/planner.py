@@ -0,0 +1,237 @@
+"""
+Seven-day meal plans.
+
+Choosing the week's recipes is a small mixed-integer program, solved with
+scipy.optimize.milp over the user's cached recipe matrix:
+
+- each chosen recipe earns its stock-coverage and recency value, and
+  recipes chosen within RECENT_DAYS are heavily penalised
+- each soon-to-expire pantry ingredient earns its urgency once, if any
+  chosen recipe uses it
+- each distinct ingredient missing from the pantry costs SHOPPING_COST
+  once, however many chosen recipes need it
+
+Only the CANDIDATE_POOL recipes with the best standalone value enter the
+program, which keeps it small however many recipes a user has. The chosen
+recipes are then assigned to days with scipy.optimize.linear_sum_assignment
+so those using stock that expires soonest are cooked first.
+
+Plans are cached per user until their recipes or the pantry change.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, linear_sum_assignment, milp
+
+from .availability import get_pantry_ingredients
+from .suggestions import (
+    EXPIRY_WEIGHT,
+    MATRIX_CACHE_SECONDS,
+    RECENCY_WEIGHT,
+    RECENT_DAYS,
+    STOCK_WEIGHT,
+    days_since_chosen,
+    get_recipe_matrix,
+    pantry_vectors,
+    plan_cache_key,
+    recency_scores,
+)
+
+PLAN_DAYS = 7
+CANDIDATE_POOL = 60
+# Value given up for each distinct ingredient that has to be bought
+SHOPPING_COST = 0.15
+# Value lost by repeating a recipe chosen within RECENT_DAYS
+RECENT_PENALTY = 2.0
+# Assignment cost of cooking a recipe after some of its stock has expired
+SPOILED_COST = 10.0
+MILP_TIME_LIMIT = 2.0
+
+
+def choose_recipes(matrix, in_stock, urgency, values, count):
+    """
+    Return the row indexes of the ``count`` recipes to cook.
+
+    ``matrix`` is the (recipe x ingredient) 0/1 CSR matrix, ``in_stock``
+    and ``urgency`` are ingredient vectors (see pantry_vectors) and
+    ``values`` the standalone value of each recipe.
+    """
+    n_recipes = matrix.shape[0]
+    expiring = np.flatnonzero(urgency > 0)
+    missing = np.flatnonzero(in_stock == 0)
+    n_expiring, n_missing = len(expiring), len(missing)
+    uses_expiring = matrix[:, expiring].tocsc()
+    needs = matrix[:, missing].tocoo()
+
+    # Variables: [recipes chosen | expiring ingredients used | missing bought]
+    objective = np.concatenate(
+        [-values, -EXPIRY_WEIGHT * urgency[expiring], np.full(n_missing, SHOPPING_COST)]
+    )
+    constraints = [
+        # Exactly ``count`` recipes
+        LinearConstraint(
+            sparse.hstack(
+                [
+                    np.ones((1, n_recipes)),
+                    sparse.csr_matrix((1, n_expiring + n_missing)),
+                ]
+            ),
+            count,
+            count,
+        ),
+    ]
+    if n_expiring:
+        # An expiring ingredient only counts if a chosen recipe uses it
+        constraints.append(
+            LinearConstraint(
+                sparse.hstack(
+                    [
+                        -uses_expiring.T,
+                        sparse.identity(n_expiring),
+                        sparse.csr_matrix((n_expiring, n_missing)),
+                    ]
+                ),
+                -np.inf,
+                0,
+            )
+        )
+    if needs.nnz:
+        # A chosen recipe buys each ingredient it needs that isn't in stock
+        rows = np.arange(needs.nnz)
+        constraints.append(
+            LinearConstraint(
+                sparse.csr_matrix(
+                    (
+                        np.concatenate([np.ones(needs.nnz), -np.ones(needs.nnz)]),
+                        (
+                            np.concatenate([rows, rows]),
+                            np.concatenate(
+                                [needs.row, n_recipes + n_expiring + needs.col]
+                            ),
+                        ),
+                    ),
+                    shape=(needs.nnz, len(objective)),
+                ),
+                -np.inf,
+                0,
+            )
+        )
+
+    integrality = np.zeros(len(objective))
+    integrality[:n_recipes] = 1
+    result = milp(
+        objective,
+        constraints=constraints,
+        integrality=integrality,
+        bounds=Bounds(0, 1),
+        options={"time_limit": MILP_TIME_LIMIT},
+    )
+    if result.x is None:
+        # No solution in time; fall back to the best standalone values
+        return list(np.argsort(-values, kind="stable")[:count])
+    return list(np.flatnonzero(result.x[:n_recipes] > 0.5))
+
+
+def assign_days(matrix, in_stock, urgency, expiry_days, chosen):
+    """
+    Order the ``chosen`` rows over consecutive days.
+
+    Recipes using more urgent stock go earlier, and none is put on a day
+    after one of its in-stock ingredients expires unless that can't be
+    avoided. ``expiry_days`` holds days until each ingredient expires
+    (inf when it doesn't).
+    """
+    rows = matrix[chosen]
+    recipe_urgency = rows @ urgency
+    soonest = np.array(
+        [
+            expiry_days[row.indices[in_stock[row.indices] > 0]].min(initial=np.inf)
+            for row in rows
+        ]
+    )
+    days = np.arange(len(chosen))
+    cost = recipe_urgency[:, None] * days[None, :] + SPOILED_COST * (
+        days[None, :] > soonest[:, None]
+    )
+    recipe_order, day_order = linear_sum_assignment(cost)
+    by_day = sorted(zip(day_order, recipe_order, strict=True))
+    return [chosen[recipe] for _, recipe in by_day]
+
+
+def build_plan(user_id, today, days=PLAN_DAYS):
+    """
+    Compute a plan: ``{"start", "recipe_ids", "to_buy", "uses_expiring"}``.
+
+    ``recipe_ids`` has one recipe per day from ``start``; ``to_buy`` and
+    ``uses_expiring`` are the Ingredient ids the plan needs but the pantry
+    lacks, and the soon-to-expire ones it uses up.
+    """
+    recipes = get_recipe_matrix(user_id)
+    recipe_ids, matrix = recipes["recipe_ids"], recipes["matrix"]
+    ingredients = np.array(recipes["ingredients"], dtype=np.int64)
+    plan = {"start": today, "recipe_ids": [], "to_buy": [], "uses_expiring": []}
+    if not len(recipe_ids):
+        return plan
+
+    available = get_pantry_ingredients(today)["ingredients"]
+    in_stock, urgency = pantry_vectors(recipes["ingredients"], available, today)
+    expiry_days = np.array(
+        [
+            (available[pk] - today).days if available.get(pk) is not None else np.inf
+            for pk in recipes["ingredients"]
+        ]
+    )
+
+    ingredient_counts = np.asarray(matrix.sum(axis=1)).ravel()
+    in_stock_counts = matrix @ in_stock
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coverage = np.where(
+            ingredient_counts > 0, in_stock_counts / ingredient_counts, 0.0
+        )
+    days_since = days_since_chosen(user_id, recipe_ids, today)
+    values = STOCK_WEIGHT * coverage + RECENCY_WEIGHT * recency_scores(days_since)
+    values = values - RECENT_PENALTY * (days_since < RECENT_DAYS)
+
+    standalone = (
+        values
+        + EXPIRY_WEIGHT * (matrix @ urgency)
+        - SHOPPING_COST * (ingredient_counts - in_stock_counts)
+    )
+    pool = np.argsort(-standalone, kind="stable")[:CANDIDATE_POOL]
+    pool_matrix = matrix[pool]
+    count = min(days, len(pool))
+    chosen = choose_recipes(pool_matrix, in_stock, urgency, values[pool], count)
+    ordered = assign_days(pool_matrix, in_stock, urgency, expiry_days, chosen)
+
+    used = np.asarray(pool_matrix[ordered].sum(axis=0)).ravel() > 0
+    plan["recipe_ids"] = [int(recipe_ids[pool[index]]) for index in ordered]
+    plan["to_buy"] = ingredients[used & (in_stock == 0)].tolist()
+    plan["uses_expiring"] = ingredients[used & (urgency > 0)].tolist()
+    return plan
+
+
+def get_meal_plan(user_id, today=None):
+    """Return build_plan() for the user, from the cache when possible."""
+    today = today or timezone.now().date()
+    token = get_pantry_ingredients(today)["token"]
+    key = plan_cache_key(user_id)
+    cached = cache.get(key)
+    if (
+        cached is not None
+        and cached["pantry"] == token
+        and cached["plan"]["start"] == today
+    ):
+        return cached["plan"]
+    plan = build_plan(user_id, today)
+    cache.set(key, {"pantry": token, "plan": plan}, MATRIX_CACHE_SECONDS)
+    return plan
+
+
+def plan_dates(plan):
+    return [
+        plan["start"] + timedelta(days=day) for day in range(len(plan["recipe_ids"]))
+    ]
@@ -0,0 +1,122 @@
+"""
+Shopping lists for a set of planned recipes.
+
+The recipes' ingredients are resolved with one prefetch_related query, and
+pantry stock on hand for all of them with one aggregate query over
+IngredientMatch and StockSummary, so a list costs three queries however
+many recipes and ingredients it covers. Each recipe needs one of each of
+its ingredients; whatever the pantry can't cover is listed, grouped by the
+ItemCategory of the matched pantry items.
+"""
+
+import csv
+
+from django.db.models import Min, Prefetch, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Ingredient, IngredientMatch, Recipe
+
+UNCATEGORIZED = "Other"
+FORMATS = ("csv", "txt")
+CONTENT_TYPES = {"csv": "text/csv", "txt": "text/plain"}
+CSV_FIELDS = ["category", "ingredient", "to_buy", "on_hand", "recipes"]
+
+
+class _Echo:
+    """File-like object whose write() hands back the line it was given."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list(user, recipe_ids):
+    """
+    Return ``[(category, rows)]`` for the user's recipes in ``recipe_ids``.
+
+    Categories are sorted by name with UNCATEGORIZED last. Each row holds
+    the ingredient ``name``, the quantity ``needed``, the pantry's unexpired
+    ``on_hand`` total, the quantity ``to_buy`` and the ``recipes`` (titles)
+    needing it; fully stocked ingredients are left out.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    recipes = (
+        Recipe.objects.filter(user=user, pk__in=recipe_ids)
+        .only("pk", "title")
+        .prefetch_related(
+            Prefetch("ingredients", queryset=Ingredient.objects.order_by("name"))
+        )
+    )
+    needed = {}
+    for recipe in recipes:
+        for ingredient in recipe.ingredients.all():
+            entry = needed.setdefault(
+                ingredient.pk, {"name": ingredient.name, "recipes": []}
+            )
+            entry["recipes"].append(recipe.title)
+    if not needed:
+        return []
+
+    pantry = {
+        row["ingredient_id"]: row
+        for row in IngredientMatch.objects.filter(ingredient_id__in=needed)
+        .exclude(source=IngredientMatch.REJECTED)
+        .values("ingredient_id")
+        .annotate(
+            on_hand=Coalesce(Sum("pantry_item__stock_summary__fresh_quantity"), 0),
+            category=Min("pantry_item__category__name"),
+        )
+        .order_by()
+    }
+
+    groups = {}
+    for ingredient_id, entry in needed.items():
+        stocked = pantry.get(ingredient_id, {})
+        on_hand = stocked.get("on_hand", 0)
+        count = len(entry["recipes"])
+        if on_hand >= count:
+            continue
+        category = stocked.get("category") or UNCATEGORIZED
+        groups.setdefault(category, []).append(
+            {
+                "name": entry["name"],
+                "needed": count,
+                "on_hand": on_hand,
+                "to_buy": count - on_hand,
+                "recipes": entry["recipes"],
+            }
+        )
+    return [
+        (category, sorted(groups[category], key=lambda row: row["name"].casefold()))
+        for category in sorted(
+            groups, key=lambda name: (name == UNCATEGORIZED, name.casefold())
+        )
+    ]
+
+
+def shopping_list_lines(groups, fmt):
+    """Yield a shopping_list() as CSV (header first) or plain-text lines."""
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CSV_FIELDS)
+        for category, rows in groups:
+            for row in rows:
+                yield writer.writerow(
+                    [
+                        category,
+                        row["name"],
+                        row["to_buy"],
+                        row["on_hand"],
+                        "; ".join(row["recipes"]),
+                    ]
+                )
+    elif fmt == "txt":
+        for category, rows in groups:
+            yield f"{category}\n"
+            for row in rows:
+                yield f"  [ ] {row['to_buy']} x {row['name']}"
+                yield f" ({', '.join(row['recipes'])})\n"
+            yield "\n"
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}.")
@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from pantry.summaries import stock_summaries_refreshed
+
+from .availability import invalidate_pantry_ingredients
+from .models import Ingredient, IngredientMatch, Recipe
+from .suggestions import invalidate_recipe_matrix
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    # Existing rows only change the matrix through their ingredients
+    if created:
+        invalidate_recipe_matrix(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    invalidate_recipe_matrix(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_recipe_matrix(instance.user_id)
+        return
+    # Changed from the Ingredient side: every owner of the affected recipes.
+    # A clear doesn't say which recipes were affected, so it covers them all.
+    recipes = Recipe.objects.all()
+    if pk_set is not None:
+        recipes = recipes.filter(pk__in=pk_set)
+    for user_id in recipes.values_list("user_id", flat=True).distinct():
+        invalidate_recipe_matrix(user_id)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    # The cascade through Recipe.ingredients doesn't send m2m_changed, so
+    # find the recipes' owners before their through rows are gone
+    user_ids = (
+        Recipe.objects.filter(ingredients=instance)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    for user_id in user_ids:
+        invalidate_recipe_matrix(user_id)
+
+
+@receiver(post_save, sender=IngredientMatch)
+@receiver(post_delete, sender=IngredientMatch)
+def ingredient_match_changed(sender, **kwargs):
+    invalidate_pantry_ingredients()
+
+
+@receiver(stock_summaries_refreshed)
+def pantry_stock_changed(sender, **kwargs):
+    invalidate_pantry_ingredients()
@@ -0,0 +1,291 @@
+"""
+Pantry-aware meal suggestions.
+
+Each of a user's recipes is scored on three things:
+- stock: the share of its ingredients currently in the pantry
+- expiry: how soon the matching pantry stock expires
+- recency: how long ago it was last chosen
+
+Pantry stock reaches ingredients through IngredientMatch rows, read from
+the shared meals.availability cache. A user's recipes are held as a sparse
+(recipe x ingredient) matrix, cached until their recipes change, so
+scoring every recipe is two sparse matrix-vector products over pantry
+vectors. The set of recipes that can be cooked entirely from the pantry
+is cached per user on top of both. Suggestions are then drawn
+with a score-weighted sample in numpy; the database is never asked to
+ORDER BY RANDOM().
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .availability import get_pantry_ingredients
+from .models import Recipe
+
+SUGGESTION_COUNT = 3
+# Recipes chosen within this many days are only suggested to make up numbers
+RECENT_DAYS = 30
+# Recency stops adding to the score once a recipe is this many days old
+RECENCY_HORIZON_DAYS = 90
+# Stock expiring within this many days raises the score of recipes using it
+EXPIRY_HORIZON_DAYS = 7
+# Suggestions are sampled from this many of the best-scoring recipes
+SAMPLE_POOL = 12
+
+STOCK_WEIGHT = 0.5
+EXPIRY_WEIGHT = 0.3
+RECENCY_WEIGHT = 0.2
+
+MATRIX_CACHE_SECONDS = 24 * 60 * 60
+
+
+def matrix_cache_key(user_id):
+    return f"meals:recipe-matrix:{user_id}"
+
+
+def cookable_cache_key(user_id):
+    return f"meals:cookable:{user_id}"
+
+
+def plan_cache_key(user_id):
+    return f"meals:plan:{user_id}"
+
+
+def build_recipe_matrix(user_id):
+    """
+    Return a user's recipes as ``{"recipe_ids", "ingredients", "matrix"}``.
+
+    ``recipe_ids`` is sorted, ``ingredients`` holds the Ingredient id of
+    each matrix column and ``matrix`` is a CSR 0/1 matrix with a row per
+    recipe. Built from a single query: recipes are outer-joined to their
+    ingredients, so a recipe without any still gets an (empty) row.
+    """
+    pairs = Recipe.objects.filter(user_id=user_id).values_list("pk", "ingredients")
+
+    ids = set()
+    columns = {}
+    rows, cols = [], []
+    for recipe_id, ingredient_id in pairs:
+        ids.add(recipe_id)
+        if ingredient_id is None:
+            continue
+        rows.append(recipe_id)
+        cols.append(columns.setdefault(ingredient_id, len(columns)))
+    recipe_ids = np.array(sorted(ids), dtype=np.int64)
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(len(rows), dtype=np.float64),
+            (np.searchsorted(recipe_ids, rows), cols),
+        ),
+        shape=(len(recipe_ids), len(columns)),
+    )
+    return {"recipe_ids": recipe_ids, "ingredients": list(columns), "matrix": matrix}
+
+
+def get_recipe_matrix(user_id):
+    """Return build_recipe_matrix() for the user, from the cache when possible."""
+    key = matrix_cache_key(user_id)
+    recipes = cache.get(key)
+    if recipes is None:
+        recipes = build_recipe_matrix(user_id)
+        cache.set(key, recipes, MATRIX_CACHE_SECONDS)
+    return recipes
+
+
+def invalidate_recipe_matrix(user_id):
+    """
+    Drop a user's cached recipe matrix, and the cookable recipes and meal
+    plan derived from it, once the transaction commits.
+    """
+    transaction.on_commit(
+        lambda: cache.delete_many(
+            [
+                matrix_cache_key(user_id),
+                cookable_cache_key(user_id),
+                plan_cache_key(user_id),
+            ]
+        )
+    )
+
+
+def pantry_vectors(ingredients, available, today):
+    """
+    Return (in_stock, urgency) vectors over the ``ingredients`` columns.
+
+    ``available`` maps Ingredient ids the pantry has to their soonest
+    expiry (see meals.availability). Urgency rises from 0 to 1 as that
+    expiry approaches, within EXPIRY_HORIZON_DAYS.
+    """
+    in_stock = np.zeros(len(ingredients))
+    urgency = np.zeros(len(ingredients))
+    for column, ingredient_id in enumerate(ingredients):
+        if ingredient_id not in available:
+            continue
+        in_stock[column] = 1
+        expiry = available[ingredient_id]
+        if expiry is not None:
+            days_left = (expiry - today).days
+            urgency[column] = max(0.0, 1 - days_left / EXPIRY_HORIZON_DAYS)
+    return in_stock, urgency
+
+
+def recipe_availability(user_id, today=None):
+    """
+    Return ``(recipe_ids, in_stock_counts, ingredient_counts, urgency)``
+    for a user's recipes, as parallel numpy arrays ordered by recipe id.
+    ``urgency`` sums the expiry urgency of each recipe's ingredients.
+
+    Needs no queries while the recipe matrix and pantry map are cached.
+    """
+    today = today or timezone.now().date()
+    recipes = get_recipe_matrix(user_id)
+    matrix = recipes["matrix"]
+    pantry = get_pantry_ingredients(today)
+    in_stock, urgency = pantry_vectors(
+        recipes["ingredients"], pantry["ingredients"], today
+    )
+    ingredient_counts = np.asarray(matrix.sum(axis=1)).ravel()
+    return recipes["recipe_ids"], matrix @ in_stock, ingredient_counts, matrix @ urgency
+
+
+def cookable_recipe_ids(user_id, today=None):
+    """
+    Return the frozenset of a user's recipe ids whose ingredients are all
+    in the pantry. Cached until the user's recipes or the pantry change.
+    """
+    today = today or timezone.now().date()
+    token = get_pantry_ingredients(today)["token"]
+    key = cookable_cache_key(user_id)
+    cached = cache.get(key)
+    if cached is not None and cached["pantry"] == token:
+        return cached["ids"]
+
+    recipe_ids, in_stock_counts, ingredient_counts, _ = recipe_availability(
+        user_id, today
+    )
+    cookable = (ingredient_counts > 0) & (in_stock_counts == ingredient_counts)
+    ids = frozenset(recipe_ids[cookable].tolist())
+    cache.set(key, {"pantry": token, "ids": ids}, MATRIX_CACHE_SECONDS)
+    return ids
+
+
+def days_since_chosen(user_id, recipe_ids, today):
+    """
+    Days since each of ``recipe_ids`` (sorted) was last chosen, NaN for
+    recipes never chosen.
+    """
+    days_since = np.full(len(recipe_ids), np.nan)
+    last_chosen = Recipe.objects.filter(
+        user_id=user_id, last_chosen__isnull=False
+    ).values_list("pk", "last_chosen")
+    for recipe_id, chosen in last_chosen:
+        index = np.searchsorted(recipe_ids, recipe_id)
+        if index < len(recipe_ids) and recipe_ids[index] == recipe_id:
+            days_since[index] = (today - chosen).days
+    return days_since
+
+
+def recency_scores(days_since):
+    """0 for a recipe chosen today, rising to 1 at RECENCY_HORIZON_DAYS."""
+    return np.where(
+        np.isnan(days_since),
+        1.0,
+        np.clip(np.nan_to_num(days_since) / RECENCY_HORIZON_DAYS, 0.0, 1.0),
+    )
+
+
+def score_recipes(user_id, today=None):
+    """
+    Score every recipe of a user.
+
+    Returns ``(recipe_ids, scores, in_stock_counts, ingredient_counts,
+    days_since_chosen)`` as parallel numpy arrays ordered by recipe id.
+    ``days_since_chosen`` is NaN for recipes that were never chosen.
+    """
+    today = today or timezone.now().date()
+    recipe_ids, in_stock_counts, ingredient_counts, urgency = recipe_availability(
+        user_id, today
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stock_score = np.where(
+            ingredient_counts > 0, in_stock_counts / ingredient_counts, 0.0
+        )
+    expiry_score = np.minimum(urgency, 1.0)
+
+    days_since = days_since_chosen(user_id, recipe_ids, today)
+    recency_score = recency_scores(days_since)
+
+    scores = (
+        STOCK_WEIGHT * stock_score
+        + EXPIRY_WEIGHT * expiry_score
+        + RECENCY_WEIGHT * recency_score
+    )
+    return recipe_ids, scores, in_stock_counts, ingredient_counts, days_since
+
+
+def sample_indexes(scores, eligible, count, rng):
+    """
+    Pick ``count`` indexes, favouring high scores.
+
+    Eligible indexes are sampled without replacement, weighted by score,
+    from the SAMPLE_POOL best of them, and ordered best first; ineligible
+    ones only fill any remaining places after them.
+    """
+    eligible_indexes = np.flatnonzero(eligible)
+    if len(eligible_indexes) > SAMPLE_POOL:
+        best = np.argpartition(-scores[eligible_indexes], SAMPLE_POOL)[:SAMPLE_POOL]
+        eligible_indexes = eligible_indexes[best]
+
+    picked = []
+    if len(eligible_indexes):
+        # Small floor so recipes scoring 0 can still come up
+        weights = scores[eligible_indexes] + 0.01
+        picked = list(
+            rng.choice(
+                eligible_indexes,
+                size=min(count, len(eligible_indexes)),
+                replace=False,
+                p=weights / weights.sum(),
+            )
+        )
+        picked.sort(key=lambda index: -scores[index])
+    if len(picked) < count:
+        others = np.flatnonzero(~eligible)
+        others = others[np.argsort(-scores[others], kind="stable")]
+        picked.extend(others[: count - len(picked)])
+    return picked
+
+
+def suggest_meals(user, count=SUGGESTION_COUNT, today=None, rng=None):
+    """
+    Return up to ``count`` Recipes for the user, best suggestion first.
+
+    Recipes chosen in the last RECENT_DAYS days are only included, last,
+    when there aren't enough others. Each recipe gets ``score``,
+    ``in_stock_count`` and ``ingredient_count`` attributes.
+    """
+    today = today or timezone.now().date()
+    rng = rng or np.random.default_rng()
+    recipe_ids, scores, in_stock_counts, ingredient_counts, days_since = score_recipes(
+        user.pk, today
+    )
+    if not len(recipe_ids):
+        return []
+
+    eligible = np.isnan(days_since) | (days_since >= RECENT_DAYS)
+    picked = sample_indexes(scores, eligible, count, rng)
+
+    recipes = Recipe.objects.in_bulk([int(recipe_ids[index]) for index in picked])
+    suggestions = []
+    for index in picked:
+        recipe = recipes.get(int(recipe_ids[index]))
+        if recipe is None:
+            continue  # Deleted since the matrix was cached
+        recipe.score = float(scores[index])
+        recipe.in_stock_count = int(in_stock_counts[index])
+        recipe.ingredient_count = int(ingredient_counts[index])
+        suggestions.append(recipe)
+    return suggestions
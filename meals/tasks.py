@@ -0,0 +1,14 @@
+# meals/tasks.py
+
+from celery import shared_task
+
+from .matching import match_ingredients
+
+
+@shared_task
+def match_ingredients_to_pantry():
+    """
+    Periodic task: rebuild the automatic Ingredient to PantryItem matches.
+    """
+    created, deleted = match_ingredients()
+    print(f"Ingredient matching added {created} and removed {deleted} matches.")
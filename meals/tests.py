@@ -1 +1,413 @@
-# Create your tests here.
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from pantry.models import ItemCategory, Location, PantryItem, Stock, StorageUnit
+from pantry.summaries import refresh_expired_stock_summaries
+
+from . import views
+from .history import record_meal_choice
+from .matching import find_matches, match_ingredients
+from .models import Ingredient, IngredientMatch, MealChoiceRollup, MealLog, Recipe
+from .planner import get_meal_plan
+from .shopping import shopping_list
+from .suggestions import (
+    build_recipe_matrix,
+    cookable_recipe_ids,
+    score_recipes,
+    suggest_meals,
+)
+
+
+@pytest.fixture
+def cook(db):
+    return User.objects.create_user("cook")
+
+
+def add_recipe(user, title, ingredients, last_chosen=None):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        description="",
+        instructions="",
+        last_chosen=last_chosen,
+    )
+    recipe.ingredients.set(
+        Ingredient.objects.get_or_create(name=name)[0] for name in ingredients
+    )
+    return recipe
+
+
+def test_suggestions_favour_expiring_pantry_stock(
+    cook, django_capture_on_commit_callbacks
+):
+    today = date.today()
+    unit = StorageUnit.objects.create(
+        name="Fridge",
+        unit_type="refrigerator",
+        location=Location.objects.create(name="Home", created_by=cook),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        for name, expiry in [
+            ("Baby spinach", today + timedelta(days=1)),
+            ("Free range eggs", None),
+        ]:
+            Stock.objects.create(
+                item=PantryItem.objects.create(name=name, created_by=cook),
+                storage_unit=unit,
+                quantity=1,
+                expiry_date=expiry,
+            )
+        omelette = add_recipe(cook, "Omelette", ["eggs", "spinach"])
+        add_recipe(cook, "Pancakes", ["eggs", "flour", "milk"])
+        add_recipe(cook, "Curry", ["rice", "chickpeas"])
+        add_recipe(cook, "Frittata", ["eggs", "spinach"], last_chosen=today)
+        match_ingredients()
+
+    recipe_ids, scores, in_stock, ingredients, _ = score_recipes(cook.pk, today)
+    recipes = Recipe.objects.in_bulk(recipe_ids.tolist())
+    titles = [recipes[recipe_ids[index]].title for index in np.argsort(-scores)]
+    assert titles[0] == "Omelette"
+    assert titles.index("Pancakes") < titles.index("Curry")
+
+    suggestions = suggest_meals(cook, count=3, rng=np.random.default_rng(0))
+    assert {recipe.title for recipe in suggestions} == {
+        "Omelette",
+        "Pancakes",
+        "Curry",
+    }
+    assert suggestions[0] == omelette
+    assert (suggestions[0].in_stock_count, suggestions[0].ingredient_count) == (2, 2)
+    # Chosen today: only suggested when nothing else is left
+    assert suggest_meals(cook, count=4)[-1].title == "Frittata"
+
+
+def test_recipe_matrix_is_read_in_one_query(cook, django_assert_num_queries):
+    omelette = add_recipe(cook, "Omelette", ["eggs", "spinach"])
+    toast = add_recipe(cook, "Toast", [])
+    add_recipe(User.objects.create_user("other"), "Curry", ["rice"])
+
+    with django_assert_num_queries(1):
+        recipes = build_recipe_matrix(cook.pk)
+    assert recipes["recipe_ids"].tolist() == sorted([omelette.pk, toast.pk])
+    assert recipes["matrix"].shape == (2, 2)
+    assert recipes["matrix"].sum(axis=1).tolist() == [[2.0], [0.0]]
+
+
+def test_ingredient_matching():
+    matches = find_matches(
+        [(1, "Eggs"), (2, "Fresh tomatoes"), (3, "Milk"), (4, "Flour")],
+        [(10, "Free range eggs"), (11, "Tomato"), (12, "Almond milk"), (13, "Rice")],
+    )
+    assert set(matches) == {(1, 10), (2, 11), (3, 12)}
+    assert matches[2, 11] == 1.0
+
+
+def test_cookable_recipes_follow_stock_and_matches(
+    cook, django_capture_on_commit_callbacks
+):
+    unit = StorageUnit.objects.create(
+        name="Shelf",
+        unit_type="pantry",
+        location=Location.objects.create(name="Home", created_by=cook),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        rice = PantryItem.objects.create(name="Basmati rice", created_by=cook)
+        stock = Stock.objects.create(item=rice, storage_unit=unit, quantity=1)
+        pilaf = add_recipe(cook, "Pilaf", ["rice"])
+        add_recipe(cook, "Risotto", ["rice", "parmesan"])
+        match_ingredients()
+    assert cookable_recipe_ids(cook.pk) == {pilaf.pk}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stock.quantity = 0
+        stock.save()
+    assert cookable_recipe_ids(cook.pk) == set()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stock.quantity = 2
+        stock.save()
+        match = IngredientMatch.objects.get(pantry_item=rice)
+        match.source = IngredientMatch.REJECTED
+        match.save()
+        # Re-matching keeps the rejection
+        match_ingredients()
+    assert cookable_recipe_ids(cook.pk) == set()
+
+
+def test_expired_lots_dont_hide_fresh_stock(cook, django_capture_on_commit_callbacks):
+    today = date.today()
+    unit = StorageUnit.objects.create(
+        name="Shelf",
+        unit_type="pantry",
+        location=Location.objects.create(name="Home", created_by=cook),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        rice = PantryItem.objects.create(name="Basmati rice", created_by=cook)
+        for quantity, days in [(1, -5), (5, 300)]:
+            Stock.objects.create(
+                item=rice,
+                storage_unit=unit,
+                quantity=quantity,
+                expiry_date=today + timedelta(days=days),
+            )
+        oats = PantryItem.objects.create(name="Oats", created_by=cook)
+        Stock.objects.create(
+            item=oats, storage_unit=unit, quantity=1, expiry_date=today
+        )
+        pilaf = add_recipe(cook, "Pilaf", ["rice"])
+        porridge = add_recipe(cook, "Porridge", ["oats"])
+        match_ingredients()
+    rice.stock_summary.refresh_from_db()
+    assert rice.stock_summary.fresh_quantity == 5
+    assert rice.stock_summary.soonest_expiry == today + timedelta(days=300)
+    assert cookable_recipe_ids(cook.pk) == {pilaf.pk, porridge.pk}
+
+    # The oats expire overnight, even before the nightly refresh runs
+    tomorrow = today + timedelta(days=1)
+    assert cookable_recipe_ids(cook.pk, tomorrow) == {pilaf.pk}
+    with django_capture_on_commit_callbacks(execute=True):
+        assert refresh_expired_stock_summaries(tomorrow) == 1
+    assert cookable_recipe_ids(cook.pk, tomorrow) == {pilaf.pk}
+
+
+def test_meal_plan_uses_expiring_stock_first_and_shares_shopping(
+    cook, client, django_capture_on_commit_callbacks
+):
+    today = date.today()
+    unit = StorageUnit.objects.create(
+        name="Fridge",
+        unit_type="refrigerator",
+        location=Location.objects.create(name="Home", created_by=cook),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        for name, days in [("Salmon", 1), ("Yoghurt", 4)]:
+            Stock.objects.create(
+                item=PantryItem.objects.create(name=name, created_by=cook),
+                storage_unit=unit,
+                quantity=1,
+                expiry_date=today + timedelta(days=days),
+            )
+        yoghurt_bowl = add_recipe(cook, "Yoghurt bowl", ["yoghurt", "oats"])
+        salmon = add_recipe(cook, "Salmon bake", ["salmon", "potatoes"])
+        fish_pie = add_recipe(
+            cook, "Fish pie", ["salmon", "potatoes"], last_chosen=today
+        )
+        rice = [add_recipe(cook, f"Rice {n}", ["rice", "peas"]) for n in range(2)]
+        add_recipe(cook, "Lasagne", ["pasta", "beef"])
+        add_recipe(cook, "Omelette", ["eggs"])
+        add_recipe(cook, "Pho", ["noodles", "beef", "herbs"])
+        match_ingredients()
+
+    plan = get_meal_plan(cook.pk, today)
+    assert plan["start"] == today
+    assert plan["recipe_ids"][:2] == [salmon.pk, yoghurt_bowl.pk]
+    assert {recipe.pk for recipe in rice} <= set(plan["recipe_ids"])
+    # Fish pie repeats a recent meal, so it is left out
+    assert len(plan["recipe_ids"]) == 7
+    assert fish_pie.pk not in plan["recipe_ids"]
+    to_buy = Ingredient.objects.filter(pk__in=plan["to_buy"])
+    assert {ingredient.name for ingredient in to_buy} >= {"oats", "rice", "peas"}
+
+    # Cached until recipes change
+    with django_capture_on_commit_callbacks(execute=True):
+        salad = add_recipe(cook, "Salmon salad", ["salmon"])
+    assert get_meal_plan(cook.pk, today)["recipe_ids"][0] == salad.pk
+
+    # Deleting an ingredient drops the cached plan that lists it
+    client.force_login(cook)
+    assert "oats" in client.get(reverse("meals:meal_plan")).context["to_buy"]
+    oats = Ingredient.objects.get(name="oats")
+    oats_pk = oats.pk
+    with django_capture_on_commit_callbacks(execute=True):
+        oats.delete()
+    assert oats_pk not in get_meal_plan(cook.pk, today)["to_buy"]
+    response = client.get(reverse("meals:meal_plan"))
+    assert response.status_code == 200
+    assert "oats" not in response.context["to_buy"]
+
+
+def test_shopping_list_query_count_is_constant(
+    cook, client, django_capture_on_commit_callbacks
+):
+    dairy = ItemCategory.objects.create(name="Dairy")
+    unit = StorageUnit.objects.create(
+        name="Fridge",
+        unit_type="refrigerator",
+        location=Location.objects.create(name="Home", created_by=cook),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        milk = PantryItem.objects.create(name="Milk", category=dairy, created_by=cook)
+        Stock.objects.create(item=milk, storage_unit=unit, quantity=1)
+        # Expired milk isn't on hand
+        Stock.objects.create(
+            item=milk,
+            storage_unit=unit,
+            quantity=5,
+            expiry_date=date.today() - timedelta(days=1),
+        )
+        PantryItem.objects.create(name="Butter", category=dairy, created_by=cook)
+        recipes = [
+            add_recipe(cook, f"Pancakes {n}", ["milk", "butter", f"topping {n}"])
+            for n in range(20)
+        ]
+        match_ingredients()
+
+    def list_queries(count):
+        with CaptureQueriesContext(connection) as queries:
+            groups = shopping_list(cook, [recipe.pk for recipe in recipes[:count]])
+        return len(queries), groups
+
+    single, groups = list_queries(1)
+    assert groups == [
+        (
+            "Dairy",
+            [
+                {
+                    "name": "butter",
+                    "needed": 1,
+                    "on_hand": 0,
+                    "to_buy": 1,
+                    "recipes": ["Pancakes 0"],
+                }
+            ],
+        ),
+        (
+            "Other",
+            [
+                {
+                    "name": "topping 0",
+                    "needed": 1,
+                    "on_hand": 0,
+                    "to_buy": 1,
+                    "recipes": ["Pancakes 0"],
+                }
+            ],
+        ),
+    ]
+    queries, groups = list_queries(20)
+    assert queries == single == 3
+    milk_row = next(row for row in groups[0][1] if row["name"] == "milk")
+    assert (milk_row["needed"], milk_row["on_hand"], milk_row["to_buy"]) == (20, 1, 19)
+
+    client.force_login(cook)
+    response = client.get(
+        reverse("meals:shopping_list"),
+        {"recipe": [recipes[0].pk, recipes[1].pk], "format": "csv"},
+    )
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0] == "category,ingredient,to_buy,on_hand,recipes"
+    assert "Dairy,milk,1,1,Pancakes 0; Pancakes 1" in lines
+
+
+def test_ingredient_typeahead_pages_by_prefix(cook, client, monkeypatch):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name)
+        for name in ["Basil", "Bay leaf", "Beans", "Beef", "Beetroot", "Carrot"]
+    )
+    beans = Ingredient.objects.get(name="Beans")
+    client.force_login(cook)
+    url = reverse("meals:ingredient_search")
+
+    response = client.get(url, {"q": "b", "ingredients": [beans.pk]})
+    assert [i.name for i in response.context["ingredients"]] == [
+        "Basil",
+        "Bay leaf",
+        "Beef",
+        "Beetroot",
+    ]
+    assert response.context["more"] is None
+
+    monkeypatch.setattr(views, "INGREDIENT_PAGE_SIZE", 2)
+    response = client.get(url, {"q": "BE"})
+    assert [i.name for i in response.context["ingredients"]] == ["Beans", "Beef"]
+    assert response.context["more"] == "q=BE&after=Beef"
+    response = client.get(f"{url}?{response.context['more']}")
+    assert [i.name for i in response.context["ingredients"]] == ["Beetroot"]
+
+
+def test_recipe_form_queries_dont_grow_with_catalogue(cook, client):
+    recipe = add_recipe(cook, "Soup", ["leek", "potato"])
+    leek, potato = recipe.ingredients.order_by("name")
+    client.force_login(cook)
+    edit_url = reverse("meals:edit_recipe", args=[recipe.pk])
+
+    def page_queries():
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(edit_url)
+        assert response.status_code == 200
+        return len(queries), response.content.decode().count("<option")
+
+    small = page_queries()
+    Ingredient.objects.bulk_create(Ingredient(name=f"Spice {n}") for n in range(500))
+    assert page_queries() == small == (small[0], 2)
+
+    response = client.post(
+        edit_url,
+        {
+            "title": "Soup",
+            "description": "Leek-free",
+            "instructions": "Boil.",
+            "ingredients": [potato.pk],
+        },
+    )
+    assert response.status_code == 302
+    assert list(recipe.ingredients.all()) == [potato]
+
+    response = client.post(
+        edit_url,
+        {"title": "Soup", "description": "", "instructions": "", "ingredients": [0]},
+    )
+    assert response.context["form"].errors["ingredients"]
+
+
+def test_meal_history_reads_rollups(cook, client):
+    today = date.today()
+    soup = add_recipe(cook, "Soup", [])
+    stew = add_recipe(cook, "Stew", [])
+    salad = add_recipe(cook, "Salad", [])
+    add_recipe(cook, "Curry", [])
+    for days_ago in [40, 3, 2, 1, 0]:
+        record_meal_choice(cook, soup, today - timedelta(days=days_ago))
+    record_meal_choice(cook, stew, today - timedelta(days=40))
+    record_meal_choice(cook, stew, today - timedelta(days=40))
+    record_meal_choice(cook, salad, today - timedelta(days=10))
+
+    soup.refresh_from_db()
+    assert soup.last_chosen == today
+    assert MealLog.objects.filter(recipe=stew).count() == 2
+    assert (
+        MealChoiceRollup.objects.get(recipe=stew, period=MealChoiceRollup.DAY).count
+        == 2
+    )
+
+    client.force_login(cook)
+    response = client.get(reverse("meals:most_cooked"))
+    assert [(r["title"], r["times"]) for r in response.json()["recipes"]] == [
+        ("Soup", 5),
+        ("Stew", 2),
+        ("Salad", 1),
+    ]
+    response = client.get(reverse("meals:most_cooked"), {"days": 30, "limit": 1})
+    assert response.json()["recipes"] == [
+        {"recipe_id": soup.pk, "title": "Soup", "times": 4}
+    ]
+    assert client.get(reverse("meals:most_cooked"), {"days": "x"}).status_code == 400
+
+    assert client.get(reverse("meals:cooking_streaks")).json() == {
+        "current": 4,
+        "longest": 4,
+        "last_cooked": today.isoformat(),
+    }
+
+    response = client.get(reverse("meals:not_cooked"), {"days": 7})
+    assert [r["title"] for r in response.json()["recipes"]] == [
+        "Curry",
+        "Stew",
+        "Salad",
+    ]
@@ -10,8 +10,14 @@ urlpatterns = [
     path("my_recipes/", views.my_recipes, name="my_recipes"),
     path("recipe/<int:pk>/", views.recipe_detail, name="recipe_detail"),
     path("suggestions/", views.meal_suggestions, name="meal_suggestions"),
+    path("plan/", views.meal_plan, name="meal_plan"),
+    path("shopping-list/", views.shopping_list, name="shopping_list"),
     path("choose/<int:pk>/", views.choose_meal, name="choose_meal"),
+    path("history/most-cooked/", views.most_cooked_recipes, name="most_cooked"),
+    path("history/streaks/", views.cooking_streak, name="cooking_streaks"),
+    path("history/not-cooked/", views.not_cooked_recipes, name="not_cooked"),
     path("edit/<int:pk>/", views.edit_recipe, name="edit_recipe"),
     path("ingredients/add/", views.add_ingredient, name="add_ingredient"),
+    path("ingredients/search/", views.ingredient_search, name="ingredient_search"),
     path("", TemplateView.as_view(template_name="meals/home.html"), name="home"),
 ]
@@ -2,13 +2,33 @@ from datetime import timedelta
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from django.forms import ModelForm
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.http import urlencode
 
+from .availability import get_pantry_ingredients
 from .forms import RecipeForm
+from .history import (
+    cooking_streaks,
+    most_cooked,
+    not_cooked_since,
+    record_meal_choice,
+    times_chosen,
+)
 from .models import Ingredient, MealLog, Recipe
+from .planner import get_meal_plan, plan_dates
+from .shopping import CONTENT_TYPES as SHOPPING_CONTENT_TYPES
+from .shopping import shopping_list as build_shopping_list
+from .shopping import shopping_list_lines
+from .suggestions import SUGGESTION_COUNT, cookable_recipe_ids, suggest_meals
+
+INGREDIENT_PAGE_SIZE = 25
+# Most recent MealLog rows shown on a recipe's page
+RECIPE_LOG_LIMIT = 10
+HISTORY_MAX_DAYS = 3650
+HISTORY_MAX_LIMIT = 100
 
 
 class IngredientForm(ModelForm):
@@ -37,10 +57,42 @@ def add_ingredient(request):
     return render(request, "meals/add_ingredient.html", {"form": form})
 
 
+@login_required
+def ingredient_search(request):
+    """
+    Typeahead for the recipe ingredient picker.
+
+    Returns <option>s for a page of ingredients whose names start with ?q=,
+    after the ?after= name, leaving out the ?ingredients= ids already
+    selected. Pages are keyed on the name, so each one is an index range
+    scan however deep the user pages.
+    """
+    query = request.GET.get("q", "").strip()
+    after = request.GET.get("after", "")
+    selected = [pk for pk in request.GET.getlist("ingredients") if pk.isdigit()]
+
+    ingredients = Ingredient.objects.order_by("name")
+    if query:
+        ingredients = ingredients.filter(name__istartswith=query)
+    if after:
+        ingredients = ingredients.filter(name__gt=after)
+    if selected:
+        ingredients = ingredients.exclude(pk__in=selected)
+    page = list(ingredients[: INGREDIENT_PAGE_SIZE + 1])
+
+    more = None
+    if len(page) > INGREDIENT_PAGE_SIZE:
+        page = page[:INGREDIENT_PAGE_SIZE]
+        more = urlencode({"q": query, "after": page[-1].name})
+    context = {"ingredients": page, "more": more}
+    return render(request, "meals/partials/ingredient_options.html", context)
+
+
 @login_required
 def add_recipe(request):
     """
     Handles the creation of a new recipe with a dual-listbox for ingredients.
+    Available ingredients are loaded on demand by ingredient_search.
     """
     if request.method == "POST":
         form = RecipeForm(request.POST)
@@ -53,16 +105,7 @@ def add_recipe(request):
     else:
         form = RecipeForm()
 
-    # For a new recipe, all ingredients are available, and none are selected.
-    available_ingredients = Ingredient.objects.all().order_by("name")
-    selected_ingredients = Ingredient.objects.none()
-
-    context = {
-        "form": form,
-        "available_ingredients": available_ingredients,
-        "selected_ingredients": selected_ingredients,
-    }
-    return render(request, "meals/add_recipe.html", context)
+    return render(request, "meals/add_recipe.html", {"form": form})
 
 
 @login_required
@@ -71,21 +114,29 @@ def my_recipes(request):
     Shows a list of all recipes created by the current user.
     """
     recipes = Recipe.objects.filter(user=request.user)
-    return render(request, "meals/my_recipes.html", {"recipes": recipes})
+    return render(
+        request,
+        "meals/my_recipes.html",
+        {"recipes": recipes, "cookable": cookable_recipe_ids(request.user.pk)},
+    )
 
 
 @login_required
 def recipe_detail(request, pk):
     """
     Displays the full details of a specific recipe, including its cooking instructions,
-    ingredients, and a log of dates it was chosen.
+    ingredients, and the most recent dates it was chosen.
     """
     recipe = get_object_or_404(Recipe, pk=pk)
-    meal_logs = MealLog.objects.filter(recipe=recipe).order_by("-chosen_date")
+    meal_logs = MealLog.objects.filter(recipe=recipe).order_by("-chosen_date")[
+        :RECIPE_LOG_LIMIT
+    ]
     context = {
         "recipe": recipe,
         "meal_logs": meal_logs,
+        "times_chosen": times_chosen(recipe),
         "ingredients": recipe.ingredients.all(),
+        "in_pantry": get_pantry_ingredients()["ingredients"],
     }
     return render(request, "meals/recipe_detail.html", context)
 
@@ -93,34 +144,79 @@ def recipe_detail(request, pk):
 @login_required
 def meal_suggestions(request):
     """
-    Provides 3 meal suggestions, excluding any meals chosen in the last 30 days.
-    If there are not enough qualifying meals, older ones are included.
+    Provides 3 meal suggestions, favouring recipes that use what's in the
+    pantry, especially stock about to expire. Meals chosen in the last 30
+    days are only included if there are not enough others.
     """
-    thirty_days_ago = timezone.now().date() - timedelta(days=30)
+    suggestions = suggest_meals(request.user, SUGGESTION_COUNT)
+    return render(request, "meals/meal_suggestions.html", {"suggestions": suggestions})
 
-    suggestions = list(
-        Recipe.objects.filter(user=request.user)
-        .filter(Q(last_chosen__lte=thirty_days_ago) | Q(last_chosen__isnull=True))
-        .order_by("?")
-    )
 
-    suggestions_for_display = suggestions[:3]
+@login_required
+def meal_plan(request):
+    """
+    Shows a 7-day meal plan that uses up pantry stock before it expires,
+    with the ingredients that still need to be bought.
+    """
+    plan = get_meal_plan(request.user.pk)
+    recipes = Recipe.objects.in_bulk(plan["recipe_ids"])
+    ingredients = Ingredient.objects.in_bulk(plan["to_buy"] + plan["uses_expiring"])
+    days = [
+        (day, recipes[pk])
+        for day, pk in zip(plan_dates(plan), plan["recipe_ids"], strict=True)
+        if pk in recipes
+    ]
+    context = {
+        "days": days,
+        "to_buy": sorted(
+            ingredients[pk].name for pk in plan["to_buy"] if pk in ingredients
+        ),
+        "uses_expiring": sorted(
+            ingredients[pk].name for pk in plan["uses_expiring"] if pk in ingredients
+        ),
+    }
+    return render(request, "meals/meal_plan.html", context)
+
 
-    return render(
-        request, "meals/meal_suggestions.html", {"suggestions": suggestions_for_display}
+@login_required
+def shopping_list(request):
+    """
+    Lists what to buy for the ?recipe= ids (by default, this week's meal
+    plan), after what's in the pantry. ?format=csv or txt downloads it.
+    """
+    recipe_ids = request.GET.getlist("recipe")
+    if not recipe_ids:
+        recipe_ids = get_meal_plan(request.user.pk)["recipe_ids"]
+    elif not all(pk.isdigit() for pk in recipe_ids):
+        raise Http404("Unknown recipe.")
+    groups = build_shopping_list(request.user, recipe_ids)
+
+    fmt = request.GET.get("format")
+    if fmt is None:
+        context = {
+            "groups": groups,
+            "query": urlencode([("recipe", pk) for pk in recipe_ids]),
+        }
+        return render(request, "meals/shopping_list.html", context)
+    if fmt not in SHOPPING_CONTENT_TYPES:
+        raise Http404("Unknown format.")
+    response = StreamingHttpResponse(
+        shopping_list_lines(groups, fmt), content_type=SHOPPING_CONTENT_TYPES[fmt]
     )
+    filename = f"shopping-list-{timezone.now():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @login_required
 def choose_meal(request, pk):
     """
-    Updates a meal's 'last_chosen' field and logs the choice in MealLog.
+    Updates a meal's 'last_chosen' field, logs the choice in MealLog and
+    counts it in the history rollups, all in one transaction.
     """
     if request.method == "POST":
         recipe = get_object_or_404(Recipe, pk=pk, user=request.user)
-        recipe.last_chosen = timezone.now().date()
-        recipe.save()
-        MealLog.objects.create(recipe=recipe, user=request.user)
+        record_meal_choice(request.user, recipe)
     return redirect("meals:meal_suggestions")
 
 
@@ -128,7 +224,8 @@ def choose_meal(request, pk):
 def edit_recipe(request, pk):
     """
     Handles the editing of an existing recipe's main details and ingredients.
-    The ingredient management uses a client-side dual-listbox approach.
+    The ingredient management uses a dual-listbox with a server-side
+    typeahead (ingredient_search) for the available ingredients.
     """
     recipe = get_object_or_404(Recipe, pk=pk, user=request.user)
 
@@ -140,15 +237,62 @@ def edit_recipe(request, pk):
     else:
         form = RecipeForm(instance=recipe)
 
-    available_ingredients = Ingredient.objects.exclude(recipes__in=[recipe]).order_by(
-        "name"
-    )
-    selected_ingredients = recipe.ingredients.all().order_by("name")
-
-    context = {
-        "form": form,
-        "recipe": recipe,
-        "available_ingredients": available_ingredients,
-        "selected_ingredients": selected_ingredients,
-    }
+    context = {"form": form, "recipe": recipe}
     return render(request, "meals/edit_recipe.html", context)
+
+
+def _int_param(request, name, default, maximum):
+    """A positive integer query parameter, or None if it isn't one."""
+    value = request.GET.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or not 0 < int(value) <= maximum:
+        return None
+    return int(value)
+
+
+@login_required
+def most_cooked_recipes(request):
+    """
+    JSON: the user's most chosen recipes, over the last ?days= days or all
+    time, top ?limit= (default 10).
+    """
+    days = _int_param(request, "days", 0, HISTORY_MAX_DAYS)
+    limit = _int_param(request, "limit", 10, HISTORY_MAX_LIMIT)
+    if days is None or limit is None:
+        return JsonResponse({"error": "Invalid days or limit"}, status=400)
+    since = timezone.now().date() - timedelta(days=days - 1) if days else None
+    recipes = most_cooked(request.user, since=since, limit=limit)
+    return JsonResponse({"days": days or None, "recipes": recipes})
+
+
+@login_required
+def cooking_streak(request):
+    """JSON: the user's current and longest daily cooking streaks."""
+    return JsonResponse(cooking_streaks(request.user))
+
+
+@login_required
+def not_cooked_recipes(request):
+    """
+    JSON: the user's recipes not chosen in the last ?days= days (default
+    30), least recently cooked first.
+    """
+    days = _int_param(request, "days", 30, HISTORY_MAX_DAYS)
+    limit = _int_param(request, "limit", HISTORY_MAX_LIMIT, HISTORY_MAX_LIMIT)
+    if days is None or limit is None:
+        return JsonResponse({"error": "Invalid days or limit"}, status=400)
+    recipes = not_cooked_since(request.user, days)[:limit]
+    return JsonResponse(
+        {
+            "days": days,
+            "recipes": [
+                {
+                    "recipe_id": recipe.pk,
+                    "title": recipe.title,
+                    "last_cooked": recipe.last_cooked,
+                }
+                for recipe in recipes
+            ],
+        }
+    )
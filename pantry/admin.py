@@ -2,9 +2,21 @@
 
 from django import forms
 from django.contrib import admin
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
 
-from .models import ItemCategory, Location, PantryItem, Stock, StorageUnit
+from config.admin_mixins import AnnotatedListMixin, annotated_column
+
+from .models import (
+    ItemCategory,
+    Location,
+    PantryItem,
+    Stock,
+    StorageUnit,
+    TemperatureExcursion,
+)
+from .rollups import get_rollups, location_rollup, unit_rollup
 
 # =============================================================================
 # 1. Utility Functions (DRY)
@@ -21,6 +33,27 @@ def celsius_to_fahrenheit(c):
     return round((c * 9.0 / 5.0) + 32, 1) if c is not None else None
 
 
+def stock_status_badge(item, total):
+    """Overall stock status: OK, Low, or Out"""
+    if total == 0:
+        return format_html('<span style="color: red;">{}</span>', "🔴 Out")
+    if total < item.min_stock_level:
+        return format_html('<span style="color: orange;">{}</span>', "🟡 Low")
+    return format_html('<span style="color: green;">{}</span>', "🟢 OK")
+
+
+def rollup_display(rollup):
+    """Render a pantry.rollups summary as a compact changelist cell"""
+    return format_html(
+        '{} items · {} in stock · <span style="color: orange;">{} expiring</span>'
+        ' · <span style="color: red;">{} expired</span>',
+        rollup["items"],
+        rollup["units"],
+        rollup["expiring"],
+        rollup["expired"],
+    )
+
+
 # =============================================================================
 # 2. Custom Admin Form: StorageUnit with Dual Temp Input
 # =============================================================================
@@ -44,7 +77,14 @@ class StorageUnitAdminForm(forms.ModelForm):
 
     class Meta:
         model = StorageUnit
-        fields = ["name", "unit_type", "location", "notes"]  # Handled by clean()
+        fields = [
+            "name",
+            "unit_type",
+            "location",
+            "min_temperature",
+            "max_temperature",
+            "notes",
+        ]  # Temperature handled by clean()
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -118,23 +158,27 @@ class StorageUnitInline(admin.StackedInline):
 
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
-    list_display = ("name", "unit_count", "created_by", "created_at")
+class LocationAdmin(AnnotatedListMixin, admin.ModelAdmin):
+    list_display = ("name", "unit_count", "stock_rollup", "created_by", "created_at")
     list_filter = ("created_at", "created_by")
     search_fields = ("name", "address")
     readonly_fields = ("created_at",)
     inlines = [StorageUnitInline]
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
+    list_select_related = ("created_by",)
+    list_annotations = {"unit_count": Count("storage_units")}
+
+    unit_count = annotated_column("unit_count", "Units")
 
-    def unit_count(self, obj):
-        return obj.storage_units.count()
+    def stock_rollup(self, obj):
+        return rollup_display(location_rollup(get_rollups(), obj.pk))
 
-    unit_count.short_description = "Units"
+    stock_rollup.short_description = "Stock"
 
 
 @admin.register(StorageUnit)
-class StorageUnitAdmin(admin.ModelAdmin):
+class StorageUnitAdmin(AnnotatedListMixin, admin.ModelAdmin):
     form = StorageUnitAdminForm
     inlines = [StockInline]
     list_display = (
@@ -143,19 +187,31 @@ class StorageUnitAdmin(admin.ModelAdmin):
         "location",
         "temperature_display",
         "item_count",
+        "stock_rollup",
         "notes_preview",
     )
     list_filter = ("unit_type", "location")
+    list_select_related = ("location",)
     search_fields = ("name", "location__name", "notes")
+    list_annotations = {
+        # Number of distinct items stocked in this unit
+        "item_count": Count(
+            "stocks__item", distinct=True, filter=Q(stocks__quantity__gt=0)
+        ),
+    }
 
     fieldsets = (
         (None, {"fields": ("name", "unit_type", "location")}),
         (
             "Temperature Settings",
             {
-                "fields": ("temperature_celsius", "temperature_fahrenheit"),
+                "fields": (
+                    ("temperature_celsius", "temperature_fahrenheit"),
+                    ("min_temperature", "max_temperature"),
+                ),
                 "description": "Enter temperature in Celsius or Fahrenheit. "
-                "Automatically converted and stored in Celsius.",
+                "Automatically converted and stored in Celsius. Sensor readings "
+                "outside the safe range raise an alert.",
             },
         ),
         ("Additional Info", {"fields": ("notes",), "classes": ("collapse",)}),
@@ -171,11 +227,12 @@ class StorageUnitAdmin(admin.ModelAdmin):
 
     temperature_display.short_description = "Temperature"
 
-    def item_count(self, obj):
-        """Number of stock items in this unit"""
-        return obj.stocks.count()
+    item_count = annotated_column("item_count", "Items")
 
-    item_count.short_description = "Items"
+    def stock_rollup(self, obj):
+        return rollup_display(unit_rollup(get_rollups(), obj.pk))
+
+    stock_rollup.short_description = "Stock"
 
     def notes_preview(self, obj):
         """Short preview of notes for list view"""
@@ -187,7 +244,7 @@ class StorageUnitAdmin(admin.ModelAdmin):
 
 
 @admin.register(PantryItem)
-class PantryItemAdmin(admin.ModelAdmin):
+class PantryItemAdmin(AnnotatedListMixin, admin.ModelAdmin):
     list_display = (
         "name",
         "category",
@@ -197,6 +254,10 @@ class PantryItemAdmin(admin.ModelAdmin):
         "created_by",
     )
     list_filter = ("category", "created_by", "min_stock_level")
+    list_select_related = ("category", "created_by")
+    list_annotations = {
+        "total_quantity": Coalesce(F("stock_summary__total_quantity"), Value(0)),
+    }
     search_fields = ("name", "barcode", "category__name")
     readonly_fields = ("created_by",)
     autocomplete_fields = ("category", "default_storage")
@@ -218,22 +279,9 @@ class PantryItemAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
-    def stock_status(self, obj):
-        """Overall stock status: OK, Low, or Out"""
-        total = sum(stock.quantity for stock in obj.stocks.all())
-        if total == 0:
-            return format_html('<span style="color: red;">🔴 Out</span>')
-        if total < obj.min_stock_level:
-            return format_html('<span style="color: orange;">🟡 Low</span>')
-        return format_html('<span style="color: green;">🟢 OK</span>')
-
-    stock_status.short_description = "Status"
-
-    def item_count(self, obj):
-        """Total quantity across all storage units"""
-        return sum(stock.quantity for stock in obj.stocks.all())
-
-    item_count.short_description = "Total Qty"
+    stock_status = annotated_column("total_quantity", "Status", stock_status_badge)
+    # Total quantity across all storage units
+    item_count = annotated_column("total_quantity", "Total Qty")
 
 
 @admin.register(Stock)
@@ -290,14 +338,21 @@ class StockAdmin(admin.ModelAdmin):
 
 
 @admin.register(ItemCategory)
-class ItemCategoryAdmin(admin.ModelAdmin):
+class ItemCategoryAdmin(AnnotatedListMixin, admin.ModelAdmin):
     list_display = ("name", "item_count")
     search_fields = ("name",)
+    list_annotations = {"item_count": Count("pantryitem")}
+
+    item_count = annotated_column("item_count", "Items")
 
-    def item_count(self, obj):
-        return obj.pantryitem_set.count()
 
-    item_count.short_description = "Items"
+@admin.register(TemperatureExcursion)
+class TemperatureExcursionAdmin(admin.ModelAdmin):
+    list_display = ("storage_unit", "started_at", "ended_at", "peak_celsius")
+    list_filter = ("storage_unit__location", "storage_unit__unit_type")
+    list_select_related = ("storage_unit__location",)
+    date_hierarchy = "started_at"
+    readonly_fields = ("storage_unit", "started_at", "ended_at", "peak_celsius")
 
 
 # Customize Django Admin Title
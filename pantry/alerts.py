@@ -1,5 +1,36 @@
+from datetime import timedelta
+
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import get_connection, send_mail, send_mass_mail
+from django.db.models import (
+    Case,
+    CharField,
+    DateField,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .forecast import run_out_date
+from .models import PantryItem, Stock, StockAlertState
+
+# Alert classes computed per PantryItem by ``annotate_alerts``.
+ALERT_EXPIRING = "expiring"
+ALERT_OUT = "out"
+ALERT_LOW = "low"
+ALERT_RUNNING_OUT = "running_out"
+
+# Stock forecast to last this many days or less raises ALERT_RUNNING_OUT.
+RUN_OUT_ALERT_DAYS = 7
 
 
 def send_alert(user, subject, message):
@@ -11,3 +42,219 @@ def send_alert(user, subject, message):
             recipient_list=[user.email],
             fail_silently=False,
         )
+
+
+def annotate_alerts(queryset=None, today=None):
+    """
+    Annotate PantryItems with their stock totals and alert classes.
+
+    Totals are read from each item's StockSummary, so this is a single
+    query with no aggregation over Stock:
+    - total_quantity: quantity across all stock rows (0 if none)
+    - soonest_expiry: earliest expiry date of unexpired, non-empty stock
+    - alert_unit_id / alert_unit_name: unit holding the soonest-expiring
+      stock, falling back to the item's default storage unit
+    - expiry_alert: "expiring" if soonest_expiry is within expiry_alert_days
+    - stock_alert: "out" or "low" compared to min_stock_level (only for
+      items with min_stock_alert enabled)
+    - days_of_supply / forecast_alert: "running_out" if total_quantity
+      lasts RUN_OUT_ALERT_DAYS or less at the forecast daily rate (and the
+      item isn't already out or low)
+    """
+    if queryset is None:
+        queryset = PantryItem.objects.all()
+    today = today or timezone.now().date()
+
+    alert_stock = (
+        Stock.objects.filter(item=OuterRef("pk"), quantity__gt=0)
+        .filter(Q(expiry_date__isnull=True) | Q(expiry_date__gte=today))
+        .order_by(F("expiry_date").asc(nulls_last=True), "pk")
+    )
+
+    return (
+        queryset.annotate(
+            total_quantity=Coalesce(F("stock_summary__total_quantity"), 0),
+            # Summaries not yet refreshed past last night's expiries are
+            # left out rather than reported as expiring in the past
+            soonest_expiry=Case(
+                When(
+                    stock_summary__soonest_expiry__gte=today,
+                    then=F("stock_summary__soonest_expiry"),
+                ),
+                default=None,
+                output_field=DateField(),
+            ),
+            alert_unit_id=Coalesce(
+                Subquery(alert_stock.values("storage_unit_id")[:1]),
+                F("default_storage_id"),
+                output_field=IntegerField(),
+            ),
+            alert_unit_name=Coalesce(
+                Subquery(alert_stock.values("storage_unit__name")[:1]),
+                F("default_storage__name"),
+            ),
+            days_of_supply=Case(
+                When(
+                    forecast__daily_rate__gt=0,
+                    stock_summary__total_quantity__gt=0,
+                    then=ExpressionWrapper(
+                        Cast("stock_summary__total_quantity", FloatField())
+                        / F("forecast__daily_rate"),
+                        output_field=FloatField(),
+                    ),
+                ),
+                default=None,
+                output_field=FloatField(),
+            ),
+            expiry_window=ExpressionWrapper(
+                Cast("expiry_alert_days", IntegerField()) * Value(timedelta(days=1)),
+                output_field=DurationField(),
+            ),
+            time_to_expiry=ExpressionWrapper(
+                F("soonest_expiry") - Value(today), output_field=DurationField()
+            ),
+        )
+        .annotate(
+            expiry_alert=Case(
+                When(
+                    time_to_expiry__lte=F("expiry_window"), then=Value(ALERT_EXPIRING)
+                ),
+                default=Value(""),
+                output_field=CharField(),
+            ),
+            stock_alert=Case(
+                When(min_stock_alert=False, then=Value("")),
+                When(total_quantity=0, then=Value(ALERT_OUT)),
+                When(total_quantity__lt=F("min_stock_level"), then=Value(ALERT_LOW)),
+                default=Value(""),
+                output_field=CharField(),
+            ),
+        )
+        .annotate(
+            forecast_alert=Case(
+                When(~Q(stock_alert=""), then=Value("")),
+                When(
+                    days_of_supply__lte=RUN_OUT_ALERT_DAYS,
+                    then=Value(ALERT_RUNNING_OUT),
+                ),
+                default=Value(""),
+                output_field=CharField(),
+            ),
+        )
+    )
+
+
+def get_alerts(queryset=None, today=None):
+    """
+    Return a dict of alert lists keyed by alert class.
+
+    Runs exactly one query regardless of how many items or stock rows exist.
+    """
+    today = today or timezone.now().date()
+    items = (
+        annotate_alerts(queryset, today)
+        .exclude(expiry_alert="", stock_alert="", forecast_alert="")
+        .order_by(
+            F("soonest_expiry").asc(nulls_last=True),
+            F("days_of_supply").asc(nulls_last=True),
+            "name",
+        )
+    )
+
+    alerts = {ALERT_EXPIRING: [], ALERT_OUT: [], ALERT_LOW: [], ALERT_RUNNING_OUT: []}
+    for item in items:
+        if item.expiry_alert:
+            alerts[item.expiry_alert].append(item)
+        if item.stock_alert:
+            alerts[item.stock_alert].append(item)
+        if item.forecast_alert:
+            item.run_out_date = run_out_date(item.days_of_supply, today)
+            alerts[item.forecast_alert].append(item)
+    return alerts
+
+
+def _digest_lines(item):
+    """Yield (kind, signature, text) for each alert raised by an annotated item."""
+    if item.expiry_alert:
+        yield (
+            StockAlertState.KIND_EXPIRY,
+            item.soonest_expiry.isoformat(),
+            f"- {item.name}: expires {item.soonest_expiry:%Y-%m-%d}"
+            f" ({item.total_quantity} in stock)",
+        )
+    if item.stock_alert == ALERT_OUT:
+        yield (StockAlertState.KIND_STOCK, ALERT_OUT, f"- {item.name}: out of stock")
+    elif item.stock_alert == ALERT_LOW:
+        yield (
+            StockAlertState.KIND_STOCK,
+            ALERT_LOW,
+            f"- {item.name}: low stock ({item.total_quantity}"
+            f" of {item.min_stock_level})",
+        )
+
+
+def send_alert_digests(today=None):
+    """
+    Email each item owner one digest of their new pantry alerts.
+
+    Alerts are computed in one query over StockSummary, deduplicated against
+    StockAlertState so unchanged alerts are not re-sent, and delivered over
+    one pooled mail connection. Returns the number of digests sent.
+    """
+    items = (
+        annotate_alerts(PantryItem.objects.select_related("created_by"), today)
+        .exclude(expiry_alert="", stock_alert="")
+        .order_by(F("soonest_expiry").asc(nulls_last=True), "name")
+    )
+
+    current = {}
+    for item in items:
+        for kind, signature, text in _digest_lines(item):
+            current[(item.pk, kind)] = (item, signature, text)
+
+    sent = {
+        (state.item_id, state.kind): state.signature
+        for state in StockAlertState.objects.filter(
+            item_id__in={item_id for item_id, _ in current}
+        )
+    }
+
+    digests = {}
+    for key, (item, signature, text) in current.items():
+        if sent.get(key) != signature and item.created_by.email:
+            digests.setdefault(item.created_by, []).append((key, signature, text))
+
+    messages = []
+    for user, lines in digests.items():
+        count = len({item_id for (item_id, _), _, _ in lines})
+        messages.append(
+            (
+                f"Pantry alerts: {count} item{'s' if count != 1 else ''}"
+                " need attention",
+                "\n".join(text for _, _, text in lines),
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+            )
+        )
+    if messages:
+        send_mass_mail(messages, fail_silently=False, connection=get_connection())
+
+    now = timezone.now()
+    StockAlertState.objects.bulk_create(
+        [
+            StockAlertState(
+                item_id=item_id, kind=kind, signature=signature, sent_at=now
+            )
+            for lines in digests.values()
+            for (item_id, kind), signature, _ in lines
+        ],
+        update_conflicts=True,
+        unique_fields=["item", "kind"],
+        update_fields=["signature", "sent_at"],
+    )
+    for kind, _ in StockAlertState.KINDS:
+        StockAlertState.objects.filter(kind=kind).exclude(
+            item_id__in=[item_id for item_id, k in current if k == kind]
+        ).delete()
+
+    return len(messages)
@@ -1,4 +1,35 @@
+from django.urls import path
+
+from . import api_views
+
 urlpatterns = [
-    # Example placeholder
-    # path('scan/', api_views.api_barcode_scan, name='api_barcode_scan'),
+    path("", api_views.api_home, name="api_home"),
+    path("stock/", api_views.api_stock_list, name="api_stock_list"),
+    path("search/", api_views.api_pantry_search, name="api_pantry_search"),
+    path(
+        "telemetry/",
+        api_views.api_temperature_ingest,
+        name="api_temperature_ingest",
+    ),
+    path(
+        "units/<int:pk>/temperatures/",
+        api_views.api_temperature_series,
+        name="api_temperature_series",
+    ),
+    path("scan/batch/", api_views.api_barcode_batch, name="api_barcode_batch"),
+    path(
+        "items/<int:pk>/consume/",
+        api_views.api_consume_item,
+        name="api_consume_item",
+    ),
+    path(
+        "items/<int:pk>/discard-expired/",
+        api_views.api_discard_expired,
+        name="api_discard_expired",
+    ),
+    path(
+        "scan/cache-stats/",
+        api_views.api_barcode_cache_stats,
+        name="api_barcode_cache_stats",
+    ),
 ]
@@ -1,6 +1,32 @@
-from rest_framework.decorators import api_view
+import hashlib
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from .barcode_cache import cache_stats
+from .ledger import InsufficientStock, consume, discard_expired
+from .listing_cache import listing_version
+from .models import PantryItem, Stock, StorageUnit
+from .pagination import ExpiryKeysetPagination
+from .search import search_pantry
+from .serializers import (
+    BarcodeBatchSerializer,
+    ConsumeSerializer,
+    ScannedItemSerializer,
+    TemperatureBatchSerializer,
+    TemperatureSeriesSerializer,
+)
+from .telemetry import ingest_readings, temperature_series
+
 
 @api_view(["GET"])
 def api_home(request):
@@ -9,7 +35,281 @@ def api_home(request):
             "message": "Welcome to the Pantry API",
             "endpoints": [
                 "/api/pantry/scan/",
+                "/api/pantry/scan/batch/",
+                "/api/pantry/items/<id>/consume/",
+                "/api/pantry/items/<id>/discard-expired/",
                 "/api/pantry/stock/",
+                "/api/pantry/search/",
+                "/api/pantry/telemetry/",
+                "/api/pantry/units/<id>/temperatures/",
+            ],
+        }
+    )
+
+
+@api_view(["POST"])
+def api_barcode_batch(request):
+    """
+    Resolve a batch of scanned barcodes with a single query.
+
+    Repeated barcodes count as repeated scans. With ``create_stock`` set, a
+    Stock row is added for every found item in one transaction, using the
+    given ``storage_unit`` or else the item's default storage unit.
+    """
+    serializer = BarcodeBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    scans = Counter(data["barcodes"])
+    items = {
+        item.barcode: item
+        for item in PantryItem.objects.filter(barcode__in=scans).select_related(
+            "category", "default_storage__location", "stock_summary"
+        )
+    }
+    for item in items.values():
+        summary = getattr(item, "stock_summary", None)
+        item.total_quantity = summary.total_quantity if summary else 0
+        item.stock_count = summary.stock_count if summary else 0
+
+    created = []
+    skipped = []
+    if data["create_stock"]:
+        new_stocks = []
+        for barcode, item in items.items():
+            unit = data.get("storage_unit") or item.default_storage
+            if unit is None:
+                skipped.append(barcode)
+                continue
+            quantity = scans[barcode] * data["quantity"]
+            new_stocks.append(
+                Stock(
+                    item=item,
+                    storage_unit=unit,
+                    quantity=quantity,
+                    expiry_date=data.get("expiry_date"),
+                )
+            )
+            item.total_quantity += quantity
+            item.stock_count += 1
+            created.append(
+                {"barcode": barcode, "storage_unit": unit.pk, "quantity": quantity}
+            )
+        with transaction.atomic():
+            Stock.objects.bulk_create(new_stocks)
+
+    return Response(
+        {
+            "found": ScannedItemSerializer(items.values(), many=True).data,
+            "missing": [barcode for barcode in scans if barcode not in items],
+            "created": created,
+            "skipped": skipped,
+        },
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def api_barcode_cache_stats(request):
+    """Barcode lookup cache counters for the worker serving this request."""
+    return Response(cache_stats())
+
+
+@api_view(["POST"])
+def api_consume_item(request, pk):
+    """Consume stock of an item, taking from the earliest-expiring rows first."""
+    item = get_object_or_404(PantryItem, pk=pk)
+    serializer = ConsumeSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    try:
+        taken = consume(
+            item,
+            data["quantity"],
+            user=request.user,
+            storage_unit=data.get("storage_unit"),
+            note=data["note"],
+        )
+    except InsufficientStock as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+    return Response(
+        {
+            "item": item.pk,
+            "consumed": [
+                {
+                    "stock": stock.pk,
+                    "storage_unit": stock.storage_unit_id,
+                    "quantity": take,
+                    "remaining": stock.quantity,
+                }
+                for stock, take in taken
+            ],
+        }
+    )
+
+
+@api_view(["POST"])
+def api_discard_expired(request, pk):
+    """Discard an item's expired stock, logging it in the ledger."""
+    item = get_object_or_404(PantryItem, pk=pk)
+    discarded = discard_expired(item, user=request.user)
+    return Response(
+        {
+            "item": item.pk,
+            "discarded": [
+                {
+                    "stock": stock.pk,
+                    "storage_unit": stock.storage_unit_id,
+                    "quantity": quantity,
+                    "expiry_date": stock.expiry_date,
+                }
+                for stock, quantity in discarded
+            ],
+        }
+    )
+
+
+# Public field name -> ORM lookup for the stock API's ``fields=`` parameter
+STOCK_API_FIELDS = {
+    "id": "id",
+    "item": "item_id",
+    "item_name": "item__name",
+    "barcode": "item__barcode",
+    "category": "item__category__name",
+    "storage_unit": "storage_unit_id",
+    "storage_unit_name": "storage_unit__name",
+    "location": "storage_unit__location_id",
+    "location_name": "storage_unit__location__name",
+    "quantity": "quantity",
+    "expiry_date": "expiry_date",
+    "purchase_date": "purchase_date",
+    "batch_number": "batch_number",
+}
+STOCK_API_FILTERS = {
+    "location": "storage_unit__location_id",
+    "unit": "storage_unit_id",
+    "category": "item__category_id",
+    "item": "item_id",
+}
+
+
+@api_view(["GET"])
+def api_stock_list(request):
+    """
+    Keyset-paginated stock listing, soonest expiry first.
+
+    Query parameters:
+    - fields: comma-separated subset of STOCK_API_FIELDS (default: all);
+      only those columns are selected
+    - location, unit, category, item: filter by id
+    - limit / cursor: page size and the opaque cursor from ``next``
+
+    Responses carry ETag and Last-Modified from the listing version stamp
+    (see pantry.listing_cache), so polling clients get 304s without the
+    stock tables being read.
+    """
+    requested = request.query_params.get("fields")
+    fields = requested.split(",") if requested else list(STOCK_API_FIELDS)
+    unknown = [field for field in fields if field not in STOCK_API_FIELDS]
+    if unknown:
+        return Response(
+            {"fields": f"Unknown fields: {', '.join(unknown)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    filters = {}
+    for param, lookup in STOCK_API_FILTERS.items():
+        value = request.query_params.get(param)
+        if value:
+            if not value.isdigit():
+                return Response(
+                    {param: "Must be an integer id."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            filters[lookup] = int(value)
+
+    version = listing_version()
+    etag = quote_etag(
+        hashlib.md5(  # noqa: S324 - cache validator, not security
+            f"{version}:{request.get_full_path()}".encode()
+        ).hexdigest()
+    )
+    timestamp = int(version)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        return not_modified
+
+    lookups = {STOCK_API_FIELDS[field] for field in fields} | {"id", "expiry_date"}
+    queryset = Stock.objects.filter(**filters).values(*lookups)
+    rows, next_url = ExpiryKeysetPagination().paginate(queryset, request)
+
+    response = Response(
+        {
+            "results": [
+                {field: row[STOCK_API_FIELDS[field]] for field in fields}
+                for row in rows
             ],
+            "next": next_url,
         }
     )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(timestamp)
+    return response
+
+
+@api_view(["POST"])
+def api_temperature_ingest(request):
+    """
+    Store a batch of sensor readings (see TemperatureBatchSerializer).
+
+    Readings are inserted with bulk_create, so one POST can carry thousands;
+    re-sending a batch is harmless.
+    """
+    serializer = TemperatureBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    received = ingest_readings(serializer.validated_data["readings"])
+    return Response({"received": received}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+def api_temperature_series(request, pk):
+    """Chart data for a storage unit, read from the minute or hour rollups."""
+    unit = get_object_or_404(StorageUnit, pk=pk)
+    params = TemperatureSeriesSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    resolution = params.validated_data["resolution"]
+    since = timezone.now() - timedelta(hours=params.validated_data["hours"])
+    low, high = unit.temperature_range()
+    return Response(
+        {
+            "storage_unit": unit.pk,
+            "resolution": resolution,
+            "safe_range": [low, high],
+            "points": list(temperature_series(unit, resolution, since)),
+        }
+    )
+
+
+@api_view(["GET"])
+def api_pantry_search(request):
+    """
+    Typeahead/full-text item search with category and storage unit facets.
+
+    Query parameters: q, category, unit (a storage unit facet value) and
+    limit. Answered entirely from the search index.
+    """
+    try:
+        limit = int(request.query_params.get("limit", 0))
+    except ValueError:
+        limit = 0
+    return Response(
+        search_pantry(
+            request.query_params.get("q", ""),
+            category=request.query_params.get("category"),
+            storage_unit=request.query_params.get("unit"),
+            limit=limit,
+        )
+    )
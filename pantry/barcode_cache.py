@@ -0,0 +1,138 @@
+"""
+Two-level cache for PantryItem lookups by barcode.
+
+A small per-process LRU sits in front of the shared Django cache (Redis in
+production). Misses are cached too, with a shorter TTL, so repeated scans
+of unknown products don't hit the database. Entries are invalidated from
+PantryItem save/delete signals; other processes' LRUs expire on their own
+after LOCAL_TTL seconds.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+
+from .models import PantryItem
+
+KEY_PREFIX = "pantry:barcode:"
+LOCAL_MAXSIZE = 1024
+LOCAL_TTL = 30
+FOUND_TTL = 60 * 60
+MISSING_TTL = 60
+
+_MISSING = "__missing__"
+_UNSET = object()
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=LOCAL_MAXSIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LocalLRU()
+_stats = Counter()
+
+
+def _key(barcode):
+    return f"{KEY_PREFIX}{barcode}"
+
+
+def serialize_item(item):
+    return {
+        "id": item.id,
+        "name": item.name,
+        "barcode": item.barcode,
+        "min_stock_level": item.min_stock_level,
+    }
+
+
+def lookup_barcode(barcode):
+    """
+    Return the serialized PantryItem for ``barcode``, or None if unknown.
+    """
+    key = _key(barcode)
+
+    value = _local.get(key, _UNSET)
+    if value is not _UNSET:
+        _stats["local_hits"] += 1
+        return None if value == _MISSING else value
+
+    value = cache.get(key, _UNSET)
+    if value is not _UNSET:
+        _stats["shared_hits"] += 1
+        _local.set(key, value, LOCAL_TTL)
+        return None if value == _MISSING else value
+
+    _stats["misses"] += 1
+    item = PantryItem.objects.filter(barcode=barcode).first()
+    if item is None:
+        value, ttl = _MISSING, MISSING_TTL
+    else:
+        value, ttl = serialize_item(item), FOUND_TTL
+    cache.set(key, value, ttl)
+    _local.set(key, value, min(ttl, LOCAL_TTL))
+    return None if value == _MISSING else value
+
+
+def invalidate_barcodes(*barcodes):
+    """Drop cached lookups (found or missing) for the given barcodes."""
+    keys = [_key(barcode) for barcode in barcodes if barcode]
+    for key in keys:
+        _local.delete(key)
+    if keys:
+        _stats["invalidations"] += len(keys)
+        cache.delete_many(keys)
+
+
+def cache_stats():
+    """Hit/miss counters for this process."""
+    lookups = _stats["local_hits"] + _stats["shared_hits"] + _stats["misses"]
+    hits = lookups - _stats["misses"]
+    return {
+        "local_hits": _stats["local_hits"],
+        "shared_hits": _stats["shared_hits"],
+        "misses": _stats["misses"],
+        "invalidations": _stats["invalidations"],
+        "hit_ratio": round(hits / lookups, 3) if lookups else None,
+        "local_size": len(_local),
+    }
+
+
+def reset_cache_stats():
+    _stats.clear()
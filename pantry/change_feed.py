@@ -0,0 +1,231 @@
+"""
+Live Stock/PantryItem change events, fanned out per Location.
+
+Writes publish small JSON events after their transaction commits; the
+async ``change_feed`` view relays them to browsers as server-sent events.
+The backend is chosen by ``settings.PANTRY_CHANGE_FEED``:
+
+- LocalChangeFeed: in-process fan-out, used by the test suite and for
+  single-process development
+- RedisChangeFeed: Redis pub/sub, so writes from any web or Celery process
+  reach subscribers in every ASGI worker
+
+Subscribers are asyncio queues rather than threads, and each event loop
+shares one Redis connection between all of its subscribers, so a single
+worker can hold hundreds of idle kiosks.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "pantry:changes:"
+
+# Events queued for a subscriber that isn't reading; further ones are dropped
+SUBSCRIBER_BUFFER = 256
+
+
+def channel_name(location_id):
+    return f"{CHANNEL_PREFIX}{location_id}"
+
+
+class LocalChangeFeed:
+    """In-process fan-out of published events to subscriber queues."""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)  # channel -> {(loop, queue)}
+
+    def publish(self, location_id, event):
+        self._deliver(channel_name(location_id), json.dumps(event))
+
+    def _deliver(self, channel, message, loop=None):
+        with self._lock:
+            targets = [
+                (target_loop, queue)
+                for target_loop, queue in self._subscribers.get(channel, ())
+                if loop is None or target_loop is loop
+            ]
+        for target_loop, queue in targets:
+            try:
+                target_loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    async def _add(self, channels, subscriber):
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscriber)
+
+    async def _remove(self, channels, subscriber):
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+    @asynccontextmanager
+    async def subscribe(self, location_ids):
+        """Yield an asyncio.Queue of JSON event strings for the locations."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        subscriber = (asyncio.get_running_loop(), queue)
+        channels = [channel_name(location_id) for location_id in location_ids]
+        await self._add(channels, subscriber)
+        try:
+            yield queue
+        finally:
+            await self._remove(channels, subscriber)
+
+
+class RedisChangeFeed(LocalChangeFeed):
+    """Redis pub/sub transport with one shared connection per event loop."""
+
+    def __init__(self, location, **options):
+        import redis
+
+        super().__init__()
+        self._url = location
+        self._client = redis.Redis.from_url(location)
+        self._readers = {}  # loop -> (pubsub, reader task)
+        # Serializes a loop's subscribes and unsubscribes, which await Redis
+        # between checking for its reader and starting or stopping it
+        self._loop_locks = weakref.WeakKeyDictionary()
+
+    def publish(self, location_id, event):
+        self._client.publish(channel_name(location_id), json.dumps(event))
+
+    def _loop_channels(self, loop):
+        with self._lock:
+            return {
+                channel
+                for channel, subscribers in self._subscribers.items()
+                if any(target_loop is loop for target_loop, _ in subscribers)
+            }
+
+    def _loop_lock(self, loop):
+        with self._lock:
+            return self._loop_locks.setdefault(loop, asyncio.Lock())
+
+    async def _add(self, channels, subscriber):
+        import redis.asyncio
+
+        await super()._add(channels, subscriber)
+        loop = subscriber[0]
+        async with self._loop_lock(loop):
+            if loop not in self._readers:
+                pubsub = redis.asyncio.Redis.from_url(self._url).pubsub(
+                    ignore_subscribe_messages=True
+                )
+                await pubsub.subscribe(*channels)
+                task = loop.create_task(self._read(pubsub, loop))
+                self._readers[loop] = (pubsub, task)
+            else:
+                await self._readers[loop][0].subscribe(*channels)
+
+    async def _remove(self, channels, subscriber):
+        await super()._remove(channels, subscriber)
+        loop = subscriber[0]
+        async with self._loop_lock(loop):
+            if loop not in self._readers:
+                return
+            still_wanted = self._loop_channels(loop)
+            if not still_wanted:
+                pubsub, task = self._readers.pop(loop)
+                task.cancel()
+                await pubsub.aclose()
+                return
+            idle = [channel for channel in channels if channel not in still_wanted]
+            if idle:
+                await self._readers[loop][0].unsubscribe(*idle)
+
+    async def _read(self, pubsub, loop):
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                self._deliver(
+                    message["channel"].decode(), message["data"].decode(), loop
+                )
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+@cache
+def get_change_feed():
+    config = dict(settings.PANTRY_CHANGE_FEED)
+    return import_string(config.pop("BACKEND"))(**config)
+
+
+def publish_changes(events):
+    """
+    Publish (location_id, event) pairs once the current transaction commits.
+
+    Delivery is best effort: a feed outage must never fail the write that
+    triggered it.
+    """
+    events = list(events)
+    if not events:
+        return
+
+    def send():
+        feed = get_change_feed()
+        for location_id, event in events:
+            try:
+                feed.publish(location_id, event)
+            except Exception:
+                logger.warning("Could not publish pantry change", exc_info=True)
+                return
+
+    transaction.on_commit(send)
+
+
+def unit_locations(unit_ids):
+    """Map StorageUnit ids to their Location ids with one query."""
+    from .models import StorageUnit
+
+    return dict(
+        StorageUnit.objects.filter(pk__in=unit_ids).values_list("pk", "location_id")
+    )
+
+
+def stock_event(stock, action, location_id):
+    return {
+        "model": "stock",
+        "action": action,
+        "id": stock.pk,
+        "item": stock.item_id,
+        "storage_unit": stock.storage_unit_id,
+        "location": location_id,
+        "quantity": stock.quantity,
+        "expiry_date": stock.expiry_date and stock.expiry_date.isoformat(),
+    }
+
+
+def item_event(item, action, location_ids):
+    return [
+        (
+            location_id,
+            {
+                "model": "item",
+                "action": action,
+                "id": item.pk,
+                "name": item.name,
+                "location": location_id,
+            },
+        )
+        for location_id in location_ids
+    ]
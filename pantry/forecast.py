@@ -0,0 +1,149 @@
+"""
+Consumption forecasting for pantry items and storage units.
+
+Daily consumption is read from the stock ledger in one grouped query and
+laid out as a (series x day) matrix. Rates for every item and every unit
+are then fitted in a single vectorized least-squares pass over the
+cumulative consumption curves, with no per-item Python loop.
+
+Only item rates are stored: when an item runs out depends on how much is
+on hand, which changes with every restock, so run_out_date() derives it
+from the days of supply when it's read (see pantry.alerts).
+"""
+
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from scipy import sparse
+
+from .models import ItemForecast, Stock, StockMovement, StorageUnitForecast
+
+WINDOW_DAYS = 60
+MAX_FORECAST_DAYS = 3650
+
+
+def fit_daily_rates(series, days, quantities, n_series, window_days=WINDOW_DAYS):
+    """
+    Fit a daily consumption rate for each series.
+
+    ``series``, ``days`` and ``quantities`` are parallel arrays of
+    (series index, day index, amount consumed). Returns an array of
+    ``n_series`` non-negative rates: the least-squares slope of each
+    series' cumulative consumption over the window.
+    """
+    if n_series == 0:
+        return np.zeros(0)
+    usage = sparse.coo_matrix(
+        (quantities, (series, days)), shape=(n_series, window_days), dtype=float
+    ).toarray()
+    cumulative = usage.cumsum(axis=1)
+
+    t = np.arange(window_days, dtype=float)
+    t -= t.mean()
+    cumulative -= cumulative.mean(axis=1, keepdims=True)
+    slopes = cumulative @ t / (t @ t)
+    return np.clip(slopes, 0, None)
+
+
+def run_out_date(days_of_supply, today):
+    """The date stock lasting ``days_of_supply`` days runs out, or None."""
+    if days_of_supply is None:
+        return None
+    return today + timedelta(days=int(min(days_of_supply, MAX_FORECAST_DAYS)))
+
+
+def _index(ids):
+    """Map ids to dense positions; returns (id array, {id: position})."""
+    ids = np.asarray(sorted(ids), dtype=np.int64)
+    return ids, {pk: i for i, pk in enumerate(ids.tolist())}
+
+
+def forecast_consumption(today=None, window_days=WINDOW_DAYS):
+    """
+    Refit ItemForecast and StorageUnitForecast rates for the whole pantry.
+
+    Returns (items forecast, units forecast).
+    """
+    today = today or timezone.now().date()
+    start = today - timedelta(days=window_days - 1)
+    since = timezone.make_aware(datetime.combine(start, time.min))
+
+    usage = list(
+        StockMovement.objects.filter(kind=StockMovement.CONSUME, created_at__gte=since)
+        .annotate(day=TruncDate("created_at"))
+        .values_list("item_id", "storage_unit_id", "day")
+        .annotate(total=-Sum("quantity"))
+        .order_by()
+    )
+    # Items forecast before but unused since get their rate reset to 0
+    forecast_items = set(ItemForecast.objects.values_list("item_id", flat=True))
+    unit_totals = dict(
+        Stock.objects.values("storage_unit_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("storage_unit_id", "total")
+        .order_by()
+    )
+
+    if usage:
+        item_col, unit_col, day_col, qty_col = zip(*usage, strict=True)
+    else:
+        item_col = unit_col = day_col = qty_col = ()
+    day_index = np.fromiter(
+        ((day - start).days for day in day_col), dtype=np.int64, count=len(day_col)
+    )
+    amounts = np.asarray(qty_col, dtype=float)
+
+    item_ids, item_pos = _index(set(item_col) | forecast_items)
+    unit_ids, unit_pos = _index(set(unit_col) | set(unit_totals))
+
+    item_rates = fit_daily_rates(
+        np.fromiter((item_pos[pk] for pk in item_col), dtype=np.int64),
+        day_index,
+        amounts,
+        len(item_ids),
+        window_days,
+    )
+    unit_rates = fit_daily_rates(
+        np.fromiter((unit_pos[pk] for pk in unit_col), dtype=np.int64),
+        day_index,
+        amounts,
+        len(unit_ids),
+        window_days,
+    )
+
+    unit_on_hand = np.array([unit_totals.get(pk, 0) for pk in unit_ids.tolist()])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_days = np.where(unit_rates > 0, unit_on_hand / unit_rates, np.nan)
+
+    now = timezone.now()
+    ItemForecast.objects.bulk_create(
+        [
+            ItemForecast(item_id=pk, daily_rate=rate, computed_at=now)
+            for pk, rate in zip(item_ids.tolist(), item_rates.tolist(), strict=True)
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=["daily_rate", "computed_at"],
+    )
+    StorageUnitForecast.objects.bulk_create(
+        [
+            StorageUnitForecast(
+                storage_unit_id=pk,
+                daily_rate=rate,
+                days_of_supply=None if np.isnan(days) else round(days, 1),
+                computed_at=now,
+            )
+            for pk, rate, days in zip(
+                unit_ids.tolist(), unit_rates.tolist(), unit_days.tolist(), strict=True
+            )
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["storage_unit"],
+        update_fields=["daily_rate", "days_of_supply", "computed_at"],
+    )
+    return len(item_ids), len(unit_ids)
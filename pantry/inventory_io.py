@@ -0,0 +1,450 @@
+"""
+Streaming CSV / JSON Lines import and export of pantry inventory.
+
+Exports read each table with ``values().iterator(chunk_size=...)`` and
+yield one encoded line at a time, so memory stays flat however large the
+inventory is. Imports consume rows lazily and write them in chunked
+``bulk_create`` batches, each chunk in its own transaction so memory and
+lock time don't grow with the file; pantry items are upserted on their
+barcode (or id, without one) and other rows on their id, so re-running an
+import is a no-op. A row whose id belongs to a different existing row
+(say, an export loaded into another database) is refused rather than
+written over it.
+
+Related objects are referenced by natural keys where the target model has
+one (usernames, category names, item barcodes) and by id otherwise.
+"""
+
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .barcode_cache import invalidate_barcodes
+from .change_feed import item_event, publish_changes
+from .listing_cache import touch_listing
+from .models import ItemCategory, Location, PantryItem, Stock, StorageUnit
+from .rollups import invalidate_rollups
+from .search import reindex_items
+from .stock_choices import invalidate_stock_add_choices
+
+CHUNK_SIZE = 2000
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+EXPORT_FIELDS = {
+    "locations": (
+        Location,
+        ["id", "name", "address", "created_by__username"],
+    ),
+    "storage_units": (
+        StorageUnit,
+        ["id", "name", "unit_type", "location_id", "temperature", "notes"],
+    ),
+    "items": (
+        PantryItem,
+        [
+            "id",
+            "barcode",
+            "name",
+            "category__name",
+            "default_storage_id",
+            "min_stock_level",
+            "min_stock_alert",
+            "expiry_alert_days",
+            "created_by__username",
+        ],
+    ),
+    "stock": (
+        Stock,
+        [
+            "id",
+            "item__barcode",
+            "item_id",
+            "storage_unit_id",
+            "quantity",
+            "expiry_date",
+            "purchase_date",
+            "batch_number",
+        ],
+    ),
+}
+
+
+class InventoryImportError(ValueError):
+    """Raised for rows that can't be imported."""
+
+
+class _Echo:
+    """File-like object whose write() hands back the line it was given."""
+
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# --- Export ---
+
+
+def export_lines(dataset, fmt, chunk_size=CHUNK_SIZE):
+    """Yield the encoded lines (header first, for CSV) of a dataset."""
+    model, fields = EXPORT_FIELDS[dataset]
+    rows = (
+        model.objects.order_by("pk")
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow(["" if value is None else value for value in row])
+    elif fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row, strict=True)), cls=DjangoJSONEncoder)
+            yield "\n"
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}.")
+
+
+# --- Import ---
+
+
+def read_rows(fileobj, fmt):
+    """Lazily yield row dicts from an open text file."""
+    if fmt == "csv":
+        yield from csv.DictReader(fileobj)
+    elif fmt == "jsonl":
+        for line in fileobj:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}.")
+
+
+def _clean(model, row, fields):
+    """Convert raw row values with each model field's to_python()."""
+    values = {}
+    for name in fields:
+        if name not in row:
+            continue
+        field = model._meta.get_field(name)
+        value = row[name]
+        if value == "" and (field.null or field.has_default() or field.primary_key):
+            if field.null:
+                values[name] = None
+            continue
+        values[field.attname] = field.to_python(value)
+    return values
+
+
+def _reset_sequence(model):
+    """Move the pk sequence past explicitly inserted ids (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _refuse_id_clashes(model, objs, fields):
+    """
+    Raise if any of ``objs`` has the id of a stored row that differs from
+    it in ``fields``, the attributes that identify the row.
+    """
+    stored = {
+        pk: tuple(row)
+        for pk, *row in model.objects.filter(
+            pk__in=[obj.pk for obj in objs if obj.pk]
+        ).values_list("pk", *fields)
+    }
+    for obj in objs:
+        if obj.pk in stored and stored[obj.pk] != tuple(
+            getattr(obj, field) for field in fields
+        ):
+            raise InventoryImportError(
+                f"{model._meta.verbose_name.capitalize()} {obj.pk} already exists "
+                "as a different row; not overwriting it."
+            )
+
+
+def _users_by_name(chunk, default_user):
+    names = {row.get("created_by__username") for row in chunk} - {None, ""}
+    users = dict(User.objects.filter(username__in=names).values_list("username", "pk"))
+
+    def lookup(row):
+        user_id = users.get(row.get("created_by__username"))
+        if user_id is None and default_user is None:
+            raise InventoryImportError(
+                f"Unknown user {row.get('created_by__username')!r}; "
+                "pass a default user."
+            )
+        return user_id or default_user.pk
+
+    return lookup
+
+
+def import_locations(rows, default_user=None, chunk_size=CHUNK_SIZE):
+    fields = ["id", "name", "address"]
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        user_for = _users_by_name(chunk, default_user)
+        locations = [
+            Location(**_clean(Location, row, fields), created_by_id=user_for(row))
+            for row in chunk
+        ]
+        with transaction.atomic():
+            _refuse_id_clashes(Location, locations, ["name", "created_by_id"])
+            Location.objects.bulk_create(
+                locations,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["name", "address", "created_by"],
+            )
+            touch_listing()
+            invalidate_stock_add_choices()
+        count += len(chunk)
+    _reset_sequence(Location)
+    return count
+
+
+def import_storage_units(rows, default_user=None, chunk_size=CHUNK_SIZE):
+    fields = ["id", "name", "unit_type", "location", "temperature", "notes"]
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        for row in chunk:
+            row.setdefault("location", row.pop("location_id", ""))
+        units = [StorageUnit(**_clean(StorageUnit, row, fields)) for row in chunk]
+        with transaction.atomic():
+            _refuse_id_clashes(StorageUnit, units, ["location_id", "name"])
+            StorageUnit.objects.bulk_create(
+                units,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=["name", "unit_type", "location", "temperature", "notes"],
+            )
+            touch_listing()
+            invalidate_stock_add_choices()
+        count += len(chunk)
+    _reset_sequence(StorageUnit)
+    return count
+
+
+def _items_imported(item_ids, created_ids, barcodes):
+    """
+    Do for upserted items what post_save would have: drop their cached
+    barcode lookups, queue their search documents, drop the location
+    rollups and stock entry choices, move the stock listing version on and
+    announce them on the change feed.
+    """
+    barcodes = list(barcodes)
+    transaction.on_commit(lambda: invalidate_barcodes(*barcodes))
+    reindex_items(item_ids)
+    invalidate_rollups()
+    touch_listing()
+    invalidate_stock_add_choices()
+
+    names = {}
+    locations = defaultdict(set)
+    for pk, name, default_location, stock_location in PantryItem.objects.filter(
+        pk__in=item_ids
+    ).values_list(
+        "pk",
+        "name",
+        "default_storage__location_id",
+        "stocks__storage_unit__location_id",
+    ):
+        names[pk] = name
+        locations[pk].update({default_location, stock_location} - {None})
+    publish_changes(
+        event
+        for pk, name in names.items()
+        for event in item_event(
+            PantryItem(pk=pk, name=name),
+            "created" if pk in created_ids else "updated",
+            locations[pk],
+        )
+    )
+
+
+def import_items(rows, default_user=None, chunk_size=CHUNK_SIZE):
+    """
+    Upsert pantry items on barcode, or on id for items without one; rows
+    with neither are inserted.
+    """
+    fields = [
+        "barcode",
+        "name",
+        "default_storage",
+        "min_stock_level",
+        "min_stock_alert",
+        "expiry_alert_days",
+    ]
+    update_fields = [*fields[1:], "category", "created_by"]
+    count = 0
+    inserted_ids = False
+    for chunk in chunked(rows, chunk_size):
+        names = {row.get("category__name") for row in chunk} - {None, ""}
+        ItemCategory.objects.bulk_create(
+            [ItemCategory(name=name) for name in names], ignore_conflicts=True
+        )
+        categories = dict(
+            ItemCategory.objects.filter(name__in=names).values_list("name", "pk")
+        )
+        user_for = _users_by_name(chunk, default_user)
+
+        items = []
+        for row in chunk:
+            row.setdefault("default_storage", row.pop("default_storage_id", ""))
+            item = PantryItem(
+                **_clean(PantryItem, row, fields),
+                category_id=categories.get(row.get("category__name")),
+                created_by_id=user_for(row),
+            )
+            if not item.barcode and row.get("id"):
+                item.pk = PantryItem._meta.pk.to_python(row["id"])
+            items.append(item)
+
+        keyed = [item for item in items if item.barcode]
+        by_id = [item for item in items if not item.barcode and item.pk]
+        new = [item for item in items if not item.barcode and not item.pk]
+        barcodes = [item.barcode for item in keyed]
+        with transaction.atomic():
+            _refuse_id_clashes(PantryItem, by_id, ["barcode", "name"])
+            existing = set(
+                PantryItem.objects.filter(barcode__in=barcodes).values_list(
+                    "pk", flat=True
+                )
+            ) | set(
+                PantryItem.objects.filter(
+                    pk__in=[item.pk for item in by_id]
+                ).values_list("pk", flat=True)
+            )
+            PantryItem.objects.bulk_create(
+                keyed,
+                update_conflicts=True,
+                unique_fields=["barcode"],
+                update_fields=update_fields,
+            )
+            PantryItem.objects.bulk_create(
+                by_id,
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=update_fields,
+            )
+            PantryItem.objects.bulk_create(new)
+            inserted_ids = inserted_ids or bool(by_id)
+
+            item_ids = {
+                *PantryItem.objects.filter(barcode__in=barcodes).values_list(
+                    "pk", flat=True
+                ),
+                *(item.pk for item in by_id + new),
+            }
+            _items_imported(item_ids, item_ids - existing, barcodes)
+        count += len(items)
+    if inserted_ids:
+        _reset_sequence(PantryItem)
+    return count
+
+
+STOCK_FIELDS = [
+    "id",
+    "storage_unit",
+    "quantity",
+    "expiry_date",
+    "purchase_date",
+    "batch_number",
+]
+
+
+def _stock_items(chunk):
+    """Resolve each row's item by barcode, or by item_id without one."""
+    barcodes = {row.get("item__barcode") for row in chunk} - {None, ""}
+    by_barcode = dict(
+        PantryItem.objects.filter(barcode__in=barcodes).values_list("barcode", "pk")
+    )
+    ids = {
+        PantryItem._meta.pk.to_python(row["item_id"])
+        for row in chunk
+        if not row.get("item__barcode") and row.get("item_id")
+    }
+    by_id = set(PantryItem.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+    def lookup(row):
+        barcode = row.get("item__barcode")
+        if barcode:
+            if barcode not in by_barcode:
+                raise InventoryImportError(f"No pantry item with barcode {barcode!r}.")
+            return by_barcode[barcode]
+        item_id = row.get("item_id")
+        if not item_id or PantryItem._meta.pk.to_python(item_id) not in by_id:
+            raise InventoryImportError(f"No pantry item with id {item_id!r}.")
+        return PantryItem._meta.pk.to_python(item_id)
+
+    return lookup
+
+
+def import_stock(rows, default_user=None, chunk_size=CHUNK_SIZE):
+    """
+    Import stock rows, resolving their item by barcode (or item_id).
+
+    Per chunk, new rows are inserted with one bulk_create and the existing
+    rows that changed are written with one bulk_update, whose ledger
+    adjustments StockQuerySet.update records in one bulk_create. Unchanged
+    rows aren't written, so re-running an import writes nothing. An id
+    that already belongs to stock of another item is refused.
+    """
+    fields = ["item_id", "storage_unit_id", *STOCK_FIELDS[2:]]
+    count = 0
+    inserted_ids = False
+    for chunk in chunked(rows, chunk_size):
+        item_for = _stock_items(chunk)
+        stocks = []
+        for row in chunk:
+            row.setdefault("storage_unit", row.pop("storage_unit_id", ""))
+            stocks.append(
+                Stock(**_clean(Stock, row, STOCK_FIELDS), item_id=item_for(row))
+            )
+
+        with transaction.atomic():
+            _refuse_id_clashes(Stock, stocks, ["item_id"])
+            existing = Stock.objects.in_bulk([stock.pk for stock in stocks if stock.pk])
+            new = [stock for stock in stocks if stock.pk not in existing]
+            changed = [
+                stock
+                for stock in stocks
+                if stock.pk in existing
+                and any(
+                    getattr(existing[stock.pk], field) != getattr(stock, field)
+                    for field in fields
+                )
+            ]
+            Stock.objects.bulk_create(new)
+            Stock.objects.bulk_update(
+                changed, [field.removesuffix("_id") for field in fields]
+            )
+        inserted_ids = inserted_ids or any(stock.pk for stock in new)
+        count += len(stocks)
+    if inserted_ids:
+        _reset_sequence(Stock)
+    return count
+
+
+IMPORTERS = {
+    "locations": import_locations,
+    "storage_units": import_storage_units,
+    "items": import_items,
+    "stock": import_stock,
+}
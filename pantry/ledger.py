@@ -0,0 +1,354 @@
+"""
+Stock movement ledger.
+
+Every change to Stock is recorded as a StockMovement: single saves and
+deletes through pantry.signals, bulk inserts and updates through
+StockQuerySet, and consume/move/discard through the operations below,
+which update Stock rows in place under a row lock.
+"""
+
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import PantryItem, Stock, StockMovement, StockSnapshot, StorageUnit
+
+
+class InsufficientStock(Exception):
+    """Raised when a consume or move asks for more than is on hand."""
+
+
+def record_purchases(stocks, user=None, note=""):
+    """Record a purchase movement for each newly created Stock row."""
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                item_id=stock.item_id,
+                storage_unit_id=stock.storage_unit_id,
+                stock_id=stock.pk,
+                kind=StockMovement.PURCHASE,
+                quantity=stock.quantity,
+                created_by=user,
+                note=note,
+            )
+            for stock in stocks
+            if stock.quantity
+        ]
+    )
+
+
+def record_movement(stock, kind, quantity, user=None, note=""):
+    """Record a single movement against an existing Stock row."""
+    if quantity:
+        StockMovement.objects.create(
+            item_id=stock.item_id,
+            storage_unit_id=stock.storage_unit_id,
+            stock_id=stock.pk,
+            kind=kind,
+            quantity=quantity,
+            created_by=user,
+            note=note,
+        )
+
+
+def record_adjustments(before, after):
+    """
+    Record adjustments for bulk-updated Stock rows.
+
+    ``before`` and ``after`` map stock ids to (item_id, storage_unit_id,
+    quantity). A row re-pointed to another item or unit leaves its old
+    balance and joins the new one.
+    """
+    movements = []
+    for pk, (item_id, unit_id, quantity) in after.items():
+        old_item, old_unit, old_quantity = before[pk]
+        if (old_item, old_unit) != (item_id, unit_id):
+            changes = [
+                (old_item, old_unit, -old_quantity),
+                (item_id, unit_id, quantity),
+            ]
+        else:
+            changes = [(item_id, unit_id, quantity - old_quantity)]
+        movements.extend(
+            StockMovement(
+                item_id=item,
+                storage_unit_id=unit,
+                stock_id=pk,
+                kind=StockMovement.ADJUST,
+                quantity=delta,
+            )
+            for item, unit, delta in changes
+            if delta
+        )
+    StockMovement.objects.bulk_create(movements)
+
+
+def record_removal(stock, quantity):
+    """
+    Record a discard for a deleted Stock row once the transaction commits.
+
+    Skipped when the item or unit went with it (a cascading delete), since
+    their movements are deleted as well.
+    """
+    item_id, unit_id = stock.item_id, stock.storage_unit_id
+
+    def record():
+        if (
+            PantryItem.objects.filter(pk=item_id).exists()
+            and StorageUnit.objects.filter(pk=unit_id).exists()
+        ):
+            StockMovement.objects.create(
+                item_id=item_id,
+                storage_unit_id=unit_id,
+                kind=StockMovement.DISCARD,
+                quantity=-quantity,
+                note="Stock row deleted",
+            )
+
+    if quantity:
+        transaction.on_commit(record)
+
+
+def consume(item, quantity, user=None, storage_unit=None, note=""):
+    """
+    Take ``quantity`` of ``item`` from the earliest-expiring stock first.
+
+    The candidate rows are locked with one select_for_update query, updated
+    with one bulk_update and logged with one bulk_create. Returns the list
+    of (stock, quantity taken) pairs.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive.")
+
+    with transaction.atomic():
+        stocks = Stock.objects.select_for_update().filter(item=item, quantity__gt=0)
+        if storage_unit is not None:
+            stocks = stocks.filter(storage_unit=storage_unit)
+        stocks = stocks.order_by(
+            F("expiry_date").asc(nulls_last=True), "purchase_date", "pk"
+        )
+
+        taken = []
+        remaining = quantity
+        for stock in stocks:
+            take = min(stock.quantity, remaining)
+            stock.quantity -= take
+            taken.append((stock, take))
+            remaining -= take
+            if not remaining:
+                break
+
+        if remaining:
+            raise InsufficientStock(
+                f"Only {quantity - remaining} of {item} available, "
+                f"{quantity} requested."
+            )
+
+        _record_taken(taken, StockMovement.CONSUME, user, note)
+    return taken
+
+
+def _record_taken(taken, kind, user, note):
+    """Save the reduced rows of (stock, quantity taken) pairs and log them."""
+    Stock.objects.ledger_recorded().bulk_update(
+        [stock for stock, _ in taken], ["quantity"]
+    )
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                item_id=stock.item_id,
+                storage_unit_id=stock.storage_unit_id,
+                stock_id=stock.pk,
+                kind=kind,
+                quantity=-take,
+                created_by=user,
+                note=note,
+            )
+            for stock, take in taken
+        ]
+    )
+
+
+def move(stock, to_unit, quantity=None, user=None, note=""):
+    """
+    Move ``quantity`` (default: all) of a Stock row to another unit.
+
+    Merges into an existing row in the target unit with the same item,
+    expiry and batch number, otherwise creates one. Returns the target row.
+    """
+    with transaction.atomic():
+        stock = Stock.objects.select_for_update().get(pk=stock.pk)
+        quantity = stock.quantity if quantity is None else quantity
+        if quantity <= 0:
+            raise ValueError("Quantity must be positive.")
+        if quantity > stock.quantity:
+            raise InsufficientStock(
+                f"Only {stock.quantity} of {stock.item} available, "
+                f"{quantity} requested."
+            )
+
+        target = (
+            Stock.objects.select_for_update()
+            .filter(
+                item_id=stock.item_id,
+                storage_unit=to_unit,
+                expiry_date=stock.expiry_date,
+                batch_number=stock.batch_number,
+            )
+            .first()
+        )
+        if target is None:
+            target = Stock(
+                item_id=stock.item_id,
+                storage_unit=to_unit,
+                quantity=0,
+                expiry_date=stock.expiry_date,
+                purchase_date=stock.purchase_date,
+                batch_number=stock.batch_number,
+            )
+        target.quantity += quantity
+        stock.quantity -= quantity
+
+        # Both saves are logged below as a pair of move movements
+        stock._ledger_recorded = True
+        target._ledger_recorded = True
+        stock.save(update_fields=["quantity"])
+        target.save()
+
+        record_movement(stock, StockMovement.MOVE, -quantity, user, note)
+        record_movement(target, StockMovement.MOVE, quantity, user, note)
+    return target
+
+
+def discard(stock, quantity=None, user=None, note=""):
+    """Remove ``quantity`` (default: all) of a Stock row, e.g. on expiry."""
+    with transaction.atomic():
+        stock = Stock.objects.select_for_update().get(pk=stock.pk)
+        quantity = stock.quantity if quantity is None else quantity
+        if quantity > stock.quantity:
+            raise InsufficientStock(
+                f"Only {stock.quantity} of {stock.item} available, "
+                f"{quantity} requested."
+            )
+        stock.quantity -= quantity
+        stock._ledger_recorded = True
+        stock.save(update_fields=["quantity"])
+        record_movement(stock, StockMovement.DISCARD, -quantity, user, note)
+    return stock
+
+
+def discard_expired(item, user=None, today=None, note="Expired"):
+    """
+    Discard all of ``item``'s stock that expired before ``today``.
+
+    Locks, updates and logs the rows in one query each, like consume().
+    Returns the list of (stock, quantity discarded) pairs.
+    """
+    today = today or timezone.now().date()
+    with transaction.atomic():
+        stocks = Stock.objects.select_for_update().filter(
+            item=item, quantity__gt=0, expiry_date__lt=today
+        )
+        taken = []
+        for stock in stocks.order_by("expiry_date", "pk"):
+            taken.append((stock, stock.quantity))
+            stock.quantity = 0
+        if taken:
+            _record_taken(taken, StockMovement.DISCARD, user, note)
+    return taken
+
+
+def snapshot_ledger():
+    """
+    Fold movements recorded since the last run into StockSnapshot.
+
+    Only the new movements are aggregated, so each run costs O(new rows)
+    rather than a replay of the full history. Returns the number of
+    (item, unit) balances touched.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # Wait for in-flight movement inserts to commit, and hold off new
+            # ones until this run ends. Otherwise a movement given a pk below
+            # the watermark but committed after it was read would never be
+            # folded in. SQLite already serializes writers.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {StockMovement._meta.db_table} IN SHARE MODE"
+                )
+        last = (
+            StockSnapshot.objects.aggregate(last=Max("through_movement_id"))["last"]
+            or 0
+        )
+        high = StockMovement.objects.aggregate(high=Max("pk"))["high"] or 0
+        if high <= last:
+            return 0
+
+        deltas = (
+            StockMovement.objects.filter(pk__gt=last, pk__lte=high)
+            .values("item_id", "storage_unit_id")
+            .annotate(delta=Sum("quantity"))
+            .order_by()
+        )
+        balances = {
+            (row["item_id"], row["storage_unit_id"]): row["delta"] for row in deltas
+        }
+        existing = {
+            (snap.item_id, snap.storage_unit_id): snap
+            for snap in StockSnapshot.objects.filter(
+                item_id__in={item_id for item_id, _ in balances}
+            )
+        }
+        snapshots = []
+        for (item_id, unit_id), delta in balances.items():
+            snap = existing.get((item_id, unit_id))
+            snapshots.append(
+                StockSnapshot(
+                    item_id=item_id,
+                    storage_unit_id=unit_id,
+                    quantity=(snap.quantity if snap else 0) + delta,
+                    through_movement_id=high,
+                )
+            )
+        StockSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=["item", "storage_unit"],
+            update_fields=["quantity", "through_movement_id", "updated_at"],
+        )
+        StockSnapshot.objects.filter(through_movement_id__lt=high).update(
+            through_movement_id=high
+        )
+    return len(snapshots)
+
+
+def ledger_quantities(items=None):
+    """
+    Derive on-hand quantity per (item_id, storage_unit_id) from the ledger.
+
+    Reads the snapshot balances plus only the movements recorded after
+    them. ``items`` optionally restricts the result to some PantryItems.
+    """
+    snapshots = StockSnapshot.objects.all()
+    movements = StockMovement.objects.all()
+    if items is not None:
+        snapshots = snapshots.filter(item__in=items)
+        movements = movements.filter(item__in=items)
+
+    through = (
+        StockSnapshot.objects.aggregate(last=Max("through_movement_id"))["last"] or 0
+    )
+    quantities = defaultdict(int)
+    for snap in snapshots.values("item_id", "storage_unit_id", "quantity"):
+        quantities[(snap["item_id"], snap["storage_unit_id"])] += snap["quantity"]
+    recent = (
+        movements.filter(pk__gt=through)
+        .values("item_id", "storage_unit_id")
+        .annotate(delta=Sum("quantity"))
+        .order_by()
+    )
+    for row in recent:
+        quantities[(row["item_id"], row["storage_unit_id"])] += row["delta"]
+    return dict(quantities)
@@ -0,0 +1,38 @@
+"""
+Version stamp behind the stock API's ETag and Last-Modified headers.
+
+The stamp is the time of the last write to anything a stock listing row
+shows: stock (through its StockSummary refresh) and the items, categories,
+storage units and locations whose names it carries. Writes move it on once
+they commit, from pantry.signals and the bulk paths that skip signals, so
+a conditional GET is answered from one cache read instead of scanning the
+tables. A stamp lost from the cache restarts at the current time, which
+only costs clients one full response.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "pantry:stock-listing-version"
+
+
+def listing_version():
+    """Return the stamp, as Unix seconds."""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def touch_listing():
+    """Move the stamp on once the current transaction commits."""
+
+    def touch():
+        # Always forward, even if this process's clock lags the last writer's
+        current = cache.get(VERSION_KEY) or 0
+        cache.set(VERSION_KEY, max(time.time(), current + 0.001), timeout=None)
+
+    transaction.on_commit(touch)
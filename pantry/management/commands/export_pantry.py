@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from pantry.inventory_io import CHUNK_SIZE, EXPORT_FIELDS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream a pantry dataset to CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORT_FIELDS))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--output", help="File to write to (defaults to standard output)."
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            options["dataset"], options["format"], options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from pantry.summaries import rebuild_stock_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized per-item StockSummary table from Stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of pantry items to recompute per query.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_stock_summaries(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} stock summaries."))
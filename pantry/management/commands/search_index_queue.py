@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from pantry.search_queue import index_queue_status, process_index_queue
+
+
+class Command(BaseCommand):
+    help = "Report the queued search index updates and how far behind they are."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--process",
+            action="store_true",
+            help="Apply the queued updates now instead of waiting for Celery.",
+        )
+
+    def handle(self, *args, **options):
+        if options["process"]:
+            applied = process_index_queue()
+            if applied is None:
+                self.stdout.write(
+                    self.style.WARNING("Another worker is processing the queue.")
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Applied {applied} queued index updates.")
+                )
+
+        status = index_queue_status()
+        if not status["pending"]:
+            self.stdout.write(self.style.SUCCESS("Search index queue is empty."))
+            return
+        self.stdout.write(
+            f"{status['pending']} pending updates, oldest queued"
+            f" {status['oldest']:%Y-%m-%d %H:%M:%S}"
+            f" (lag {status['lag'].total_seconds():.0f}s)"
+        )
+        for model, count in sorted(status["by_model"].items()):
+            self.stdout.write(f"  {model}: {count}")
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def populate_stock_summaries(apps, schema_editor):
+    Stock = apps.get_model("pantry", "Stock")
+    StockSummary = apps.get_model("pantry", "StockSummary")
+    totals = (
+        Stock.objects.values("item_id")
+        .annotate(
+            total=Sum("quantity"),
+            count=Count("pk"),
+            soonest=Min("expiry_date", filter=Q(quantity__gt=0)),
+        )
+        .order_by()
+    )
+    StockSummary.objects.bulk_create(
+        StockSummary(
+            item_id=row["item_id"],
+            total_quantity=row["total"] or 0,
+            stock_count=row["count"],
+            soonest_expiry=row["soonest"],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0005_alter_location_address_alter_stock_batch_number_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSummary",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stock_summary",
+                        serialize=False,
+                        to="pantry.pantryitem",
+                    ),
+                ),
+                ("total_quantity", models.PositiveIntegerField(default=0)),
+                ("stock_count", models.PositiveIntegerField(default=0)),
+                ("soonest_expiry", models.DateField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "Stock summaries",
+            },
+        ),
+        migrations.RunPython(populate_stock_summaries, migrations.RunPython.noop),
+    ]
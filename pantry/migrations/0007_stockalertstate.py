@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0006_stocksummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockAlertState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("expiry", "Expiry"), ("stock", "Stock level")],
+                        max_length=10,
+                    ),
+                ),
+                ("signature", models.CharField(max_length=50)),
+                ("sent_at", models.DateTimeField()),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_states",
+                        to="pantry.pantryitem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("item", "kind"), name="unique_stock_alert_state"
+                    )
+                ],
+            },
+        ),
+    ]
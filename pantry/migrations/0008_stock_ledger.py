@@ -0,0 +1,155 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    Stock = apps.get_model("pantry", "Stock")
+    StockMovement = apps.get_model("pantry", "StockMovement")
+    StockMovement.objects.bulk_create(
+        StockMovement(
+            item_id=stock.item_id,
+            storage_unit_id=stock.storage_unit_id,
+            stock_id=stock.pk,
+            kind="adjust",
+            quantity=stock.quantity,
+            note="Opening balance",
+        )
+        for stock in Stock.objects.filter(quantity__gt=0).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0007_stockalertstate"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("purchase", "Purchase"),
+                            ("consume", "Consume"),
+                            ("move", "Move"),
+                            ("discard", "Discard"),
+                            ("adjust", "Adjustment"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("note", models.CharField(blank=True, max_length=200)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="pantry.pantryitem",
+                    ),
+                ),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="movements",
+                        to="pantry.stock",
+                    ),
+                ),
+                (
+                    "storage_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="pantry.storageunit",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-pk"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "created_at"],
+                        name="pantry_stoc_item_id_666ba3_idx",
+                    ),
+                    models.Index(
+                        fields=["storage_unit", "created_at"],
+                        name="pantry_stoc_storage_c7f177_idx",
+                    ),
+                    models.Index(
+                        fields=["kind", "created_at"],
+                        name="pantry_stoc_kind_f86928_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.IntegerField(default=0)),
+                ("through_movement_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="pantry.pantryitem",
+                    ),
+                ),
+                (
+                    "storage_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="pantry.storageunit",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("item", "storage_unit"), name="unique_stock_snapshot"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
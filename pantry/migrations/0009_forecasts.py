@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0008_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemForecast",
+            fields=[
+                (
+                    "item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="forecast",
+                        serialize=False,
+                        to="pantry.pantryitem",
+                    ),
+                ),
+                ("daily_rate", models.FloatField(default=0)),
+                ("run_out_date", models.DateField(blank=True, null=True)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StorageUnitForecast",
+            fields=[
+                (
+                    "storage_unit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="forecast",
+                        serialize=False,
+                        to="pantry.storageunit",
+                    ),
+                ),
+                ("daily_rate", models.FloatField(default=0)),
+                ("days_of_supply", models.FloatField(blank=True, null=True)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+    ]
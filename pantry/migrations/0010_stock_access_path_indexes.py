@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0009_forecasts"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["expiry_date", "quantity"], name="stock_expiry_qty_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["expiry_date"],
+                name="stock_in_stock_expiry_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                condition=models.Q(("quantity", 0)),
+                fields=["item"],
+                name="stock_empty_item_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                fields=["storage_unit", "item"], name="stock_unit_item_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0010_stock_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="storageunit",
+            name="max_temperature",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=1,
+                help_text="Highest safe temperature in °C (blank: default for the type)",
+                max_digits=5,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="storageunit",
+            name="min_temperature",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=1,
+                help_text="Lowest safe temperature in °C (blank: default for the type)",
+                max_digits=5,
+                null=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="TemperatureExcursion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField()),
+                ("ended_at", models.DateTimeField(blank=True, null=True)),
+                ("peak_celsius", models.FloatField()),
+                (
+                    "storage_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="temperature_excursions",
+                        to="pantry.storageunit",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-started_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("ended_at__isnull", True)),
+                        fields=("storage_unit",),
+                        name="one_open_temperature_excursion",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TemperatureReading",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("recorded_at", models.DateTimeField()),
+                ("celsius", models.FloatField()),
+                (
+                    "storage_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="temperature_readings",
+                        to="pantry.storageunit",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["recorded_at"], name="temp_reading_time_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("storage_unit", "recorded_at"),
+                        name="unique_temperature_reading",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TemperatureRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("minute", "1 minute"), ("hour", "1 hour")],
+                        max_length=10,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("minimum", models.FloatField()),
+                ("maximum", models.FloatField()),
+                ("total", models.FloatField()),
+                ("count", models.PositiveIntegerField()),
+                (
+                    "storage_unit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="temperature_rollups",
+                        to="pantry.storageunit",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["resolution", "bucket_start"],
+                        name="temp_rollup_bucket_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("storage_unit", "resolution", "bucket_start"),
+                        name="unique_temperature_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
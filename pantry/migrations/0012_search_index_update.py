@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0011_temperature_telemetry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchIndexUpdate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=100)),
+                ("object_pk", models.CharField(max_length=64)),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[("update", "Update"), ("delete", "Delete")],
+                        max_length=10,
+                    ),
+                ),
+                ("queued_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("model", "object_pk"), name="unique_search_index_update"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:10
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Min, Q, Sum
+
+
+def refresh_fresh_stock(apps, schema_editor):
+    Stock = apps.get_model("pantry", "Stock")
+    StockSummary = apps.get_model("pantry", "StockSummary")
+    today = date.today()
+    totals = (
+        Stock.objects.values("item_id")
+        .annotate(
+            fresh=Sum(
+                "quantity",
+                filter=Q(expiry_date__isnull=True) | Q(expiry_date__gte=today),
+            ),
+            soonest=Min(
+                "expiry_date", filter=Q(quantity__gt=0, expiry_date__gte=today)
+            ),
+        )
+        .order_by()
+    )
+    StockSummary.objects.bulk_update(
+        [
+            StockSummary(
+                item_id=row["item_id"],
+                fresh_quantity=row["fresh"] or 0,
+                soonest_expiry=row["soonest"],
+            )
+            for row in totals
+        ],
+        ["fresh_quantity", "soonest_expiry"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0012_search_index_update"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stocksummary",
+            name="fresh_quantity",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(refresh_fresh_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 09:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0013_stocksummary_fresh_quantity"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="itemforecast",
+            name="run_out_date",
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0014_remove_itemforecast_run_out_date"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="stock",
+            name="stock_in_stock_expiry_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="stock",
+            name="stock_empty_item_idx",
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                condition=models.Q(("quantity__gt", 0)),
+                fields=["item", "expiry_date", "id"],
+                name="stock_in_stock_item_expiry_idx",
+            ),
+        ),
+    ]
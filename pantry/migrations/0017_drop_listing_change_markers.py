@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pantry", "0016_listing_change_markers"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="itemcategory",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="location",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="pantryitem",
+            name="updated_at",
+        ),
+        migrations.RemoveField(
+            model_name="storageunit",
+            name="updated_at",
+        ),
+    ]
@@ -23,6 +23,12 @@ class StorageUnit(models.Model):
         ("pantry", "Pantry"),
     ]
 
+    # Safe range in °C by unit type, used when min/max_temperature are unset
+    DEFAULT_TEMPERATURE_RANGES = {
+        "freezer": (None, -15),
+        "refrigerator": (0, 5),
+    }
+
     name = models.CharField(max_length=100)
     unit_type = models.CharField(max_length=20, choices=UNIT_TYPES)
     location = models.ForeignKey(
@@ -31,11 +37,37 @@ class StorageUnit(models.Model):
     temperature = models.DecimalField(
         max_digits=5, decimal_places=1, blank=True, null=True
     )
+    min_temperature = models.DecimalField(
+        max_digits=5,
+        decimal_places=1,
+        blank=True,
+        null=True,
+        help_text="Lowest safe temperature in °C (blank: default for the type)",
+    )
+    max_temperature = models.DecimalField(
+        max_digits=5,
+        decimal_places=1,
+        blank=True,
+        null=True,
+        help_text="Highest safe temperature in °C (blank: default for the type)",
+    )
     notes = models.TextField(blank=True)
 
     def __str__(self):
         return f"{self.get_unit_type_display()} - {self.name} ({self.location})"
 
+    def temperature_range(self):
+        """Return the (low, high) safe range in °C; either end may be None."""
+        low, high = self.DEFAULT_TEMPERATURE_RANGES.get(self.unit_type, (None, None))
+        if self.min_temperature is not None:
+            low = self.min_temperature
+        if self.max_temperature is not None:
+            high = self.max_temperature
+        return (
+            None if low is None else float(low),
+            None if high is None else float(high),
+        )
+
 
 class ItemCategory(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -71,6 +103,94 @@ class PantryItem(models.Model):
         return self.name
 
 
+class StockQuerySet(models.QuerySet):
+    """
+    Keeps the ledger, StockSummary and the change feed current for bulk
+    operations, which bypass the post_save/post_delete signals handled in
+    pantry.signals.
+    """
+
+    _ledger_recorded = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._ledger_recorded = self._ledger_recorded
+        return clone
+
+    def ledger_recorded(self):
+        """Skip ledger entries for writes the caller logs itself."""
+        clone = self._chain()
+        clone._ledger_recorded = True
+        return clone
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .change_feed import publish_changes, stock_event, unit_locations
+        from .ledger import record_purchases
+        from .summaries import refresh_stock_summaries
+
+        created = super().bulk_create(objs, *args, **kwargs)
+        if not self._ledger_recorded:
+            record_purchases(created)
+        refresh_stock_summaries({stock.item_id for stock in created})
+        locations = unit_locations({stock.storage_unit_id for stock in created})
+        publish_changes(
+            (
+                locations[stock.storage_unit_id],
+                stock_event(stock, "created", locations[stock.storage_unit_id]),
+            )
+            for stock in created
+        )
+        return created
+
+    def update(self, **kwargs):
+        from django.db import transaction
+
+        from .change_feed import publish_changes
+        from .ledger import record_adjustments
+        from .summaries import refresh_stock_summaries
+
+        fields = ("item_id", "storage_unit_id", "quantity", "storage_unit__location_id")
+        with transaction.atomic(using=self.db):
+            # Rows (and their stored balances) as they were and as they are,
+            # read under a lock so nothing changes them in between
+            before = {
+                pk: row
+                for pk, *row in self.select_for_update()
+                .values_list("pk", *fields)
+                .order_by()
+            }
+            rows = super().update(**kwargs)
+            after = {
+                pk: row
+                for pk, *row in self.model._base_manager.using(self.db)
+                .filter(pk__in=list(before))
+                .values_list("pk", *fields)
+                .order_by()
+            }
+            if not self._ledger_recorded:
+                record_adjustments(
+                    {pk: row[:3] for pk, row in before.items()},
+                    {pk: row[:3] for pk, row in after.items()},
+                )
+
+        states = [*before.values(), *after.values()]
+        item_ids = {item_id for item_id, *_ in states}
+        refresh_stock_summaries(item_ids)
+        publish_changes(
+            (
+                location_id,
+                {
+                    "model": "stock",
+                    "action": "bulk_updated",
+                    "items": sorted(item_ids),
+                    "location": location_id,
+                },
+            )
+            for location_id in {state[3] for state in states}
+        )
+        return rows
+
+
 class Stock(models.Model):
     item = models.ForeignKey(
         PantryItem, on_delete=models.CASCADE, related_name="stocks"
@@ -83,8 +203,23 @@ class Stock(models.Model):
     purchase_date = models.DateField(default=date.today)
     batch_number = models.CharField(max_length=100, blank=True)
 
+    objects = StockQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Stock"
+        indexes = [
+            # StockAdmin ordering, expiry range scans and keyset pages of the
+            # stock API (see ExpiryKeysetPagination)
+            models.Index(fields=["expiry_date", "id"], name="stock_expiry_id_idx"),
+            # Alerts, FIFO consumption: an item's on-hand stock, soonest first
+            models.Index(
+                fields=["item", "expiry_date", "id"],
+                name="stock_in_stock_item_expiry_idx",
+                condition=models.Q(quantity__gt=0),
+            ),
+            # Unit contents and per-unit item lookups
+            models.Index(fields=["storage_unit", "item"], name="stock_unit_item_idx"),
+        ]
 
     def __str__(self):
         return f"{self.item.name} - {self.quantity} in {self.storage_unit}"
@@ -96,3 +231,318 @@ class Stock(models.Model):
         if not self.expiry_date:
             return None
         return (self.expiry_date - date.today()).days
+
+
+class StockSummary(models.Model):
+    """
+    Denormalized per-item stock totals, maintained by pantry.summaries.
+
+    ``total_quantity`` counts all stock on hand; ``fresh_quantity`` and
+    ``soonest_expiry`` only the stock that hadn't expired when the row was
+    refreshed. Rows whose soonest_expiry has since passed are refreshed
+    daily by refresh_expired_stock_summaries.
+
+    Rebuild from scratch with ``manage.py rebuild_stock_summary``.
+    """
+
+    item = models.OneToOneField(
+        PantryItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stock_summary",
+    )
+    total_quantity = models.PositiveIntegerField(default=0)
+    fresh_quantity = models.PositiveIntegerField(default=0)
+    stock_count = models.PositiveIntegerField(default=0)
+    soonest_expiry = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Stock summaries"
+
+    def __str__(self):
+        return f"{self.item} - {self.total_quantity} in {self.stock_count} rows"
+
+
+class StockAlertState(models.Model):
+    """
+    Last alert sent for an item, so digests don't repeat unchanged alerts.
+
+    Rows are removed once the alert condition clears, letting it fire again
+    if it comes back.
+    """
+
+    KIND_EXPIRY = "expiry"
+    KIND_STOCK = "stock"
+    KINDS = [
+        (KIND_EXPIRY, "Expiry"),
+        (KIND_STOCK, "Stock level"),
+    ]
+
+    item = models.ForeignKey(
+        PantryItem, on_delete=models.CASCADE, related_name="alert_states"
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    signature = models.CharField(max_length=50)
+    sent_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["item", "kind"], name="unique_stock_alert_state"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.item} - {self.kind}: {self.signature}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of stock changes, one row per (stock row, change).
+
+    ``quantity`` is signed: positive for stock coming in, negative for stock
+    going out. Current quantities are derived from the latest StockSnapshot
+    plus the movements recorded after it (see pantry.ledger).
+    """
+
+    PURCHASE = "purchase"
+    CONSUME = "consume"
+    MOVE = "move"
+    DISCARD = "discard"
+    ADJUST = "adjust"
+    KINDS = [
+        (PURCHASE, "Purchase"),
+        (CONSUME, "Consume"),
+        (MOVE, "Move"),
+        (DISCARD, "Discard"),
+        (ADJUST, "Adjustment"),
+    ]
+
+    item = models.ForeignKey(
+        PantryItem, on_delete=models.CASCADE, related_name="movements"
+    )
+    storage_unit = models.ForeignKey(
+        StorageUnit, on_delete=models.CASCADE, related_name="movements"
+    )
+    stock = models.ForeignKey(
+        Stock,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movements",
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ["-created_at", "-pk"]
+        indexes = [
+            models.Index(fields=["item", "created_at"]),
+            models.Index(fields=["storage_unit", "created_at"]),
+            models.Index(fields=["kind", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.item}"
+
+
+class StockSnapshot(models.Model):
+    """
+    Compacted ledger balance per (item, storage unit).
+
+    Holds the sum of all movements up to and including
+    ``through_movement_id``.
+    """
+
+    item = models.ForeignKey(
+        PantryItem, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    storage_unit = models.ForeignKey(
+        StorageUnit, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    quantity = models.IntegerField(default=0)
+    through_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["item", "storage_unit"], name="unique_stock_snapshot"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.item} - {self.quantity} in {self.storage_unit}"
+
+
+class ItemForecast(models.Model):
+    """
+    Forecast daily consumption rate, from pantry.forecast. The run-out date
+    follows from the quantity on hand (see pantry.forecast.run_out_date).
+    """
+
+    item = models.OneToOneField(
+        PantryItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="forecast",
+    )
+    daily_rate = models.FloatField(default=0)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.item} - {self.daily_rate:.2f}/day"
+
+
+class StorageUnitForecast(models.Model):
+    """Forecast days of supply left in a storage unit, from pantry.forecast."""
+
+    storage_unit = models.OneToOneField(
+        StorageUnit,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="forecast",
+    )
+    daily_rate = models.FloatField(default=0)
+    days_of_supply = models.FloatField(blank=True, null=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.storage_unit} - {self.days_of_supply} days"
+
+
+class TemperatureReading(models.Model):
+    """
+    Raw sensor reading for a StorageUnit.
+
+    Pruned after TEMPERATURE_RAW_RETENTION (see pantry.telemetry); charts
+    and alerts read TemperatureRollup instead.
+    """
+
+    storage_unit = models.ForeignKey(
+        StorageUnit, on_delete=models.CASCADE, related_name="temperature_readings"
+    )
+    recorded_at = models.DateTimeField()
+    celsius = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Lets sensors safely resend a batch after a failed POST
+            models.UniqueConstraint(
+                fields=["storage_unit", "recorded_at"],
+                name="unique_temperature_reading",
+            )
+        ]
+        indexes = [models.Index(fields=["recorded_at"], name="temp_reading_time_idx")]
+
+    def __str__(self):
+        return f"{self.storage_unit} @ {self.recorded_at:%Y-%m-%d %H:%M:%S}"
+
+
+class TemperatureRollup(models.Model):
+    """Min/max/mean temperature of a StorageUnit over a minute or an hour."""
+
+    MINUTE = "minute"
+    HOUR = "hour"
+    RESOLUTIONS = [
+        (MINUTE, "1 minute"),
+        (HOUR, "1 hour"),
+    ]
+
+    storage_unit = models.ForeignKey(
+        StorageUnit, on_delete=models.CASCADE, related_name="temperature_rollups"
+    )
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    # Sum and count rather than the mean, so hours roll up exactly from minutes
+    total = models.FloatField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["storage_unit", "resolution", "bucket_start"],
+                name="unique_temperature_rollup",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["resolution", "bucket_start"], name="temp_rollup_bucket_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.storage_unit} {self.resolution} @ {self.bucket_start}"
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class TemperatureExcursion(models.Model):
+    """
+    A period during which a StorageUnit's temperature left its safe range.
+
+    An open excursion (no ended_at) means the owner has already been alerted.
+    """
+
+    storage_unit = models.ForeignKey(
+        StorageUnit, on_delete=models.CASCADE, related_name="temperature_excursions"
+    )
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField(null=True, blank=True)
+    peak_celsius = models.FloatField()
+
+    class Meta:
+        ordering = ["-started_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["storage_unit"],
+                condition=models.Q(ended_at__isnull=True),
+                name="one_open_temperature_excursion",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.storage_unit}: {self.peak_celsius} °C from {self.started_at}"
+
+
+class SearchIndexUpdate(models.Model):
+    """
+    A search document waiting to be refreshed or removed.
+
+    Queued by pantry.search_queue.QueuedSignalProcessor in the same
+    transaction as the change, and applied in batches by the
+    process_search_index_queue task. There is one row per object, so
+    repeated saves coalesce into a single index write.
+    """
+
+    UPDATE = "update"
+    DELETE = "delete"
+    ACTIONS = [
+        (UPDATE, "Update"),
+        (DELETE, "Delete"),
+    ]
+
+    model = models.CharField(max_length=100)  # app_label.model_name
+    object_pk = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    queued_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "object_pk"], name="unique_search_index_update"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model}.{self.object_pk}"
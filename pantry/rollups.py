@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Stock, StorageUnit
+
+ROLLUP_CACHE_KEY = "pantry:location-rollups"
+# Safety net only: stock, item and unit writes invalidate the cache directly
+ROLLUP_CACHE_SECONDS = 60 * 60
+
+ROLLUP_FIELDS = ("items", "units", "expiring", "expired")
+
+
+def empty_rollup():
+    return dict.fromkeys(ROLLUP_FIELDS, 0)
+
+
+def compute_rollups(today=None):
+    """
+    Aggregate stock per StorageUnit and per Location.
+
+    Returns ``{"units": {unit_id: rollup}, "locations": {location_id: rollup}}``
+    where each rollup holds:
+    - items: distinct PantryItems with stock on hand
+    - units: total quantity on hand
+    - expiring: in-stock rows expiring within their item's expiry_alert_days
+    - expired: in-stock rows past their expiry date
+
+    Location rollups also carry ``storage_units``, the number of units.
+
+    Stock is read in one query grouped by (storage unit, item), which keeps
+    distinct-item counts exact at both levels of the tree.
+    """
+    today = today or timezone.now().date()
+    in_stock = Q(quantity__gt=0)
+    rows = (
+        Stock.objects.alias(
+            time_to_expiry=ExpressionWrapper(
+                F("expiry_date") - Value(today), output_field=DurationField()
+            ),
+            expiry_window=ExpressionWrapper(
+                Cast("item__expiry_alert_days", IntegerField())
+                * Value(timedelta(days=1)),
+                output_field=DurationField(),
+            ),
+        )
+        .values("storage_unit_id", "storage_unit__location_id", "item_id")
+        .annotate(
+            total=Sum("quantity"),
+            expiring=Count(
+                "pk",
+                filter=in_stock
+                & Q(expiry_date__gte=today, time_to_expiry__lte=F("expiry_window")),
+            ),
+            expired=Count("pk", filter=in_stock & Q(expiry_date__lt=today)),
+        )
+        .order_by()
+    )
+
+    units = {}
+    locations = {
+        location_id: {**empty_rollup(), "storage_units": count}
+        for location_id, count in StorageUnit.objects.values("location_id")
+        .annotate(count=Count("pk"))
+        .values_list("location_id", "count")
+        .order_by()
+    }
+    location_items = defaultdict(set)
+    for row in rows:
+        location_id = row["storage_unit__location_id"]
+        unit = units.setdefault(row["storage_unit_id"], empty_rollup())
+        if row["total"] > 0:
+            unit["items"] += 1
+            location_items[location_id].add(row["item_id"])
+        for rollup in (unit, locations[location_id]):
+            rollup["units"] += row["total"]
+            rollup["expiring"] += row["expiring"]
+            rollup["expired"] += row["expired"]
+    for location_id, item_ids in location_items.items():
+        locations[location_id]["items"] = len(item_ids)
+    return {"units": units, "locations": locations}
+
+
+def get_rollups(today=None):
+    """Return compute_rollups() for today, from the cache when possible."""
+    today = today or timezone.now().date()
+    cached = cache.get(ROLLUP_CACHE_KEY)
+    if cached is not None and cached["date"] == today:
+        return cached["rollups"]
+    rollups = compute_rollups(today)
+    cache.set(
+        ROLLUP_CACHE_KEY, {"date": today, "rollups": rollups}, ROLLUP_CACHE_SECONDS
+    )
+    return rollups
+
+
+def location_rollup(rollups, location_id):
+    return rollups["locations"].get(location_id) or {
+        **empty_rollup(),
+        "storage_units": 0,
+    }
+
+
+def unit_rollup(rollups, unit_id):
+    return rollups["units"].get(unit_id) or empty_rollup()
+
+
+def invalidate_rollups():
+    """Drop cached rollups once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(ROLLUP_CACHE_KEY))
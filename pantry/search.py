@@ -0,0 +1,58 @@
+from haystack.inputs import AutoQuery
+from haystack.query import SQ, SearchQuerySet
+
+from .models import PantryItem
+from .search_queue import queue_index_updates
+
+SEARCH_RESULT_LIMIT = 20
+MAX_SEARCH_RESULTS = 100
+
+
+def search_pantry(query="", category=None, storage_unit=None, limit=None):
+    """
+    Search pantry items through the PantryItemIndex.
+
+    ``query`` matches name prefixes (for typeahead) as well as full words in
+    the barcode, category, storage units, locations and batch numbers.
+    ``category`` and ``storage_unit`` narrow to a facet value. Returns the
+    total count, the first ``limit`` results and facet counts, all read from
+    the search index.
+    """
+    limit = min(limit or SEARCH_RESULT_LIMIT, MAX_SEARCH_RESULTS)
+    results = SearchQuerySet().models(PantryItem)
+    query = query.strip()
+    if query:
+        results = results.filter(SQ(name_auto=query) | SQ(content=AutoQuery(query)))
+    for field, value in (("category", category), ("storage_units", storage_unit)):
+        if value:
+            results = results.narrow(f'{field}_exact:"{results.query.clean(value)}"')
+    results = results.facet("category").facet("storage_units")
+
+    facets = results.facet_counts().get("fields", {})
+    return {
+        "count": results.count(),
+        "results": [
+            {
+                "id": int(result.pk),
+                "name": result.name,
+                "barcode": result.barcode,
+                "category": result.category,
+                "storage_units": result.storage_units or [],
+                "total_quantity": result.total_quantity,
+                "soonest_expiry": result.soonest_expiry,
+            }
+            for result in results[:limit]
+        ],
+        "facets": {
+            name: [(value, count) for value, count in facets.get(field, []) if value]
+            for name, field in (
+                ("category", "category"),
+                ("storage_unit", "storage_units"),
+            )
+        },
+    }
+
+
+def reindex_items(item_ids):
+    """Queue a refresh of the search documents of items whose stock changed."""
+    queue_index_updates(PantryItem, item_ids)
@@ -0,0 +1,77 @@
+from django.db.models import Prefetch
+from haystack import indexes
+
+from .models import PantryItem, Stock
+
+
+class PantryItemIndex(indexes.SearchIndex, indexes.Indexable):
+    """
+    One search document per PantryItem.
+
+    Besides the item itself, the document carries its category and, from
+    stock on hand, the storage units, locations and batch numbers it sits
+    in, so searches are answered from the index without reading Stock.
+    """
+
+    text = indexes.CharField(document=True, use_template=True)
+    name = indexes.CharField(model_attr="name")
+    # Prefix matching for typeahead
+    name_auto = indexes.EdgeNgramField(model_attr="name")
+    barcode = indexes.CharField(model_attr="barcode", null=True)
+    category = indexes.CharField(model_attr="category__name", null=True, faceted=True)
+    storage_units = indexes.MultiValueField(faceted=True)
+    locations = indexes.MultiValueField()
+    batch_numbers = indexes.MultiValueField()
+    total_quantity = indexes.IntegerField(default=0)
+    soonest_expiry = indexes.DateField(null=True)
+
+    def get_model(self):
+        return PantryItem
+
+    def index_queryset(self, using=None):
+        return PantryItem.objects.select_related(
+            "category", "stock_summary"
+        ).prefetch_related(
+            Prefetch(
+                "stocks",
+                queryset=Stock.objects.filter(quantity__gt=0).select_related(
+                    "storage_unit__location"
+                ),
+                to_attr="stock_on_hand",
+            )
+        )
+
+    def read_queryset(self, using=None):
+        return PantryItem.objects.select_related("category")
+
+    def prepare(self, obj):
+        # Instances saved through the signal processor aren't prefetched
+        if not hasattr(obj, "stock_on_hand"):
+            obj.stock_on_hand = list(
+                obj.stocks.filter(quantity__gt=0).select_related(
+                    "storage_unit__location"
+                )
+            )
+        return super().prepare(obj)
+
+    def prepare_storage_units(self, obj):
+        return sorted({storage_unit_label(s.storage_unit) for s in obj.stock_on_hand})
+
+    def prepare_locations(self, obj):
+        return sorted({s.storage_unit.location.name for s in obj.stock_on_hand})
+
+    def prepare_batch_numbers(self, obj):
+        return sorted({s.batch_number for s in obj.stock_on_hand if s.batch_number})
+
+    def prepare_total_quantity(self, obj):
+        summary = getattr(obj, "stock_summary", None)
+        return summary.total_quantity if summary else 0
+
+    def prepare_soonest_expiry(self, obj):
+        summary = getattr(obj, "stock_summary", None)
+        return summary.soonest_expiry if summary else None
+
+
+def storage_unit_label(unit):
+    """Facet value for a storage unit; unit names repeat across locations."""
+    return f"{unit.location.name} / {unit.name}"
@@ -0,0 +1,156 @@
+"""
+Queued Haystack signal processing.
+
+Saving or deleting an indexed model only records a (model, pk) row in
+SearchIndexUpdate, once its transaction commits. The
+process_search_index_queue task later applies the queued rows in batches,
+under a cache lock, so a single writer holds the Whoosh index and web
+requests never wait on it.
+"""
+
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, signals
+from django.utils import timezone
+from haystack import connection_router, connections
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+
+from .models import SearchIndexUpdate
+
+INDEX_WRITER_LOCK = "pantry:search-index-writer"
+# Lock expiry, in case a worker dies while holding it
+INDEX_WRITER_LOCK_SECONDS = 10 * 60
+INDEX_BATCH_SIZE = 500
+
+
+def queue_index_updates(model, pks, action=SearchIndexUpdate.UPDATE):
+    """
+    Queue search documents of ``model`` for update (or deletion) once the
+    current transaction commits.
+
+    Stamping queued_at only after the change is visible matters: a worker
+    that read the pre-commit state must not then match the entry with its
+    ``queued_at__lte=started`` delete and drop it.
+    """
+    label = model._meta.label_lower
+    pks = {str(pk) for pk in pks if pk is not None}
+    if not pks:
+        return
+
+    def queue():
+        now = timezone.now()
+        SearchIndexUpdate.objects.bulk_create(
+            [
+                SearchIndexUpdate(
+                    model=label, object_pk=pk, action=action, queued_at=now
+                )
+                for pk in pks
+            ],
+            update_conflicts=True,
+            unique_fields=["model", "object_pk"],
+            update_fields=["action", "queued_at"],
+        )
+
+    transaction.on_commit(queue)
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """Drop-in replacement for RealtimeSignalProcessor that queues changes."""
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+
+    def is_indexed(self, model):
+        return any(
+            model in self.connections[using].get_unified_index().get_indexed_models()
+            for using in self.connection_router.for_write()
+        )
+
+    def handle_save(self, sender, instance, **kwargs):
+        if self.is_indexed(sender):
+            queue_index_updates(sender, [instance.pk])
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if self.is_indexed(sender):
+            queue_index_updates(sender, [instance.pk], SearchIndexUpdate.DELETE)
+
+
+def apply_index_updates(queued):
+    """Write a batch of SearchIndexUpdate rows to every search backend."""
+    pending = defaultdict(lambda: defaultdict(set))
+    for row in queued:
+        pending[row.model][row.action].add(row.object_pk)
+
+    for label, actions in pending.items():
+        model = apps.get_model(label)
+        for using in connection_router.for_write():
+            try:
+                index = connections[using].get_unified_index().get_index(model)
+            except NotHandled:
+                continue
+            backend = connections[using].get_backend()
+            updates = actions[SearchIndexUpdate.UPDATE]
+            objects = list(index.index_queryset(using=using).filter(pk__in=updates))
+            if objects:
+                backend.update(index, objects)
+            # Gone, or no longer in index_queryset
+            removed = actions[SearchIndexUpdate.DELETE] | (
+                updates - {str(obj.pk) for obj in objects}
+            )
+            for pk in removed:
+                backend.remove(f"{label}.{pk}")
+
+
+def process_index_queue(batch_size=INDEX_BATCH_SIZE):
+    """
+    Apply queued index updates until the queue is empty.
+
+    Returns the number of rows applied, or None if another worker holds the
+    writer lock. Rows re-queued while a batch is being written are kept for
+    the next pass.
+    """
+    if not cache.add(INDEX_WRITER_LOCK, True, INDEX_WRITER_LOCK_SECONDS):
+        return None
+    try:
+        applied = 0
+        while True:
+            started = timezone.now()
+            batch = list(SearchIndexUpdate.objects.order_by("queued_at")[:batch_size])
+            if not batch:
+                break
+            apply_index_updates(batch)
+            SearchIndexUpdate.objects.filter(
+                pk__in=[row.pk for row in batch], queued_at__lte=started
+            ).delete()
+            applied += len(batch)
+            if len(batch) < batch_size:
+                break
+        return applied
+    finally:
+        cache.delete(INDEX_WRITER_LOCK)
+
+
+def index_queue_status(now=None):
+    """Return pending counts per model and the age of the oldest entry."""
+    now = now or timezone.now()
+    queued = SearchIndexUpdate.objects.order_by()
+    oldest = queued.order_by("queued_at").values_list("queued_at", flat=True).first()
+    return {
+        "pending": queued.count(),
+        "by_model": dict(
+            queued.values("model")
+            .annotate(count=Count("pk"))
+            .values_list("model", "count")
+        ),
+        "oldest": oldest,
+        "lag": now - oldest if oldest else None,
+    }
@@ -0,0 +1,130 @@
+import math
+from datetime import UTC, datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from .models import PantryItem, StorageUnit, TemperatureRollup
+
+MAX_BATCH_BARCODES = 500
+MAX_TELEMETRY_READINGS = 10000
+# Tolerated sensor clock drift into the future
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class BarcodeBatchSerializer(serializers.Serializer):
+    """Input for the batch barcode scan endpoint."""
+
+    barcodes = serializers.ListField(
+        child=serializers.CharField(max_length=50, trim_whitespace=True),
+        allow_empty=False,
+        max_length=MAX_BATCH_BARCODES,
+    )
+    create_stock = serializers.BooleanField(default=False)
+    storage_unit = serializers.PrimaryKeyRelatedField(
+        queryset=StorageUnit.objects.all(), required=False, allow_null=True
+    )
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    expiry_date = serializers.DateField(required=False, allow_null=True)
+
+
+class StorageUnitSummarySerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source="get_unit_type_display")
+    location = serializers.CharField(source="location.name")
+
+    class Meta:
+        model = StorageUnit
+        fields = ["id", "name", "type", "location"]
+
+
+class ScannedItemSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source="category.name", default=None)
+    default_storage = StorageUnitSummarySerializer(allow_null=True)
+    total_quantity = serializers.IntegerField()
+    stock_count = serializers.IntegerField()
+
+    class Meta:
+        model = PantryItem
+        fields = [
+            "id",
+            "name",
+            "barcode",
+            "category",
+            "min_stock_level",
+            "default_storage",
+            "total_quantity",
+            "stock_count",
+        ]
+
+
+class ConsumeSerializer(serializers.Serializer):
+    """Input for consuming an item's stock, earliest expiry first."""
+
+    quantity = serializers.IntegerField(min_value=1)
+    storage_unit = serializers.PrimaryKeyRelatedField(
+        queryset=StorageUnit.objects.all(), required=False, allow_null=True
+    )
+    note = serializers.CharField(max_length=200, required=False, default="")
+
+
+class TemperatureBatchSerializer(serializers.Serializer):
+    """
+    Input for the telemetry ingestion endpoint.
+
+    ``readings`` is a list of compact ``[storage_unit_id, timestamp, celsius]``
+    triples; timestamps are Unix seconds or ISO 8601 strings. The triples are
+    checked in one pass rather than through a nested serializer per reading,
+    which would dominate the cost of large batches.
+    """
+
+    readings = serializers.ListField(
+        allow_empty=False, max_length=MAX_TELEMETRY_READINGS
+    )
+
+    def validate_readings(self, value):
+        latest_allowed = timezone.now() + MAX_CLOCK_SKEW
+        readings = []
+        for index, reading in enumerate(value):
+            try:
+                unit_id, timestamp, celsius = reading
+                unit_id = int(unit_id)
+                celsius = float(celsius)
+                if isinstance(timestamp, int | float):
+                    recorded_at = datetime.fromtimestamp(timestamp, tz=UTC)
+                else:
+                    recorded_at = parse_datetime(timestamp)
+                    if timezone.is_naive(recorded_at):
+                        recorded_at = timezone.make_aware(recorded_at, UTC)
+            except (TypeError, ValueError, OverflowError, AttributeError) as e:
+                raise serializers.ValidationError(
+                    f"Reading {index}: expected [storage_unit, timestamp, celsius]."
+                ) from e
+            if not math.isfinite(celsius):
+                raise serializers.ValidationError(
+                    f"Reading {index}: celsius must be a finite number."
+                )
+            if recorded_at > latest_allowed:
+                raise serializers.ValidationError(
+                    f"Reading {index}: timestamp is in the future."
+                )
+            readings.append((unit_id, recorded_at, celsius))
+
+        unit_ids = {unit_id for unit_id, _, _ in readings}
+        unknown = unit_ids - set(
+            StorageUnit.objects.filter(pk__in=unit_ids).values_list("pk", flat=True)
+        )
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown storage units: {', '.join(map(str, sorted(unknown)))}."
+            )
+        return readings
+
+
+class TemperatureSeriesSerializer(serializers.Serializer):
+    """Query parameters for a storage unit's temperature chart."""
+
+    resolution = serializers.ChoiceField(
+        choices=TemperatureRollup.RESOLUTIONS, default=TemperatureRollup.HOUR
+    )
+    hours = serializers.IntegerField(min_value=1, max_value=24 * 365, default=24)
@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .barcode_cache import invalidate_barcodes
+from .change_feed import item_event, publish_changes, stock_event, unit_locations
+from .ledger import record_movement, record_removal
+from .listing_cache import touch_listing
+from .models import (
+    ItemCategory,
+    Location,
+    PantryItem,
+    Stock,
+    StockMovement,
+    StorageUnit,
+)
+from .rollups import invalidate_rollups
+from .search import reindex_items
+from .stock_choices import invalidate_stock_add_choices
+from .summaries import schedule_stock_summary_refresh, stock_summaries_refreshed
+
+
+@receiver(pre_save, sender=Stock)
+def remember_stock_state(sender, instance, **kwargs):
+    """Load the stored item, unit and quantity to diff against after saving."""
+    instance._stored_state = None
+    if instance.pk and not getattr(instance, "_ledger_recorded", False):
+        instance._stored_state = (
+            Stock.objects.filter(pk=instance.pk)
+            .values_list("item_id", "storage_unit_id", "quantity")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Stock)
+def stock_saved(sender, instance, created, **kwargs):
+    stored = getattr(instance, "_stored_state", None)
+    schedule_stock_summary_refresh({instance.item_id, stored and stored[0]})
+
+    if getattr(instance, "_ledger_recorded", False):
+        # Already logged by a pantry.ledger operation
+        instance._ledger_recorded = False
+    elif created or stored is None:
+        record_movement(instance, StockMovement.PURCHASE, instance.quantity)
+    elif stored[:2] != (instance.item_id, instance.storage_unit_id):
+        # Re-pointed row: take it out of the old balance, add to the new one
+        StockMovement.objects.create(
+            item_id=stored[0],
+            storage_unit_id=stored[1],
+            stock=instance,
+            kind=StockMovement.ADJUST,
+            quantity=-stored[2],
+        )
+        record_movement(instance, StockMovement.ADJUST, instance.quantity)
+    else:
+        record_movement(instance, StockMovement.ADJUST, instance.quantity - stored[2])
+
+    # A row moved between locations is announced to both
+    locations = unit_locations({instance.storage_unit_id, stored and stored[1]})
+    event = stock_event(
+        instance,
+        "created" if created else "updated",
+        locations[instance.storage_unit_id],
+    )
+    publish_changes((location_id, event) for location_id in set(locations.values()))
+
+
+@receiver(post_delete, sender=Stock)
+def stock_deleted(sender, instance, **kwargs):
+    schedule_stock_summary_refresh({instance.item_id})
+    record_removal(instance, instance.quantity)
+
+    location_id = unit_locations({instance.storage_unit_id}).get(
+        instance.storage_unit_id
+    )
+    if location_id is not None:
+        publish_changes([(location_id, stock_event(instance, "deleted", location_id))])
+
+
+@receiver(post_init, sender=PantryItem)
+def remember_item_barcode(sender, instance, **kwargs):
+    """Track the loaded barcode so a changed barcode invalidates both keys."""
+    instance._loaded_barcode = instance.__dict__.get("barcode")
+
+
+@receiver(post_save, sender=PantryItem)
+@receiver(post_delete, sender=PantryItem)
+def invalidate_barcode_cache(sender, instance, **kwargs):
+    # After commit, or a concurrent lookup could re-cache the old row
+    barcodes = (instance.barcode, getattr(instance, "_loaded_barcode", None))
+    transaction.on_commit(lambda: invalidate_barcodes(*barcodes))
+    instance._loaded_barcode = instance.barcode
+
+
+@receiver(post_save, sender=PantryItem)
+@receiver(post_delete, sender=PantryItem)
+def announce_item_change(sender, instance, created=False, **kwargs):
+    """Announce item edits wherever the item is stocked or normally kept."""
+    if kwargs["signal"] is post_delete:
+        action = "deleted"
+    else:
+        action = "created" if created else "updated"
+    location_ids = (
+        StorageUnit.objects.filter(
+            Q(stocks__item_id=instance.pk) | Q(pk=instance.default_storage_id)
+        )
+        .values_list("location_id", flat=True)
+        .distinct()
+    )
+    publish_changes(item_event(instance, action, location_ids))
+
+
+@receiver(stock_summaries_refreshed)
+@receiver(post_save, sender=PantryItem)
+@receiver(post_save, sender=StorageUnit)
+@receiver(post_delete, sender=StorageUnit)
+def invalidate_location_rollups(sender, **kwargs):
+    """Stock, expiry windows and unit placement feed the location rollups."""
+    invalidate_rollups()
+
+
+@receiver(stock_summaries_refreshed)
+def reindex_restocked_items(sender, item_ids, **kwargs):
+    """Item documents carry stock totals, locations and expiry."""
+    reindex_items(item_ids)
+
+
+@receiver(stock_summaries_refreshed)
+@receiver(post_save, sender=PantryItem)
+@receiver(post_delete, sender=PantryItem)
+@receiver(post_save, sender=ItemCategory)
+@receiver(post_delete, sender=ItemCategory)
+@receiver(post_save, sender=StorageUnit)
+@receiver(post_delete, sender=StorageUnit)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def touch_stock_listing(sender, **kwargs):
+    """Stock and the names shown beside it feed the stock API's validators."""
+    touch_listing()
+
+
+@receiver(post_save, sender=ItemCategory)
+@receiver(pre_delete, sender=ItemCategory)
+def reindex_category_items(sender, instance, created=False, **kwargs):
+    """Item documents carry their category's name (and facet on it)."""
+    if not created:
+        reindex_items(
+            PantryItem.objects.filter(category=instance).values_list("pk", flat=True)
+        )
+
+
+@receiver(post_save, sender=StorageUnit)
+def reindex_unit_items(sender, instance, created, **kwargs):
+    """Item documents carry the labels of the units their stock is in."""
+    if not created:
+        reindex_items(
+            Stock.objects.filter(storage_unit=instance, quantity__gt=0)
+            .values_list("item_id", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=Location)
+def reindex_location_items(sender, instance, created, **kwargs):
+    """Unit labels include their location's name."""
+    if not created:
+        reindex_items(
+            Stock.objects.filter(storage_unit__location=instance, quantity__gt=0)
+            .values_list("item_id", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=PantryItem)
+@receiver(post_delete, sender=PantryItem)
+@receiver(post_save, sender=ItemCategory)
+@receiver(post_delete, sender=ItemCategory)
+@receiver(post_save, sender=StorageUnit)
+@receiver(post_delete, sender=StorageUnit)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_stock_choices(sender, **kwargs):
+    invalidate_stock_add_choices()
@@ -0,0 +1,46 @@
+"""
+Cached item and storage unit choices for the stock entry form.
+
+The form offers every item and unit in select boxes. Reading and ordering
+the whole catalogue on each render (including every re-render after a
+validation error) would dominate the page, so the choices are kept in the
+shared cache as plain values and dropped, once the write commits, when an
+item, category, unit or location changes.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import PantryItem, StorageUnit
+
+CHOICES_CACHE_KEY = "pantry:stock-add-choices"
+# Safety net only: catalogue writes invalidate the cache directly
+CHOICES_CACHE_SECONDS = 60 * 60
+
+UNIT_TYPES = dict(StorageUnit.UNIT_TYPES)
+
+
+def stock_add_choices():
+    """Return ``{"items": [...], "units": [...]}`` as lists of dicts."""
+    choices = cache.get(CHOICES_CACHE_KEY)
+    if choices is None:
+        choices = {
+            "items": list(
+                PantryItem.objects.order_by("name", "pk").values(
+                    "pk", "name", "category__name"
+                )
+            ),
+            "units": [
+                {**unit, "unit_type_display": UNIT_TYPES.get(unit["unit_type"])}
+                for unit in StorageUnit.objects.order_by(
+                    "location__name", "location_id", "name", "pk"
+                ).values("pk", "name", "unit_type", "location__name")
+            ],
+        }
+        cache.set(CHOICES_CACHE_KEY, choices, CHOICES_CACHE_SECONDS)
+    return choices
+
+
+def invalidate_stock_add_choices():
+    """Drop cached choices once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(CHOICES_CACHE_KEY))
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import PantryItem, Stock, StockSummary
+
+SUMMARY_FIELDS = [
+    "total_quantity",
+    "fresh_quantity",
+    "stock_count",
+    "soonest_expiry",
+    "updated_at",
+]
+
+# Sent with ``item_ids`` after their StockSummary rows change, for caches
+# and search documents that depend on what's in stock
+stock_summaries_refreshed = Signal()
+
+
+def refresh_stock_summaries(item_ids, today=None):
+    """
+    Recompute StockSummary rows for the given PantryItem ids.
+
+    Uses one grouped query over Stock plus one upsert, however many items
+    are passed in. Every stock write passes through here, so
+    stock_summaries_refreshed is sent here for whatever depends on stock
+    (see pantry.signals).
+    """
+    item_ids = {pk for pk in item_ids if pk is not None}
+    if not item_ids:
+        return 0
+
+    now = timezone.now()
+    today = today or now.date()
+    summaries = {
+        pk: StockSummary(item_id=pk, updated_at=now)
+        for pk in PantryItem.objects.filter(pk__in=item_ids).values_list(
+            "pk", flat=True
+        )
+    }
+    totals = (
+        Stock.objects.filter(item_id__in=summaries)
+        .values("item_id")
+        .annotate(
+            total=Sum("quantity"),
+            fresh=Sum(
+                "quantity",
+                filter=Q(expiry_date__isnull=True) | Q(expiry_date__gte=today),
+            ),
+            count=Count("pk"),
+            soonest=Min(
+                "expiry_date", filter=Q(quantity__gt=0, expiry_date__gte=today)
+            ),
+        )
+        .order_by()
+    )
+    for row in totals:
+        summary = summaries[row["item_id"]]
+        summary.total_quantity = row["total"] or 0
+        summary.fresh_quantity = row["fresh"] or 0
+        summary.stock_count = row["count"]
+        summary.soonest_expiry = row["soonest"]
+
+    StockSummary.objects.bulk_create(
+        summaries.values(),
+        update_conflicts=True,
+        unique_fields=["item"],
+        update_fields=SUMMARY_FIELDS,
+    )
+    stock_summaries_refreshed.send(sender=StockSummary, item_ids=set(summaries))
+    return len(summaries)
+
+
+def schedule_stock_summary_refresh(item_ids):
+    """Refresh summaries once the current transaction commits."""
+    item_ids = set(item_ids)
+    transaction.on_commit(lambda: refresh_stock_summaries(item_ids))
+
+
+def refresh_expired_stock_summaries(today=None):
+    """
+    Refresh the summaries whose soonest_expiry has passed, so their fresh
+    quantity and soonest expiry leave out the stock that expired since.
+    """
+    today = today or timezone.now().date()
+    return refresh_stock_summaries(
+        StockSummary.objects.filter(soonest_expiry__lt=today).values_list(
+            "item_id", flat=True
+        ),
+        today,
+    )
+
+
+def rebuild_stock_summaries(batch_size=1000):
+    """Rebuild every StockSummary from scratch, batch_size items at a time."""
+    StockSummary.objects.exclude(item_id__in=PantryItem.objects.values("pk")).delete()
+
+    item_ids = PantryItem.objects.order_by("pk").values_list("pk", flat=True)
+    batch = []
+    rebuilt = 0
+    for pk in item_ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            rebuilt += refresh_stock_summaries(batch)
+            batch = []
+    rebuilt += refresh_stock_summaries(batch)
+    return rebuilt
@@ -0,0 +1,88 @@
+# pantry/tasks.py
+
+from celery import shared_task
+
+from .alerts import send_alert_digests
+from .forecast import forecast_consumption
+from .ledger import snapshot_ledger
+from .search_queue import process_index_queue
+from .summaries import refresh_expired_stock_summaries
+from .telemetry import prune_temperature_history, rollup_hours, rollup_minutes
+
+
+@shared_task
+def send_pantry_alert_digests():
+    """
+    Periodic task: email each user a digest of new expiry and stock alerts.
+    """
+    sent = send_alert_digests()
+    print(f"Sent {sent} pantry alert digests.")
+
+
+@shared_task
+def refresh_expired_summaries():
+    """
+    Periodic task: drop stock that expired overnight from the summaries'
+    fresh quantities and soonest expiry dates.
+    """
+    refreshed = refresh_expired_stock_summaries()
+    print(f"Refreshed {refreshed} stock summaries with newly expired stock.")
+
+
+@shared_task
+def snapshot_stock_ledger():
+    """
+    Periodic task: fold new stock movements into the per-unit snapshots.
+    """
+    touched = snapshot_ledger()
+    print(f"Stock ledger snapshot updated {touched} balances.")
+
+
+@shared_task
+def forecast_pantry_consumption():
+    """
+    Periodic task: refit consumption rates and run-out dates for all items.
+    """
+    items, units = forecast_consumption()
+    print(f"Forecast {items} pantry items across {units} storage units.")
+
+
+@shared_task
+def rollup_temperature_minutes():
+    """
+    Periodic task: downsample recent readings into 1-minute buckets and
+    raise or clear out-of-range temperature alerts.
+    """
+    buckets = rollup_minutes()
+    print(f"Updated {buckets} 1-minute temperature buckets.")
+
+
+@shared_task
+def rollup_temperature_hours():
+    """
+    Periodic task: downsample recent 1-minute buckets into 1-hour buckets.
+    """
+    buckets = rollup_hours()
+    print(f"Updated {buckets} 1-hour temperature buckets.")
+
+
+@shared_task
+def prune_temperature_telemetry():
+    """
+    Periodic task: delete raw readings and rollups past their retention.
+    """
+    deleted = prune_temperature_history()
+    print(f"Pruned {deleted} temperature rows.")
+
+
+@shared_task
+def process_search_index_queue():
+    """
+    Periodic task: apply queued search index updates in batches, with a
+    single index writer at a time.
+    """
+    applied = process_index_queue()
+    if applied is None:
+        print("Search index queue is already being processed.")
+    else:
+        print(f"Applied {applied} queued search index updates.")
@@ -0,0 +1,316 @@
+"""
+Temperature telemetry for storage units.
+
+Sensors POST raw readings in batches (``ingest_readings``). Periodic tasks
+downsample them into 1-minute and 1-hour TemperatureRollup buckets, raise
+TemperatureExcursion alerts from the minute buckets, and prune old data.
+Everything that is displayed reads rollups, never raw readings.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.db import transaction
+from django.db.models import (
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Min,
+    Sum,
+)
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+
+from .models import (
+    StorageUnit,
+    TemperatureExcursion,
+    TemperatureReading,
+    TemperatureRollup,
+)
+
+TEMPERATURE_RAW_RETENTION = timedelta(days=2)
+TEMPERATURE_MINUTE_RETENTION = timedelta(days=30)
+TEMPERATURE_HOUR_RETENTION = timedelta(days=365)
+
+# Buckets re-aggregated on every run, so late readings within it are counted
+MINUTE_ROLLUP_LOOKBACK = timedelta(minutes=10)
+HOUR_ROLLUP_LOOKBACK = timedelta(hours=2)
+
+INGEST_BATCH_SIZE = 1000
+ROLLUP_FIELDS = ["minimum", "maximum", "total", "count"]
+
+
+def ingest_readings(readings):
+    """
+    Store (storage_unit_id, recorded_at, celsius) readings.
+
+    Readings are written with bulk_create; resent duplicates are ignored.
+    A unit's ``temperature`` is set to the batch's newest reading for it,
+    unless a later reading was already stored. Returns the number of
+    readings received.
+    """
+    latest = {}
+    for unit_id, recorded_at, celsius in readings:
+        if unit_id not in latest or recorded_at >= latest[unit_id][0]:
+            latest[unit_id] = (recorded_at, celsius)
+    stored = dict(
+        TemperatureReading.objects.filter(storage_unit_id__in=latest)
+        .values("storage_unit_id")
+        .annotate(newest=Max("recorded_at"))
+        .values_list("storage_unit_id", "newest")
+        .order_by()
+    )
+
+    TemperatureReading.objects.bulk_create(
+        (
+            TemperatureReading(
+                storage_unit_id=unit_id, recorded_at=recorded_at, celsius=celsius
+            )
+            for unit_id, recorded_at, celsius in readings
+        ),
+        batch_size=INGEST_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    current = [
+        unit_id
+        for unit_id, (recorded_at, _) in latest.items()
+        if unit_id not in stored or recorded_at >= stored[unit_id]
+    ]
+    units = list(StorageUnit.objects.filter(pk__in=current).only("pk", "temperature"))
+    for unit in units:
+        unit.temperature = round(Decimal(str(latest[unit.pk][1])), 1)
+    StorageUnit.objects.bulk_update(units, ["temperature"])
+    return len(readings)
+
+
+def _upsert_rollups(resolution, rows):
+    rollups = [
+        TemperatureRollup(
+            storage_unit_id=row["storage_unit_id"],
+            resolution=resolution,
+            bucket_start=row["bucket"],
+            minimum=row["minimum"],
+            maximum=row["maximum"],
+            total=row["total"],
+            count=row["count"],
+        )
+        for row in rows
+    ]
+    TemperatureRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["storage_unit", "resolution", "bucket_start"],
+        update_fields=ROLLUP_FIELDS,
+    )
+    return rollups
+
+
+def rollup_minutes(now=None):
+    """
+    Re-aggregate raw readings from the last MINUTE_ROLLUP_LOOKBACK into
+    minute buckets, then update excursions from each unit's newest bucket
+    and close those of units that have gone silent. Returns the number of
+    buckets written.
+    """
+    now = now or timezone.now()
+    start = (now - MINUTE_ROLLUP_LOOKBACK).replace(second=0, microsecond=0)
+    rows = (
+        TemperatureReading.objects.filter(recorded_at__gte=start, recorded_at__lte=now)
+        .annotate(bucket=TruncMinute("recorded_at"))
+        .values("storage_unit_id", "bucket")
+        .annotate(
+            minimum=Min("celsius"),
+            maximum=Max("celsius"),
+            total=Sum("celsius"),
+            count=Count("pk"),
+        )
+        .order_by()
+    )
+    rollups = _upsert_rollups(TemperatureRollup.MINUTE, rows)
+
+    latest = {}
+    for rollup in rollups:
+        current = latest.get(rollup.storage_unit_id)
+        if current is None or rollup.bucket_start > current.bucket_start:
+            latest[rollup.storage_unit_id] = rollup
+    update_excursions(latest)
+    close_silent_excursions(latest, now)
+    return len(rollups)
+
+
+def rollup_hours(now=None):
+    """
+    Re-aggregate minute buckets from the last HOUR_ROLLUP_LOOKBACK into hour
+    buckets. Returns the number of buckets written.
+    """
+    now = now or timezone.now()
+    start = (now - HOUR_ROLLUP_LOOKBACK).replace(minute=0, second=0, microsecond=0)
+    rows = (
+        TemperatureRollup.objects.filter(
+            resolution=TemperatureRollup.MINUTE,
+            bucket_start__gte=start,
+            bucket_start__lte=now,
+        )
+        .annotate(bucket=TruncHour("bucket_start"))
+        .values("storage_unit_id", "bucket")
+        .annotate(
+            minimum=Min("minimum"),
+            maximum=Max("maximum"),
+            total=Sum("total"),
+            count=Sum("count"),
+        )
+        .order_by()
+    )
+    return len(_upsert_rollups(TemperatureRollup.HOUR, rows))
+
+
+def update_excursions(latest):
+    """
+    Open, extend or close excursions from each unit's newest minute rollup.
+
+    ``latest`` maps storage unit ids to TemperatureRollup rows. The owner of
+    the unit's location is alerted once, when an excursion opens; the alerts
+    are sent over one mail connection after the excursions are committed.
+    """
+    units = StorageUnit.objects.filter(pk__in=latest).select_related(
+        "location__created_by"
+    )
+    open_excursions = {
+        excursion.storage_unit_id: excursion
+        for excursion in TemperatureExcursion.objects.filter(
+            storage_unit_id__in=latest, ended_at__isnull=True
+        )
+    }
+
+    opened, changed = [], []
+    for unit in units:
+        rollup = latest[unit.pk]
+        low, high = unit.temperature_range()
+        mean = rollup.mean
+        too_cold = low is not None and mean < low
+        too_warm = high is not None and mean > high
+        excursion = open_excursions.get(unit.pk)
+
+        if excursion and not (too_cold or too_warm):
+            excursion.ended_at = rollup.bucket_start
+            changed.append(excursion)
+        elif excursion:
+            peak = max if too_warm else min
+            excursion.peak_celsius = peak(excursion.peak_celsius, mean)
+            changed.append(excursion)
+        elif too_cold or too_warm:
+            opened.append(
+                TemperatureExcursion(
+                    storage_unit=unit,
+                    started_at=rollup.bucket_start,
+                    peak_celsius=mean,
+                )
+            )
+
+    messages = []
+    for excursion in opened:
+        unit = excursion.storage_unit
+        owner = unit.location.created_by
+        if not owner.email:
+            continue
+        low, high = unit.temperature_range()
+        messages.append(
+            (
+                f"Temperature alert: {unit.name}",
+                f"{unit} is at {excursion.peak_celsius:.1f} °C"
+                f" (safe range {low if low is not None else '-'}"
+                f" to {high if high is not None else '-'} °C)"
+                f" since {excursion.started_at:%Y-%m-%d %H:%M}.",
+                settings.DEFAULT_FROM_EMAIL,
+                [owner.email],
+            )
+        )
+
+    with transaction.atomic():
+        TemperatureExcursion.objects.bulk_update(changed, ["ended_at", "peak_celsius"])
+        TemperatureExcursion.objects.bulk_create(opened)
+        if messages:
+            transaction.on_commit(
+                lambda: send_mass_mail(
+                    messages, fail_silently=False, connection=get_connection()
+                )
+            )
+    return len(opened)
+
+
+def close_silent_excursions(reporting, now=None):
+    """
+    Close open excursions of silent units not in ``reporting`` (storage
+    unit ids).
+
+    A sensor that stops reporting can't bring its excursion back in range,
+    so once a unit has had no minute bucket for
+    ``settings.PANTRY_SENSOR_SILENCE_MINUTES`` its excursion ends with the
+    last bucket instead of staying open, and silencing its alerts,
+    indefinitely. Sensors reporting less often than MINUTE_ROLLUP_LOOKBACK
+    keep their excursions open until then.
+    """
+    now = now or timezone.now()
+    silent_since = now - timedelta(minutes=settings.PANTRY_SENSOR_SILENCE_MINUTES)
+    unreported = list(
+        TemperatureExcursion.objects.filter(ended_at__isnull=True).exclude(
+            storage_unit_id__in=reporting
+        )
+    )
+    last_seen = dict(
+        TemperatureRollup.objects.filter(
+            resolution=TemperatureRollup.MINUTE,
+            storage_unit_id__in=[excursion.storage_unit_id for excursion in unreported],
+        )
+        .values("storage_unit_id")
+        .annotate(last=Max("bucket_start"))
+        .values_list("storage_unit_id", "last")
+        .order_by()
+    )
+    silent = []
+    for excursion in unreported:
+        last = max(
+            last_seen.get(excursion.storage_unit_id, excursion.started_at),
+            excursion.started_at,
+        )
+        if last < silent_since:
+            excursion.ended_at = last + timedelta(minutes=1)
+            silent.append(excursion)
+    TemperatureExcursion.objects.bulk_update(silent, ["ended_at"])
+    return len(silent)
+
+
+def prune_temperature_history(now=None):
+    """Delete readings and rollups past their retention; returns rows deleted."""
+    now = now or timezone.now()
+    deleted, _ = TemperatureReading.objects.filter(
+        recorded_at__lt=now - TEMPERATURE_RAW_RETENTION
+    ).delete()
+    for resolution, retention in (
+        (TemperatureRollup.MINUTE, TEMPERATURE_MINUTE_RETENTION),
+        (TemperatureRollup.HOUR, TEMPERATURE_HOUR_RETENTION),
+    ):
+        count, _ = TemperatureRollup.objects.filter(
+            resolution=resolution, bucket_start__lt=now - retention
+        ).delete()
+        deleted += count
+    return deleted
+
+
+def temperature_series(storage_unit, resolution, since):
+    """Chart points for a unit from its rollups, oldest first."""
+    return (
+        TemperatureRollup.objects.filter(
+            storage_unit=storage_unit, resolution=resolution, bucket_start__gte=since
+        )
+        .annotate(
+            mean=ExpressionWrapper(F("total") / F("count"), output_field=FloatField())
+        )
+        .order_by("bucket_start")
+        .values("bucket_start", "minimum", "maximum", "mean")
+    )
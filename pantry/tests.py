@@ -1 +1,929 @@
-# Create your tests here.
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import AsyncClient, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import alerts, search_queue
+from .alerts import annotate_alerts, get_alerts, send_alert_digests
+from .barcode_cache import lookup_barcode
+from .change_feed import RedisChangeFeed, channel_name
+from .forecast import fit_daily_rates, forecast_consumption
+from .inventory_io import (
+    InventoryImportError,
+    export_lines,
+    import_items,
+    import_locations,
+    import_stock,
+)
+from .ledger import (
+    InsufficientStock,
+    consume,
+    discard_expired,
+    ledger_quantities,
+    move,
+    snapshot_ledger,
+)
+from .models import (
+    ItemCategory,
+    ItemForecast,
+    Location,
+    PantryItem,
+    SearchIndexUpdate,
+    Stock,
+    StockMovement,
+    StockSnapshot,
+    StockSummary,
+    StorageUnit,
+    StorageUnitForecast,
+    TemperatureExcursion,
+    TemperatureReading,
+)
+from .rollups import ROLLUP_CACHE_KEY, compute_rollups, get_rollups
+from .search import search_pantry
+from .search_queue import process_index_queue, queue_index_updates
+from .telemetry import rollup_minutes
+
+
+@pytest.fixture
+def stock_rows(db):
+    user = User.objects.create_user("pantry", password="pantry")  # noqa: S106
+    location = Location.objects.create(name="Home", created_by=user)
+    unit = StorageUnit.objects.create(
+        name="Fridge", unit_type="refrigerator", location=location
+    )
+    item = PantryItem.objects.create(name="Milk", created_by=user)
+    today = date.today()
+    Stock.objects.bulk_create(
+        Stock(
+            item=item,
+            storage_unit=unit,
+            quantity=n % 3,
+            expiry_date=today + timedelta(days=n),
+        )
+        for n in range(30)
+    )
+    return user, unit, item
+
+
+def query_plan(queryset):
+    """EXPLAIN a queryset with sequential scans discouraged.
+
+    The test tables are tiny, so without this the planner would always
+    pick a sequential scan and the plan would say nothing about indexes.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="query plans are PostgreSQL-specific"
+)
+
+
+@postgres_only
+def test_alert_query_reads_summaries_and_in_stock_index(stock_rows):
+    # The queryset get_alerts() runs
+    queryset = annotate_alerts().exclude(
+        expiry_alert="", stock_alert="", forecast_alert=""
+    )
+    plan = query_plan(queryset)
+    assert "pantry_stocksummary" in plan
+    assert "stock_in_stock_item_expiry_idx" in plan
+    assert "Seq Scan on pantry_stock " not in plan
+
+
+@postgres_only
+def test_stock_api_pages_are_expiry_id_index_range_scans(stock_rows, client):
+    user, _, _ = stock_rows
+    client.force_login(user)
+    first = client.get(reverse("api_stock_list") + "?limit=5")
+    with CaptureQueriesContext(connection) as queries:
+        client.get(first.data["next"])
+    page = next(q["sql"] for q in queries if 'FROM "pantry_stock"' in q["sql"])
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {page}")
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "stock_expiry_id_idx" in plan
+    assert "Index Cond: (expiry_date >=" in plan
+
+
+@postgres_only
+def test_unit_contents_query_uses_unit_item_index(stock_rows):
+    _, unit, item = stock_rows
+    queryset = Stock.objects.filter(storage_unit=unit, item=item)
+    assert "stock_unit_item_idx" in query_plan(queryset)
+
+
+@postgres_only
+def test_stock_admin_changelist_uses_expiry_index(stock_rows):
+    user, _, _ = stock_rows
+    request = RequestFactory().get("/admin/pantry/stock/")
+    request.user = user
+    model_admin = site._registry[Stock]
+    queryset = model_admin.get_queryset(request).order_by(
+        *model_admin.get_ordering(request)
+    )
+    assert "stock_expiry_id_idx" in query_plan(queryset)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_location_change_feed_streams_only_that_locations_stock():
+    user = User.objects.create_user("kiosk", password="kiosk")  # noqa: S106
+    item = PantryItem.objects.create(name="Eggs", created_by=user)
+    home, cabin = (
+        StorageUnit.objects.create(
+            name=name,
+            unit_type="pantry",
+            location=Location.objects.create(name=name, created_by=user),
+        )
+        for name in ("Home", "Cabin")
+    )
+
+    async def scenario():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        response = await client.get(
+            reverse("pantry:location_change_feed", args=[home.location_id])
+        )
+        assert response["Content-Type"] == "text/event-stream"
+        events = aiter(response.streaming_content)
+        assert await anext(events) == b"retry: 5000\n\n"
+
+        create = sync_to_async(Stock.objects.create)
+        await create(item=item, storage_unit=cabin, quantity=1)
+        stock = await create(item=item, storage_unit=home, quantity=2)
+        chunk = await asyncio.wait_for(anext(events), timeout=5)
+        await events.aclose()
+        return stock, chunk.decode()
+
+    stock, chunk = asyncio.run(scenario())
+    assert chunk.startswith("event: change\ndata: ")
+    event = json.loads(chunk.split("data: ", 1)[1])
+    assert event["id"] == stock.pk
+    assert event["action"] == "created"
+    assert event["location"] == home.location_id
+
+
+def stock_totals(item):
+    return {
+        (item.pk, row["storage_unit_id"]): row["quantity"]
+        for row in Stock.objects.filter(item=item)
+        .values("storage_unit_id")
+        .annotate(quantity=Sum("quantity"))
+        .order_by()
+    }
+
+
+def test_consume_takes_earliest_expiring_stock_first(stock_rows):
+    user, unit, _ = stock_rows
+    item = PantryItem.objects.create(name="Yoghurt", created_by=user)
+    today = date.today()
+    later, never, sooner = (
+        Stock.objects.create(
+            item=item, storage_unit=unit, quantity=2, expiry_date=expiry
+        )
+        for expiry in (today + timedelta(days=9), None, today + timedelta(days=2))
+    )
+    taken = consume(item, 3, user=user)
+    assert [(stock.pk, take) for stock, take in taken] == [
+        (sooner.pk, 2),
+        (later.pk, 1),
+    ]
+    never.refresh_from_db()
+    assert never.quantity == 2
+    with pytest.raises(InsufficientStock):
+        consume(item, 4)
+    assert Stock.objects.filter(item=item).aggregate(total=Sum("quantity")) == {
+        "total": 3
+    }
+
+
+def test_expired_stock_is_discarded_through_the_ledger(stock_rows, client):
+    user, unit, _ = stock_rows
+    item = PantryItem.objects.create(name="Cream", created_by=user)
+    today = date.today()
+    expired = Stock.objects.create(
+        item=item, storage_unit=unit, quantity=3, expiry_date=today - timedelta(1)
+    )
+    Stock.objects.create(item=item, storage_unit=unit, quantity=1, expiry_date=today)
+
+    client.force_login(user)
+    response = client.post(reverse("api_discard_expired", args=[item.pk]))
+    assert response.status_code == 200
+    assert response.json()["discarded"][0]["stock"] == expired.pk
+    expired.refresh_from_db()
+    assert expired.quantity == 0
+    movement = StockMovement.objects.get(stock=expired, kind=StockMovement.DISCARD)
+    assert (movement.quantity, movement.created_by) == (-3, user)
+    assert discard_expired(item) == []
+
+
+def test_snapshots_plus_new_movements_match_stock(stock_rows):
+    user, unit, milk = stock_rows
+    freezer = StorageUnit.objects.create(
+        name="Freezer", unit_type="freezer", location=unit.location
+    )
+    consume(milk, 5)
+    assert snapshot_ledger() == 1
+    assert snapshot_ledger() == 0
+
+    carton = Stock.objects.create(
+        item=milk, storage_unit=unit, quantity=4, expiry_date=None
+    )
+    move(carton, freezer, 3)
+    consume(milk, 2, storage_unit=unit)
+    # Bulk updates are logged too, including rows moved to another unit
+    Stock.objects.filter(item=milk, storage_unit=unit, quantity=2).update(quantity=7)
+    Stock.objects.filter(pk=carton.pk).update(storage_unit=freezer)
+    expected = stock_totals(milk)
+    assert ledger_quantities([milk]) == expected
+
+    assert snapshot_ledger() == 2
+    assert ledger_quantities([milk]) == expected
+    snapshots = StockSnapshot.objects.filter(item=milk)
+    assert {
+        (snap.item_id, snap.storage_unit_id): snap.quantity for snap in snapshots
+    } == expected
+
+
+def test_index_queue_applies_and_keeps_entries_requeued_meanwhile(
+    stock_rows, django_capture_on_commit_callbacks, monkeypatch
+):
+    user, _, _ = stock_rows
+    with django_capture_on_commit_callbacks(execute=True):
+        item = PantryItem.objects.create(name="Quince paste", created_by=user)
+    queued = SearchIndexUpdate.objects.get(object_pk=str(item.pk))
+    assert (queued.model, queued.action) == ("pantry.pantryitem", "update")
+
+    assert process_index_queue() >= 1
+    assert not SearchIndexUpdate.objects.filter(object_pk=str(item.pk)).exists()
+    assert search_pantry("quince")["results"][0]["id"] == item.pk
+
+    # Not queued until the change commits
+    with django_capture_on_commit_callbacks() as callbacks:
+        item.name = "Quince jelly"
+        item.save()
+    assert not SearchIndexUpdate.objects.filter(object_pk=str(item.pk)).exists()
+    for callback in callbacks:
+        callback()
+
+    # An edit committed while the worker writes its batch stays queued
+    apply = search_queue.apply_index_updates
+
+    def apply_then_edit(batch):
+        apply(batch)
+        with django_capture_on_commit_callbacks(execute=True):
+            PantryItem.objects.filter(pk=item.pk).update(name="Quince cheese")
+            queue_index_updates(PantryItem, [item.pk])
+
+    monkeypatch.setattr(search_queue, "apply_index_updates", apply_then_edit)
+    assert process_index_queue() == 1
+    assert SearchIndexUpdate.objects.filter(object_pk=str(item.pk)).exists()
+    monkeypatch.undo()
+
+    assert process_index_queue() == 1
+    assert search_pantry("cheese")["results"][0]["name"] == "Quince cheese"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        item.delete()
+    assert process_index_queue() == 1
+    assert search_pantry("quince")["count"] == 0
+
+
+def export_rows(dataset):
+    return [
+        json.loads(line)
+        for line in "".join(export_lines(dataset, "jsonl")).split("\n")
+        if line
+    ]
+
+
+def test_inventory_import_round_trips_and_reruns_cleanly(
+    stock_rows, django_capture_on_commit_callbacks
+):
+    user, unit, milk = stock_rows
+    with django_capture_on_commit_callbacks(execute=True):
+        milk.barcode = "5000001"
+        milk.save()
+        loose = PantryItem.objects.create(name="Loose apples", created_by=user)
+        Stock.objects.create(item=loose, storage_unit=unit, quantity=4)
+    assert lookup_barcode("5000001")["name"] == "Milk"
+    items, stock = export_rows("items"), export_rows("stock")
+
+    items[0]["name"] = "MILK"
+    stock[-1]["quantity"] = 6
+    movements = StockMovement.objects.count()
+    with django_capture_on_commit_callbacks(execute=True):
+        assert import_items(items) == 2
+        assert import_stock(stock) == 31
+        # Re-running writes nothing new
+        import_stock(stock)
+    assert PantryItem.objects.count() == 2
+    assert Stock.objects.filter(item=loose).get().quantity == 6
+    assert StockMovement.objects.count() == movements + 1
+    # Upserts skip post_save, so the import refreshes caches itself
+    assert lookup_barcode("5000001")["name"] == "MILK"
+    assert SearchIndexUpdate.objects.filter(object_pk=str(loose.pk)).exists()
+
+    # Explicit ids move the sequence on, so ordinary inserts don't collide
+    import_locations([{"id": "90", "name": "Cabin", "address": ""}], default_user=user)
+    assert Location.objects.create(name="Barn", created_by=user).pk > 90
+
+    # Rows from another database that reuse an id aren't written over
+    with pytest.raises(InventoryImportError, match="already exists"):
+        import_locations([{"id": "90", "name": "Boathouse"}], default_user=user)
+    items[1]["name"] = "Pears"
+    with pytest.raises(InventoryImportError, match="already exists"):
+        import_items(items)
+    assert Location.objects.get(pk=90).name == "Cabin"
+    assert PantryItem.objects.get(pk=loose.pk).name == "Loose apples"
+
+
+def test_barcode_cache_is_dropped_after_commit(
+    stock_rows, django_capture_on_commit_callbacks
+):
+    _, _, milk = stock_rows
+    with django_capture_on_commit_callbacks(execute=True):
+        milk.barcode = "5000002"
+        milk.save()
+    assert lookup_barcode("5000002")["name"] == "Milk"
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        milk.name = "Oat milk"
+        milk.save()
+        # A lookup before commit may cache the old row...
+        assert lookup_barcode("5000002")["name"] == "Milk"
+    for callback in callbacks:
+        callback()
+    # ...which the post-commit invalidation then drops
+    assert lookup_barcode("5000002")["name"] == "Oat milk"
+
+
+def test_stock_add_looks_up_only_submitted_rows(
+    stock_rows, client, django_capture_on_commit_callbacks
+):
+    user, unit, milk = stock_rows
+    PantryItem.objects.bulk_create(
+        PantryItem(name=f"Item {n}", created_by=user) for n in range(50)
+    )
+    client.force_login(user)
+    url = reverse("pantry:stock_add")
+    row = {
+        "item_pk": milk.pk,
+        "unit_pk": unit.pk,
+        "expiry_date": "",
+        "batch_number": "",
+    }
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(url, {**row, "quantity": 2})
+    assert response.status_code == 302
+    # No unfiltered read of the item catalogue
+    assert not any(
+        'FROM "pantry_pantryitem"' in query["sql"] and "WHERE" not in query["sql"]
+        for query in queries
+    )
+    assert Stock.objects.filter(item=milk).count() == 31
+
+    # Columns of different lengths can't be lined up into rows
+    response = client.post(url, {**row, "quantity": [2, 3]})
+    assert response.status_code == 200
+    assert Stock.objects.filter(item=milk).count() == 31
+    assert "missing fields" in response.content.decode()
+
+    # Re-rendering the form reuses the cached choices
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(url, {**row, "quantity": 2, "batch_number": "B" * 101})
+    assert response.status_code == 200
+    assert "longer than 100 characters" in response.content.decode()
+    assert Stock.objects.filter(item=milk).count() == 31
+    assert not any(
+        table in query["sql"] and "WHERE" not in query["sql"]
+        for query in queries
+        for table in ('FROM "pantry_pantryitem"', 'FROM "pantry_storageunit"')
+    )
+
+    # Renaming a unit drops the cached choices
+    with django_capture_on_commit_callbacks(execute=True):
+        unit.name = "Cellar"
+        unit.save()
+    assert "Cellar" in client.get(url).content.decode()
+
+
+def test_alert_digests_group_by_owner_and_skip_unchanged_alerts(
+    stock_rows, mailoutbox, monkeypatch, django_capture_on_commit_callbacks
+):
+    user, unit, _ = stock_rows
+    user.email = "pantry@example.com"
+    user.save()
+    baker = User.objects.create_user("baker", email="baker@example.com")
+    quiet = User.objects.create_user("quiet")
+    with django_capture_on_commit_callbacks(execute=True):
+        # Expiring and low: two lines, one item
+        cheese = PantryItem.objects.create(
+            name="Cheese", created_by=user, min_stock_level=3
+        )
+        cheese_stock = Stock.objects.create(
+            item=cheese,
+            storage_unit=unit,
+            quantity=1,
+            expiry_date=date.today() + timedelta(days=2),
+        )
+        PantryItem.objects.create(name="Flour", created_by=baker)
+        PantryItem.objects.create(name="Yeast", created_by=quiet)
+
+    calls = []
+
+    def send_mass_mail(messages, **kwargs):
+        calls.append(len(messages))
+        return real_send_mass_mail(messages, **kwargs)
+
+    real_send_mass_mail = alerts.send_mass_mail
+    monkeypatch.setattr(alerts, "send_mass_mail", send_mass_mail)
+
+    assert send_alert_digests() == 2
+    assert calls == [2]
+    subjects = {message.to[0]: message.subject for message in mailoutbox}
+    assert subjects == {
+        "pantry@example.com": "Pantry alerts: 2 items need attention",
+        "baker@example.com": "Pantry alerts: 1 item need attention",
+    }
+    assert mailoutbox[0].body.count("Cheese") == 2
+
+    # Nothing changed: nothing is re-sent
+    assert send_alert_digests() == 0
+    assert calls == [2]
+
+    # Cheese runs out: its stock alert changes, its expiry alert clears
+    with django_capture_on_commit_callbacks(execute=True):
+        cheese_stock.delete()
+    assert send_alert_digests() == 1
+    assert calls == [2, 1]
+    assert mailoutbox[-1].to == ["pantry@example.com"]
+    assert mailoutbox[-1].body == "- Cheese: out of stock"
+
+
+def test_barcode_batch_resolves_scans_in_one_query(
+    stock_rows, client, django_capture_on_commit_callbacks
+):
+    user, fridge, milk = stock_rows
+    cellar = StorageUnit.objects.create(
+        name="Cellar", unit_type="closet", location=fridge.location
+    )
+    milk.barcode = "111"
+    milk.default_storage = fridge
+    milk.save()
+    jam = PantryItem.objects.create(name="Jam", barcode="222", created_by=user)
+    client.force_login(user)
+    url = reverse("api_barcode_batch")
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(
+            url,
+            {"barcodes": ["111", "111", "222", "999"]},
+            content_type="application/json",
+        )
+    assert response.status_code == 200
+    item_queries = [
+        query["sql"] for query in queries if 'FROM "pantry_pantryitem"' in query["sql"]
+    ]
+    assert len(item_queries) == 1
+    assert " IN (" in item_queries[0]
+    body = response.json()
+    assert {item["barcode"] for item in body["found"]} == {"111", "222"}
+    assert body["missing"] == ["999"]
+    assert body["created"] == []
+
+    # Repeated scans multiply the quantity; Jam has no default unit
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            url,
+            {"barcodes": ["111", "111", "222"], "create_stock": True, "quantity": 2},
+            content_type="application/json",
+        )
+    assert response.status_code == 201
+    body = response.json()
+    assert body["created"] == [
+        {"barcode": "111", "storage_unit": fridge.pk, "quantity": 4}
+    ]
+    assert body["skipped"] == ["222"]
+    assert not Stock.objects.filter(item=jam).exists()
+
+    # An explicit unit overrides the default, and covers items without one
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            url,
+            {
+                "barcodes": ["111", "222"],
+                "create_stock": True,
+                "storage_unit": cellar.pk,
+            },
+            content_type="application/json",
+        )
+    assert response.status_code == 201
+    assert response.json()["skipped"] == []
+    assert sorted(
+        Stock.objects.filter(storage_unit=cellar).values_list("item__name", "quantity")
+    ) == [("Jam", 1), ("Milk", 1)]
+
+
+def test_forecast_fits_item_and_unit_rates(stock_rows):
+    user, fridge, milk = stock_rows
+    # Steady use has its daily amount as its rate; a one-off use has none
+    rates = fit_daily_rates(
+        np.array([0] * 10 + [1]),
+        np.array(list(range(10)) + [0]),
+        np.array([3.0] * 10 + [5.0]),
+        3,
+        window_days=10,
+    )
+    assert rates.tolist() == pytest.approx([3.0, 0.0, 0.0])
+
+    larder = StorageUnit.objects.create(
+        name="Larder", unit_type="pantry", location=fridge.location
+    )
+    rice = PantryItem.objects.create(name="Rice", created_by=user)
+    Stock.objects.create(item=rice, storage_unit=larder, quantity=100)
+    today = date.today()
+    for days_ago in range(10):
+        consume(rice, 2)
+        StockMovement.objects.filter(
+            pk=StockMovement.objects.filter(kind=StockMovement.CONSUME).latest("pk").pk
+        ).update(
+            created_at=timezone.make_aware(
+                datetime.combine(today - timedelta(days=days_ago), time(12))
+            )
+        )
+    # Forecast before, unused since
+    ItemForecast.objects.create(item=milk, daily_rate=5.0, computed_at=timezone.now())
+
+    assert forecast_consumption(today, window_days=10) == (2, 2)
+    forecasts = dict(ItemForecast.objects.values_list("item__name", "daily_rate"))
+    assert forecasts == pytest.approx({"Rice": 2.0, "Milk": 0.0})
+    larder_forecast = StorageUnitForecast.objects.get(storage_unit=larder)
+    assert larder_forecast.daily_rate == pytest.approx(2.0)
+    assert larder_forecast.days_of_supply == pytest.approx(40.0)
+    fridge_forecast = StorageUnitForecast.objects.get(storage_unit=fridge)
+    assert (fridge_forecast.daily_rate, fridge_forecast.days_of_supply) == (0.0, None)
+
+
+def test_location_rollups_count_stock_and_follow_writes(
+    stock_rows, client, django_capture_on_commit_callbacks
+):
+    user, fridge, milk = stock_rows
+    cache.clear()
+    client.force_login(user)
+    location = fridge.location
+    today = date.today()
+    Stock.objects.create(
+        item=milk, storage_unit=fridge, quantity=2, expiry_date=today - timedelta(1)
+    )
+    cellar = StorageUnit.objects.create(
+        name="Cellar", unit_type="closet", location=location
+    )
+    rice = PantryItem.objects.create(name="Rice", created_by=user)
+    Stock.objects.create(item=rice, storage_unit=cellar, quantity=4)
+    Stock.objects.create(item=milk, storage_unit=cellar, quantity=1)
+
+    rollups = compute_rollups(today)
+    assert rollups["units"][fridge.pk] == {
+        "items": 1,
+        "units": 32,
+        "expiring": 5,
+        "expired": 1,
+    }
+    assert rollups["units"][cellar.pk] == {
+        "items": 2,
+        "units": 5,
+        "expiring": 0,
+        "expired": 0,
+    }
+    # Milk is in both units but counted once for the location
+    assert rollups["locations"][location.pk] == {
+        "items": 2,
+        "units": 37,
+        "expiring": 5,
+        "expired": 1,
+        "storage_units": 2,
+    }
+
+    def page_queries():
+        counts = []
+        for url in (
+            reverse("pantry:location_list"),
+            reverse("pantry:location_detail", args=[location.pk]),
+        ):
+            cache.delete(ROLLUP_CACHE_KEY)
+            with CaptureQueriesContext(connection) as queries:
+                assert client.get(url).status_code == 200
+            counts.append(len(queries))
+        return counts
+
+    before = page_queries()
+    for n in range(5):
+        other = Location.objects.create(name=f"Shed {n}", created_by=user)
+        unit = StorageUnit.objects.create(
+            name=f"Shelf {n}", unit_type="pantry", location=other
+        )
+        Stock.objects.create(item=rice, storage_unit=unit, quantity=n + 1)
+        StorageUnit.objects.create(
+            name=f"Rack {n}", unit_type="pantry", location=location
+        )
+    assert page_queries() == before
+
+    # Stock writes drop the cached rollups once they commit
+    assert get_rollups(today)["units"][cellar.pk]["units"] == 5
+    with django_capture_on_commit_callbacks(execute=True):
+        Stock.objects.create(item=rice, storage_unit=cellar, quantity=3)
+        assert cache.get(ROLLUP_CACHE_KEY) is not None
+    assert cache.get(ROLLUP_CACHE_KEY) is None
+    assert get_rollups(today)["units"][cellar.pk]["units"] == 8
+
+
+def test_rebuild_stock_summaries_repairs_drift(
+    stock_rows, django_capture_on_commit_callbacks
+):
+    user, unit, milk = stock_rows
+    rice = PantryItem.objects.create(name="Rice", created_by=user)
+    salt = PantryItem.objects.create(name="Salt", created_by=user)
+    Stock.objects.create(item=rice, storage_unit=unit, quantity=4)
+    # Drift: one summary lost, one stale
+    StockSummary.objects.filter(item=milk).delete()
+    StockSummary.objects.update_or_create(
+        item=rice, defaults={"total_quantity": 99, "updated_at": timezone.now()}
+    )
+    cache.set(ROLLUP_CACHE_KEY, {"date": date.today(), "rollups": {}})
+    SearchIndexUpdate.objects.all().delete()
+
+    out = StringIO()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("rebuild_stock_summary", batch_size=2, stdout=out)
+    assert "Rebuilt 3 stock summaries." in out.getvalue()
+    summaries = {
+        summary.item.name: (summary.total_quantity, summary.stock_count)
+        for summary in StockSummary.objects.select_related("item")
+    }
+    assert summaries == {"Milk": (30, 30), "Rice": (4, 1), "Salt": (0, 0)}
+    # Refreshed summaries drop the rollups and requeue search documents
+    assert cache.get(ROLLUP_CACHE_KEY) is None
+    assert set(SearchIndexUpdate.objects.values_list("object_pk", flat=True)) == {
+        str(milk.pk),
+        str(rice.pk),
+        str(salt.pk),
+    }
+
+
+def test_get_alerts_classifies_items_in_one_query(
+    stock_rows, client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    user, unit, milk = stock_rows
+    today = date.today()
+    with django_capture_on_commit_callbacks(execute=True):
+        cheese, flour, salt, rice = (
+            PantryItem.objects.create(name=name, created_by=user, min_stock_level=3)
+            for name in ("Cheese", "Flour", "Salt", "Rice")
+        )
+        Stock.objects.create(
+            item=cheese, storage_unit=unit, quantity=5, expiry_date=today
+        )
+        # An expired lot doesn't mask fresh stock expiring later
+        for quantity, days in [(1, -3), (5, 40)]:
+            Stock.objects.create(
+                item=flour,
+                storage_unit=unit,
+                quantity=quantity,
+                expiry_date=today + timedelta(days=days),
+            )
+        Stock.objects.create(item=salt, storage_unit=unit, quantity=1)
+        Stock.objects.create(item=rice, storage_unit=unit, quantity=10)
+        consume(rice, 6)
+    ItemForecast.objects.create(item=rice, daily_rate=2.0, computed_at=timezone.now())
+
+    with django_assert_num_queries(1):
+        alerts = get_alerts(today=today)
+    names = {kind: [item.name for item in items] for kind, items in alerts.items()}
+    assert names["expiring"] == ["Cheese", "Milk"]
+    assert names["out"] == []
+    assert names["low"] == ["Salt"]
+    assert names["running_out"] == ["Rice"]
+    rice_alert = alerts["running_out"][0]
+    assert rice_alert.run_out_date == today + timedelta(days=2)
+    milk_alert = alerts["expiring"][1]
+    assert milk_alert.soonest_expiry == today + timedelta(days=1)
+    assert milk_alert.alert_unit_id == unit.pk
+    flour_alert = annotate_alerts(PantryItem.objects.filter(pk=flour.pk), today).get()
+    assert flour_alert.soonest_expiry == today + timedelta(days=40)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Stock.objects.filter(item=salt).delete()
+    assert [item.name for item in get_alerts(today=today)["out"]] == ["Salt"]
+
+    client.force_login(user)
+    response = client.get(reverse("pantry:alerts_dashboard"))
+    assert response.status_code == 200
+    assert [item.name for item in response.context["running_out"]] == ["Rice"]
+
+
+def test_stock_api_pages_undated_stock_last_and_revalidates_renames(
+    stock_rows, client, django_capture_on_commit_callbacks
+):
+    user, unit, milk = stock_rows
+    with django_capture_on_commit_callbacks(execute=True):
+        Stock.objects.bulk_create(
+            Stock(item=milk, storage_unit=unit, quantity=1) for _ in range(3)
+        )
+    client.force_login(user)
+    url = reverse("api_stock_list") + "?limit=25&fields=storage_unit_name,expiry_date"
+
+    first = client.get(url)
+    assert len(first.data["results"]) == 25
+    second = client.get(first.data["next"])
+    assert [row["expiry_date"] for row in second.data["results"][5:]] == [None] * 3
+    assert second.data["next"] is None
+
+    # Revalidating doesn't read the pantry tables
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 304
+    assert not any('"pantry_' in query["sql"] for query in queries)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        unit.name = "Big fridge"
+        unit.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert response.status_code == 200
+    assert response["ETag"] != first["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Stock.objects.filter(expiry_date__isnull=True).delete()
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 200
+
+
+def test_excursion_closes_when_the_sensor_stops_reporting(
+    stock_rows, client, settings, mailoutbox, django_capture_on_commit_callbacks
+):
+    user, unit, _ = stock_rows
+    user.email = "owner@example.com"
+    user.save()
+    settings.PANTRY_SENSOR_SILENCE_MINUTES = 60
+    client.force_login(user)
+    url = reverse("api_temperature_ingest")
+    now = timezone.now().replace(second=30, microsecond=0)
+    response = client.post(
+        url,
+        {"readings": [[unit.pk, now.isoformat(), "nan"]]},
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+    assert not TemperatureReading.objects.exists()
+
+    response = client.post(
+        url,
+        {"readings": [[unit.pk, now.isoformat(), 12.0]]},
+        content_type="application/json",
+    )
+    assert response.status_code == 202
+    with django_capture_on_commit_callbacks(execute=True):
+        rollup_minutes(now)
+        rollup_minutes(now + timedelta(minutes=1))
+    excursion = TemperatureExcursion.objects.get(storage_unit=unit)
+    assert excursion.ended_at is None
+    # Alerted once, when the excursion opened
+    assert [message.to for message in mailoutbox] == [["owner@example.com"]]
+
+    # Nothing reported for longer than the rollup window, but a sensor may
+    # report that rarely
+    rollup_minutes(now + timedelta(minutes=30))
+    excursion.refresh_from_db()
+    assert excursion.ended_at is None
+
+    rollup_minutes(now + timedelta(minutes=90))
+    excursion.refresh_from_db()
+    assert excursion.ended_at == excursion.started_at + timedelta(minutes=1)
+
+
+def test_search_matches_prefixes_and_narrows_by_facet(
+    stock_rows, client, django_capture_on_commit_callbacks
+):
+    user, fridge, _ = stock_rows
+    preserves = ItemCategory.objects.create(name="Preserves")
+    cellar = StorageUnit.objects.create(
+        name="Cellar", unit_type="closet", location=fridge.location
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        for name, unit in [
+            ("Apricot jam", fridge),
+            ("Apricot chutney", cellar),
+            ("Plum jam", cellar),
+        ]:
+            item = PantryItem.objects.create(
+                name=name, category=preserves, created_by=user
+            )
+            Stock.objects.create(item=item, storage_unit=unit, quantity=2)
+    process_index_queue()
+
+    found = search_pantry("apric")
+    assert {result["name"] for result in found["results"]} == {
+        "Apricot jam",
+        "Apricot chutney",
+    }
+    assert ("Preserves", 2) in found["facets"]["category"]
+    assert ("Home / Cellar", 1) in found["facets"]["storage_unit"]
+
+    narrowed = search_pantry("jam", storage_unit="Home / Cellar")
+    assert [result["name"] for result in narrowed["results"]] == ["Plum jam"]
+    assert narrowed["results"][0]["total_quantity"] == 2
+
+    client.force_login(user)
+    response = client.get(
+        reverse("api_pantry_search"), {"q": "chutney", "category": "Preserves"}
+    )
+    assert response.status_code == 200
+    assert response.data["count"] == 1
+
+    # Renames reach the documents of the items they're shown on
+    with django_capture_on_commit_callbacks(execute=True):
+        preserves.name = "Jams"
+        preserves.save()
+        location = fridge.location
+        location.name = "Cottage"
+        location.save()
+    process_index_queue()
+    found = search_pantry("apric")
+    assert ("Jams", 2) in found["facets"]["category"]
+    assert ("Cottage / Cellar", 1) in found["facets"]["storage_unit"]
+    assert ("Home / Cellar", 1) not in found["facets"]["storage_unit"]
+
+
+def test_redis_feed_starts_one_reader_per_loop(stock_rows, client, monkeypatch):
+    pubsubs = []
+
+    class PubSub:
+        def __init__(self, **options):
+            self.channels = set()
+            self.closed = False
+            pubsubs.append(self)
+
+        async def subscribe(self, *channels):
+            await asyncio.sleep(0)
+            self.channels.update(channels)
+
+        async def unsubscribe(self, *channels):
+            self.channels.difference_update(channels)
+
+        async def aclose(self):
+            self.closed = True
+
+        async def listen(self):
+            await asyncio.Event().wait()
+            yield
+
+    monkeypatch.setattr(
+        redis.asyncio.Redis, "from_url", lambda url: SimpleNamespace(pubsub=PubSub)
+    )
+    feed = RedisChangeFeed("redis://localhost:6379/0")
+
+    async def subscribers():
+        done = asyncio.Event()
+        ready = [asyncio.Event(), asyncio.Event()]
+
+        async def listen(location_id):
+            async with feed.subscribe([location_id]):
+                ready[location_id].set()
+                await done.wait()
+
+        # Both subscribe before either has its reader
+        tasks = [asyncio.create_task(listen(n)) for n in (0, 1)]
+        await asyncio.gather(*(event.wait() for event in ready))
+        assert len(pubsubs) == 1
+        assert pubsubs[0].channels == {channel_name(0), channel_name(1)}
+        done.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(subscribers())
+    assert pubsubs[0].closed
+    assert not feed._readers
+
+    # Pages served over WSGI don't open the feed
+    user, unit, _ = stock_rows
+    client.force_login(user)
+    response = client.get(reverse("pantry:location_detail", args=[unit.location_id]))
+    assert response.status_code == 200
+    assert "EventSource" not in response.content.decode()
@@ -7,6 +7,11 @@ app_name = "pantry"
 urlpatterns = [
     path("", views.location_list, name="location_list"),
     path("location/<int:pk>/", views.location_detail, name="location_detail"),
+    path(
+        "location/<int:pk>/feed/",
+        views.location_change_feed,
+        name="location_change_feed",
+    ),
     path("location/create/", views.location_create, name="location_create"),
     path("location/<int:pk>/edit/", views.location_update, name="location_update"),
     path("location/<int:pk>/delete/", views.location_delete, name="location_delete"),
@@ -23,5 +28,11 @@ urlpatterns = [
     path("stock/<int:pk>/delete/", views.stock_delete, name="stock_delete"),
     path("scan/", views.barcode_scan, name="barcode_scan"),
     path("alerts/", views.alerts_dashboard, name="alerts_dashboard"),
+    path("search/", views.pantry_search, name="search"),
     path("api/scan/", views.api_barcode_scan, name="api_barcode_scan"),
+    path(
+        "export/<slug:dataset>.<slug:fmt>",
+        views.inventory_export,
+        name="inventory_export",
+    ),
 ]
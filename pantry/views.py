@@ -1,14 +1,30 @@
-from datetime import timedelta
+import asyncio
+from datetime import date
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import F
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
 
+from .alerts import (
+    ALERT_EXPIRING,
+    ALERT_LOW,
+    ALERT_OUT,
+    ALERT_RUNNING_OUT,
+    RUN_OUT_ALERT_DAYS,
+    get_alerts,
+)
+from .barcode_cache import lookup_barcode
+from .change_feed import get_change_feed
 from .forms import LocationForm, PantryItemForm, StorageUnitForm
+from .inventory_io import CONTENT_TYPES, EXPORT_FIELDS, export_lines
 from .models import Location, PantryItem, Stock, StorageUnit
+from .rollups import get_rollups, location_rollup, unit_rollup
+from .search import search_pantry
+from .stock_choices import stock_add_choices
 
 
 @login_required
@@ -84,42 +100,76 @@ def api_barcode_scan(request):
     if not barcode:
         return JsonResponse({"error": "No barcode provided"}, status=400)
 
-    try:
-        item = PantryItem.objects.get(barcode=barcode)
-        return JsonResponse(
-            {
-                "found": True,
-                "item": {
-                    "id": item.id,
-                    "name": item.name,
-                    "barcode": item.barcode,
-                    "min_stock_level": item.min_stock_level,
-                },
-            }
-        )
-    except PantryItem.DoesNotExist:
+    item = lookup_barcode(barcode)
+    if item is None:
         return JsonResponse(
             {"found": False, "error": "Item not found in your pantry"}, status=404
         )
+    return JsonResponse({"found": True, "item": item})
 
 
 @login_required
 def location_list(request):
-    locations = Location.objects.prefetch_related("storage_units")
+    rollups = get_rollups()
+    locations = list(Location.objects.all())
+    for location in locations:
+        location.rollup = location_rollup(rollups, location.pk)
     return render(request, "pantry/location_list.html", {"locations": locations})
 
 
 @login_required
 def location_detail(request, pk):
     location = get_object_or_404(Location, pk=pk)
-    storage_units = location.storage_units.all().prefetch_related("stocks__item")
+    rollups = get_rollups()
+    storage_units = list(location.storage_units.all())
+    for unit in storage_units:
+        unit.rollup = unit_rollup(rollups, unit.pk)
     return render(
         request,
         "pantry/location_detail.html",
-        {"location": location, "storage_units": storage_units},
+        {
+            "location": location,
+            "rollup": location_rollup(rollups, location.pk),
+            "storage_units": storage_units,
+            # Under WSGI each open feed would hold a worker thread for good
+            "live_updates": isinstance(request, ASGIRequest),
+        },
     )
 
 
+# Seconds between SSE comments that keep idle connections (and proxies) alive
+FEED_KEEPALIVE_SECONDS = 20
+
+
+@login_required
+async def location_change_feed(request, pk):
+    """
+    Stream Stock/PantryItem changes at a Location as server-sent events.
+
+    Served from an async view so, under ASGI (config.asgi), idle subscribers
+    cost a queue on the event loop instead of a worker thread each. Pages
+    only open the feed when served over ASGI themselves.
+    """
+    location = await aget_object_or_404(Location, pk=pk)
+    return StreamingHttpResponse(
+        _change_events([location.pk]),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _change_events(location_ids):
+    async with get_change_feed().subscribe(location_ids) as queue:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), FEED_KEEPALIVE_SECONDS)
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: change\ndata: {message}\n\n"
+
+
 @login_required
 def location_create(request):
     if request.method == "POST":
@@ -242,92 +292,144 @@ def pantry_item_update(request, pk):
 
 
 # --- Stock Management ---
-@login_required
-def stock_add(request):
-    # Read optional pre-fill parameters
-    item_pk = request.GET.get("item")
-    unit_pk = request.GET.get("unit")
+STOCK_ROW_FIELDS = ("item_pk", "unit_pk", "quantity", "expiry_date", "batch_number")
+BLANK_STOCK_ROWS = 5
+BATCH_NUMBER_MAX_LENGTH = Stock._meta.get_field("batch_number").max_length
 
-    # Try to pre-fill item and unit
-    try:
-        item = get_object_or_404(PantryItem, pk=item_pk) if item_pk else None
-    except (ValueError, TypeError):
-        item = None
 
-    try:
-        unit = get_object_or_404(StorageUnit, pk=unit_pk) if unit_pk else None
-    except (ValueError, TypeError):
-        unit = None
+@login_required
+def stock_add(request):
+    """
+    Add one or more stock rows in a single submission.
 
-    # If POST, process the form
+    Each row is (item, unit, quantity, expiry, batch number). A submission
+    looks up only the items and units it names, with one in_bulk query
+    each, and all rows are written with one bulk_create.
+    """
     if request.method == "POST":
-        item_pk = request.POST.get("item_pk") or item_pk
-        unit_pk = request.POST.get("unit_pk") or unit_pk
-        quantity = request.POST.get("quantity")
-        expiry = request.POST.get("expiry_date")
+        try:
+            rows = _stock_rows_from_post(request.POST)
+        except ValueError:
+            rows = []
+            errors = ["Some lines were missing fields; please enter them again."]
+        else:
+            items_by_pk = PantryItem.objects.in_bulk(_submitted_pks(rows, "item_pk"))
+            units_by_pk = StorageUnit.objects.in_bulk(_submitted_pks(rows, "unit_pk"))
+            stocks, errors = _validate_stock_rows(rows, items_by_pk, units_by_pk)
+            if not stocks and not errors:
+                errors.append("Add at least one item.")
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return render_stock_add_form(request, rows)
+
+        with transaction.atomic():
+            Stock.objects.bulk_create(stocks)
+
+        total = sum(stock.quantity for stock in stocks)
+        messages.success(
+            request,
+            f"✅ Added {total} unit{'s' if total != 1 else ''} "
+            f"across {len(stocks)} stock entr{'ies' if len(stocks) != 1 else 'y'}.",
+        )
+        unit_pks = {stock.storage_unit_id for stock in stocks}
+        if len(unit_pks) == 1:
+            return redirect("pantry:storage_unit_detail", pk=unit_pks.pop())
+        return redirect("pantry:location_list")
 
-        # Validate item
-        if not item_pk:
-            messages.error(request, "Item is required.")
-            return render_stock_add_form(request, None, None, quantity, expiry)
+    # If GET, pre-fill the first row from ?item= and ?unit=
+    rows = [
+        {
+            "item_pk": request.GET.get("item", ""),
+            "unit_pk": request.GET.get("unit", ""),
+        }
+    ]
+    return render_stock_add_form(request, rows)
 
-        try:
-            item = get_object_or_404(PantryItem, pk=item_pk)
-        except (ValueError, TypeError):
-            messages.error(request, "Invalid item.")
-            return render_stock_add_form(request, None, unit, quantity, expiry)
 
-        # Validate unit
-        if not unit_pk:
-            messages.error(request, "Storage unit is required.")
-            return render_stock_add_form(request, item, None, quantity, expiry)
+def _stock_rows_from_post(data):
+    """
+    Zip the parallel row inputs into dicts, dropping fully blank rows.
 
-        try:
-            unit = get_object_or_404(StorageUnit, pk=unit_pk)
-        except (ValueError, TypeError):
-            messages.error(request, "Invalid storage unit.")
-            return render_stock_add_form(request, item, None, quantity, expiry)
+    Raises ValueError if the columns differ in length, since the rows
+    could no longer be lined up.
+    """
+    columns = [data.getlist(field) for field in STOCK_ROW_FIELDS]
+    rows = []
+    for values in zip(*columns, strict=True):
+        row = dict(zip(STOCK_ROW_FIELDS, (v.strip() for v in values), strict=True))
+        if any(row[field] for field in ("item_pk", "quantity")):
+            rows.append(row)
+    return rows
+
+
+def _submitted_pks(rows, field):
+    return {int(row[field]) for row in rows if row[field].isdigit()}
+
+
+def _validate_stock_rows(rows, items_by_pk, units_by_pk):
+    """Build unsaved Stock objects from rows, collecting per-row errors."""
+    stocks = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        item = _lookup_pk(items_by_pk, row["item_pk"])
+        unit = _lookup_pk(units_by_pk, row["unit_pk"])
+        if item is None:
+            errors.append(f"Row {number}: choose a valid item.")
+            continue
+        if unit is None:
+            errors.append(f"Row {number}: choose a valid storage unit.")
+            continue
 
-        # Validate quantity
         try:
-            quantity = int(quantity)
+            quantity = int(row["quantity"])
             if quantity <= 0:
                 raise ValueError("Quantity must be positive.")
         except (ValueError, TypeError):
-            messages.error(request, "Please enter a valid quantity.")
-            return render_stock_add_form(request, item, unit, quantity, expiry)
-
-        # Create stock
-        """
-        stock = Stock.objects.create(
-            item=item, storage_unit=unit, quantity=quantity, expiry_date=expiry or None
-        )"""
+            errors.append(f"Row {number}: enter a valid quantity for {item.name}.")
+            continue
 
-        messages.success(
-            request, f"✅ Added {quantity} of '{item.name}' to '{unit.name}'."
+        try:
+            expiry = (
+                date.fromisoformat(row["expiry_date"]) if row["expiry_date"] else None
+            )
+        except ValueError:
+            errors.append(f"Row {number}: enter a valid expiry date for {item.name}.")
+            continue
+
+        if len(row["batch_number"]) > BATCH_NUMBER_MAX_LENGTH:
+            errors.append(
+                f"Row {number}: the batch number for {item.name} is longer than "
+                f"{BATCH_NUMBER_MAX_LENGTH} characters."
+            )
+            continue
+
+        stocks.append(
+            Stock(
+                item=item,
+                storage_unit=unit,
+                quantity=quantity,
+                expiry_date=expiry,
+                batch_number=row["batch_number"],
+            )
         )
-        return redirect("pantry:storage_unit_detail", pk=unit.pk)
+    return stocks, errors
 
-    # If GET, show form
-    return render_stock_add_form(request, item, unit)
 
+def _lookup_pk(objects_by_pk, pk):
+    try:
+        return objects_by_pk.get(int(pk))
+    except (ValueError, TypeError):
+        return None
 
-# Helper function to avoid code duplication
-def render_stock_add_form(request, item=None, unit=None, quantity="", expiry=""):
-    items = PantryItem.objects.order_by("name")
-    units = StorageUnit.objects.select_related("location")
 
+# Helper function to avoid code duplication
+def render_stock_add_form(request, rows):
+    rows = rows + [{} for _ in range(max(BLANK_STOCK_ROWS - len(rows), 1))]
     return render(
         request,
         "pantry/stock_add.html",
-        {
-            "items": items,
-            "units": units,
-            "item": item,
-            "unit": unit,
-            "quantity": quantity,
-            "expiry": expiry,
-        },
+        {**stock_add_choices(), "rows": rows},
     )
 
 
@@ -442,47 +544,60 @@ def api_barcode_scan(request):
 """
 
 
+@login_required
+def inventory_export(request, dataset, fmt):
+    """Stream a pantry dataset as a CSV or JSON Lines download."""
+    if dataset not in EXPORT_FIELDS or fmt not in CONTENT_TYPES:
+        raise Http404("Unknown export.")
+
+    response = StreamingHttpResponse(
+        export_lines(dataset, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    filename = f"pantry-{dataset}-{timezone.now():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def alerts_dashboard(request):
     """
     Show all active alerts:
-    - Items expiring within 7 days
-    - Items out of stock (quantity == 0)
+    - Items expiring within their expiry_alert_days window
+    - Items out of stock (total quantity == 0)
     - Items below min_stock_level (low stock)
+    - Items forecast to run out within RUN_OUT_ALERT_DAYS
+
+    Alerts are computed per item in a single grouped query, so the page cost
+    does not grow with the number of stock rows.
     """
     today = timezone.now().date()
-    expiry_threshold = today + timedelta(days=7)
-
-    # 1. Expiring Soon (not expired yet, within 7 days)
-    expiring_soon = (
-        Stock.objects.filter(
-            expiry_date__gte=today, expiry_date__lte=expiry_threshold, quantity__gt=0
-        )
-        .select_related("item", "storage_unit")
-        .order_by("expiry_date")
-    )
-
-    # 2. Out of Stock (quantity == 0)
-    out_of_stock = (
-        PantryItem.objects.filter(stocks__quantity=0)
-        .distinct()
-        .prefetch_related("stocks__storage_unit")
-    )
-
-    # 3. Low Stock (quantity > 0 but below min_stock_level)
-    low_stock = (
-        PantryItem.objects.exclude(
-            stocks__quantity__gte=F("min_stock_level")  # quantity >= min_stock_level
-        )
-        .exclude(stocks__quantity=0)  # already covered above
-        .distinct()
-        .prefetch_related("stocks__storage_unit")
-    )
+    alerts = get_alerts(today=today)
 
     context = {
-        "expiring_soon": expiring_soon,
-        "out_of_stock": out_of_stock,
-        "low_stock": low_stock,
+        "expiring_soon": alerts[ALERT_EXPIRING],
+        "out_of_stock": alerts[ALERT_OUT],
+        "low_stock": alerts[ALERT_LOW],
+        "running_out": alerts[ALERT_RUNNING_OUT],
+        "run_out_days": RUN_OUT_ALERT_DAYS,
         "today": today,
     }
     return render(request, "pantry/alerts_dashboard.html", context)
+
+
+@login_required
+def pantry_search(request):
+    """Search items, categories, locations and batch numbers via the index."""
+    query = request.GET.get("q", "")
+    category = request.GET.get("category", "")
+    storage_unit = request.GET.get("unit", "")
+    search = search_pantry(query, category=category, storage_unit=storage_unit)
+    return render(
+        request,
+        "pantry/search.html",
+        {
+            "query": query,
+            "category": category,
+            "storage_unit": storage_unit,
+            "search": search,
+        },
+    )
@@ -0,0 +1,275 @@
+"""
+Bulk recipe import from JSON, JSON Lines, CSV and Markdown files.
+
+Files are read in bounded slices (JSON Lines and CSV lazily, a slice of
+records at a time) and the slices parsed in a process pool (see
+recipe.parsers), a bounded number ahead of the writer, so memory stays flat
+however many files a run covers and however large they are.
+Parsed recipes are written in batches: ingredients are resolved through an
+in-memory name -> Ingredient id map, new ones created with one
+bulk_create(ignore_conflicts=True), then each target table gets one
+bulk_create per batch.
+
+Every batch also advances the run's ImportCheckpoint in the same
+transaction, so an interrupted run can be resumed where it stopped; its
+offset counts records within the file, so a resumed run skips straight
+past them without parsing them.
+"""
+
+import csv
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import F
+
+from meals.models import Ingredient
+from meals.models import Recipe as MealRecipe
+from meals.suggestions import invalidate_recipe_matrix
+from pantry.search_queue import queue_index_updates
+
+from .models import ImportCheckpoint, Recipe
+from .parsers import SUFFIXES, parse_slice, read_slices
+
+BATCH_SIZE = 1000
+TARGETS = ("recipe", "meals")
+# Parsed slices waiting for the writer, per worker
+SLICES_AHEAD = 4
+# What a malformed or unreadable file raises from read_slices or parse_slice
+PARSE_ERRORS = (OSError, ValueError, KeyError, TypeError, csv.Error)
+
+_NAME_MAX_LENGTH = Recipe._meta.get_field("name").max_length
+_TITLE_MAX_LENGTH = MealRecipe._meta.get_field("title").max_length
+
+
+class RecipeImportError(ValueError):
+    pass
+
+
+def discover_files(paths):
+    """Return the importable files under ``paths``, sorted, as absolute paths."""
+    found = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            candidates = (p for p in path.rglob("*") if p.is_file())
+        elif path.is_file():
+            candidates = [path]
+        else:
+            raise RecipeImportError(f"{path} doesn't exist.")
+        found.update(
+            str(p.resolve()) for p in candidates if p.suffix.lower() in SUFFIXES
+        )
+    return sorted(found)
+
+
+def checkpoint_key(files, targets):
+    """A stable checkpoint key for importing ``files`` into ``targets``."""
+    digest = hashlib.sha256("\n".join([*sorted(targets), *files]).encode())
+    return digest.hexdigest()
+
+
+def _read(path, start):
+    try:
+        yield from read_slices(path, start)
+    except PARSE_ERRORS as e:
+        raise RecipeImportError(f"{path}: {e}") from e
+
+
+def _parse(path, fmt, data):
+    try:
+        return parse_slice(fmt, data)
+    except PARSE_ERRORS as e:
+        raise RecipeImportError(f"{path}: {e}") from e
+
+
+def parsed_slices(files, workers, resume_path="", resume_offset=0):
+    """
+    Yield ``(path, first, recipes, last)`` for each slice of each file, in
+    order, parsed by ``workers`` processes (or in this one when ``workers``
+    is 1). ``recipes`` holds None for unnamed records, so ``first`` plus a
+    recipe's index is its record's offset in the file; ``last`` marks the
+    file's final slice. Reading ``resume_path`` starts at ``resume_offset``.
+    """
+    slices = (
+        (path, first, fmt, data, last)
+        for path in files
+        for first, fmt, data, last in _read(
+            path, resume_offset if path == resume_path else 0
+        )
+    )
+    if workers <= 1:
+        for path, first, fmt, data, last in slices:
+            yield path, first, _parse(path, fmt, data), last
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit(entry):
+            path, first, fmt, data, last = entry
+            pending.append((path, first, last, executor.submit(parse_slice, fmt, data)))
+
+        for entry in slices:
+            submit(entry)
+            if len(pending) >= workers * SLICES_AHEAD:
+                break
+        while pending:
+            path, first, last, future = pending.popleft()
+            try:
+                recipes = future.result()
+            except PARSE_ERRORS as e:
+                raise RecipeImportError(f"{path}: {e}") from e
+            entry = next(slices, None)
+            if entry is not None:
+                submit(entry)
+            yield path, first, recipes, last
+
+
+class RecipeImport:
+    """
+    One import run over ``files`` into the ``targets`` tables.
+
+    Importing into "meals" needs the ``user`` who will own the recipes.
+    ``progress``, if given, is called with the run's stats after each batch.
+    """
+
+    def __init__(
+        self,
+        files,
+        targets=TARGETS,
+        user=None,
+        key=None,
+        batch_size=BATCH_SIZE,
+        workers=None,
+        progress=None,
+    ):
+        if "meals" in targets and user is None:
+            raise RecipeImportError("Importing into meals needs a user.")
+        self.files = sorted(files)
+        self.targets = tuple(targets)
+        self.user = user
+        self.key = key or checkpoint_key(self.files, self.targets)
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        self.ingredient_ids = {}
+        self.stats = {
+            "files": 0,
+            "recipes": 0,
+            "skipped_files": 0,
+            "ingredients_created": 0,
+            "elapsed": 0.0,
+        }
+
+    def load_ingredients(self):
+        for name, pk in Ingredient.objects.values_list("name", "pk").iterator():
+            self.ingredient_ids.setdefault(name.casefold(), pk)
+
+    def resolve_ingredients(self, names):
+        """Map ingredient names to ids, creating the ones not seen before."""
+        missing = sorted({name for name in names if name not in self.ingredient_ids})
+        if missing:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name) for name in missing], ignore_conflicts=True
+            )
+            created = dict(
+                Ingredient.objects.filter(name__in=missing).values_list("name", "pk")
+            )
+            self.ingredient_ids.update(created)
+            self.stats["ingredients_created"] += len(created)
+        return self.ingredient_ids
+
+    @transaction.atomic
+    def write_batch(self, batch, path, offset):
+        """Write ``batch`` and move the checkpoint to ``offset`` in ``path``."""
+        if "recipe" in self.targets:
+            created = Recipe.objects.bulk_create(
+                [
+                    Recipe(
+                        name=data["name"][:_NAME_MAX_LENGTH],
+                        ingredients="\n".join(data["ingredients"]),
+                        instructions=data["instructions"],
+                    )
+                    for data in batch
+                ]
+            )
+            queue_index_updates(Recipe, [recipe.pk for recipe in created])
+
+        if "meals" in self.targets:
+            ids = self.resolve_ingredients(
+                name for data in batch for name in data["ingredient_names"]
+            )
+            created = MealRecipe.objects.bulk_create(
+                [
+                    MealRecipe(
+                        user=self.user,
+                        title=data["name"][:_TITLE_MAX_LENGTH],
+                        description=data["description"],
+                        instructions=data["instructions"],
+                    )
+                    for data in batch
+                ]
+            )
+            Through = MealRecipe.ingredients.through
+            Through.objects.bulk_create(
+                [
+                    Through(recipe_id=recipe.pk, ingredient_id=ids[name])
+                    for recipe, data in zip(created, batch, strict=True)
+                    for name in data["ingredient_names"]
+                ],
+                ignore_conflicts=True,
+            )
+            invalidate_recipe_matrix(self.user.pk)
+
+        ImportCheckpoint.objects.filter(key=self.key).update(
+            path=path, offset=offset, recipes=F("recipes") + len(batch)
+        )
+        self.stats["recipes"] += len(batch)
+
+    def run(self):
+        """
+        Import every file not covered by the checkpoint, then delete it.
+        Returns the run's stats.
+        """
+        start = time.monotonic()
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(key=self.key)
+        remaining = [path for path in self.files if path >= checkpoint.path]
+        self.stats["skipped_files"] = len(self.files) - len(remaining)
+        if "meals" in self.targets:
+            self.load_ingredients()
+
+        batch = []
+        position = None
+        for path, first, recipes, last in parsed_slices(
+            remaining, self.workers, checkpoint.path, checkpoint.offset
+        ):
+            skip = checkpoint.offset if path == checkpoint.path else 0
+            for offset, recipe in enumerate(recipes, first + 1):
+                if offset <= skip or recipe is None:
+                    continue
+                batch.append(recipe)
+                position = (path, offset)
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch, *position)
+                    batch = []
+                    self.report(start)
+            if last:
+                self.stats["files"] += 1
+        if batch:
+            self.write_batch(batch, *position)
+        ImportCheckpoint.objects.filter(key=self.key).delete()
+        self.report(start)
+        return self.stats
+
+    def report(self, start):
+        self.stats["elapsed"] = time.monotonic() - start
+        if self.progress:
+            self.progress(self.stats)
+
+
+def throughput(stats):
+    """Recipes written per second, from RecipeImport stats."""
+    return stats["recipes"] / stats["elapsed"] if stats["elapsed"] else 0.0
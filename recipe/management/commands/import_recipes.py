@@ -0,0 +1,96 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import (
+    BATCH_SIZE,
+    TARGETS,
+    RecipeImport,
+    RecipeImportError,
+    discover_files,
+    throughput,
+)
+from recipe.models import ImportCheckpoint
+
+# Seconds between progress lines
+REPORT_EVERY = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import recipes from JSON, JSON Lines, CSV and Markdown files or "
+        "directories. Re-running the same import resumes from its checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+        parser.add_argument(
+            "--into",
+            choices=[*TARGETS, "both"],
+            default="both",
+            help="Import into recipe.Recipe, meals.Recipe or both (the default).",
+        )
+        parser.add_argument(
+            "--user", help="Username to own the imported meals recipes."
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Parser processes (defaults to the number of CPUs).",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore any checkpoint and import everything again.",
+        )
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options["into"] == "both" else (options["into"],)
+        user = None
+        if "meals" in targets:
+            if not options["user"]:
+                raise CommandError("--user is needed to import into meals.")
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist as e:
+                raise CommandError(f"No user named {options['user']!r}.") from e
+
+        last_report = time.monotonic()
+
+        def progress(stats):
+            nonlocal last_report
+            if time.monotonic() - last_report >= REPORT_EVERY:
+                last_report = time.monotonic()
+                self.stdout.write(
+                    f"{stats['recipes']} recipes from {stats['files']} files "
+                    f"({throughput(stats):.0f}/s)"
+                )
+
+        try:
+            files = discover_files(options["paths"])
+            run = RecipeImport(
+                files,
+                targets=targets,
+                user=user,
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                progress=progress,
+            )
+            if options["restart"]:
+                ImportCheckpoint.objects.filter(key=run.key).delete()
+            elif ImportCheckpoint.objects.filter(key=run.key).exists():
+                self.stdout.write("Resuming from the last checkpoint.")
+            stats = run.run()
+        except RecipeImportError as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {stats['recipes']} recipes from {stats['files']} files "
+                f"({stats['skipped_files']} already done, "
+                f"{stats['ingredients_created']} new ingredients) "
+                f"in {stats['elapsed']:.1f}s, {throughput(stats):.0f} recipes/s."
+            )
+        )
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-17 08:17
+
+from django.db import migrations
+
+SEARCH_CONFIG = "english"
+
+
+def add_search_vector(apps, schema_editor):
+    """PostgreSQL only: generated, weighted tsvector column with a GIN index."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"""
+        ALTER TABLE recipe_recipe ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A')
+            || setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(ingredients, '')), 'B'
+            )
+            || setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(instructions, '')), 'C'
+            )
+        ) STORED
+        """
+    )
+    schema_editor.execute(
+        "CREATE INDEX recipe_search_vector_idx ON recipe_recipe"
+        " USING GIN (search_vector)"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("ALTER TABLE recipe_recipe DROP COLUMN search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipe", "0001_initial"),
+    ]
+
+    operations = [
+        # The composite B-tree over three TextFields can't serve text search
+        migrations.RemoveIndex(
+            model_name="recipe",
+            name="recipe_reci_name_4add7a_idx",
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -2,12 +2,39 @@ from django.db import models
 
 
 class Recipe(models.Model):
+    """
+    A recipe with free-text ingredients and instructions.
+
+    On PostgreSQL the table also has a ``search_vector`` tsvector column,
+    generated by the database from all three fields and GIN-indexed (see
+    migration 0002). It isn't a model field because SQLite has no
+    equivalent; recipe.search reads it with RawSQL.
+    """
+
     name = models.CharField(max_length=200)
     ingredients = models.TextField()
     instructions = models.TextField()
 
-    class Meta:
-        indexes = [models.Index(fields=["name", "ingredients", "instructions"])]
-
     def __str__(self):
         return self.name
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a bulk recipe import (see recipe.importer).
+
+    Files are imported in sorted path order, so ``path`` and ``offset``
+    (records of that file already written or skipped) mark how far a run
+    got. The row
+    is updated in the same transaction as each batch it covers, so resuming
+    never writes a recipe twice.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=500, blank=True)
+    offset = models.PositiveIntegerField(default=0)
+    recipes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.path or 'not started'} @ {self.offset}"
@@ -0,0 +1,232 @@
+"""
+Recipe file parsers for the bulk importer (recipe.importer).
+
+Plain functions with no Django imports, so they run in worker processes.
+parse_file() returns a list of recipe dicts:
+
+    {"name", "description", "ingredients", "ingredient_names", "instructions"}
+
+where ``ingredients`` are the lines as written ("2 cups plain flour,
+sifted") and ``ingredient_names`` their normalized names ("plain flour").
+
+For large imports, read_slices() reads JSON Lines and CSV files lazily, a
+bounded number of records at a time, and parse_slice() turns each slice
+into recipes, so no whole file is ever held in memory.
+"""
+
+import csv
+import io
+import itertools
+import json
+import re
+from pathlib import Path
+
+SUFFIXES = {
+    ".json": "json",
+    ".jsonl": "jsonl",
+    ".csv": "csv",
+    ".md": "markdown",
+    ".markdown": "markdown",
+}
+# Formats read_slices() can split into records before parsing
+STREAMED_FORMATS = frozenset(["jsonl", "csv"])
+SLICE_SIZE = 1000
+INGREDIENT_NAME_MAX_LENGTH = 100
+
+UNITS = frozenset(
+    """
+    c can cans clove cloves cup cups dash g gram grams handful kg l lb lbs
+    litre litres liter liters ml oz ounce ounces pinch pound pounds slice slices tbsp
+    tablespoon tablespoons tin tins tsp teaspoon teaspoons
+    """.split()
+)
+_QUANTITY = re.compile(r"^[\d½⅓⅔¼¾⅛.,/\-–x×]+$")
+_PARENTHETICAL = re.compile(r"\(.*?\)")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_INGREDIENT_SEPARATORS = re.compile(r"[\n;]")
+
+INGREDIENT_HEADINGS = frozenset(["ingredients"])
+INSTRUCTION_HEADINGS = frozenset(["instructions", "method", "directions", "steps"])
+
+
+def ingredient_name(line):
+    """Normalize an ingredient line: "2 cups plain flour, sifted" -> "plain flour"."""
+    text = _PARENTHETICAL.sub(" ", line.casefold()).split(",")[0]
+    words = text.split()
+    while words and (_QUANTITY.match(words[0]) or words[0].rstrip(".") in UNITS):
+        words.pop(0)
+    if words and words[0] == "of":
+        words.pop(0)
+    return " ".join(words)[:INGREDIENT_NAME_MAX_LENGTH].strip()
+
+
+def _lines(value):
+    if isinstance(value, list):
+        return [str(line).strip() for line in value if str(line).strip()]
+    return [
+        line.strip()
+        for line in _INGREDIENT_SEPARATORS.split(value or "")
+        if line.strip()
+    ]
+
+
+def _text(value):
+    if isinstance(value, list):
+        return "\n".join(str(step).strip() for step in value)
+    return (value or "").strip()
+
+
+def make_recipe(name, ingredients, instructions="", description=""):
+    """Build a recipe dict, or return None if it has no name."""
+    name = (name or "").strip()
+    if not name:
+        return None
+    names = []
+    for line in ingredients:
+        normalized = ingredient_name(line)
+        if normalized and normalized not in names:
+            names.append(normalized)
+    return {
+        "name": name,
+        "description": description.strip(),
+        "ingredients": ingredients,
+        "ingredient_names": names,
+        "instructions": instructions,
+    }
+
+
+def recipe_from_mapping(data):
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a recipe object, got {type(data).__name__}")
+    return make_recipe(
+        data.get("name") or data.get("title"),
+        _lines(data.get("ingredients")),
+        _text(data.get("instructions")),
+        _text(data.get("description")),
+    )
+
+
+def parse_json(text):
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("recipes", [data])
+    return [recipe_from_mapping(item) for item in data]
+
+
+def parse_jsonl(text):
+    return [
+        recipe_from_mapping(json.loads(line))
+        for line in text.splitlines()
+        if line.strip()
+    ]
+
+
+def parse_csv(text):
+    return [recipe_from_mapping(row) for row in csv.DictReader(io.StringIO(text))]
+
+
+def parse_markdown(text):
+    """
+    Parse one or more recipes, each starting with a "# Title" heading.
+
+    Text before the first "##" heading is the description; list items under
+    "## Ingredients" are the ingredients, and the body of "## Instructions"
+    (or Method, Directions, Steps) the instructions.
+    """
+    recipes = []
+    current = None
+    section = None
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("# "):
+            current = {
+                "name": stripped[2:],
+                "description": [],
+                "ingredients": [],
+                "instructions": [],
+            }
+            recipes.append(current)
+            section = "description"
+        elif current is None:
+            continue
+        elif stripped.startswith("## "):
+            heading = stripped[3:].strip().casefold()
+            if heading in INGREDIENT_HEADINGS:
+                section = "ingredients"
+            elif heading in INSTRUCTION_HEADINGS:
+                section = "instructions"
+            else:
+                section = None
+        elif section == "ingredients":
+            if stripped:
+                current["ingredients"].append(_LIST_ITEM.sub("", stripped))
+        elif section:
+            current[section].append(line)
+    return [
+        make_recipe(
+            recipe["name"],
+            recipe["ingredients"],
+            "\n".join(recipe["instructions"]).strip(),
+            "\n".join(recipe["description"]),
+        )
+        for recipe in recipes
+    ]
+
+
+PARSERS = {
+    "json": parse_json,
+    "jsonl": parse_jsonl,
+    "csv": parse_csv,
+    "markdown": parse_markdown,
+}
+
+
+def read_slices(path, start=0, size=None):
+    """
+    Yield ``(first, fmt, data, last)`` slices of a recipe file for
+    parse_slice(), where ``first`` is the index within the file of the
+    slice's first record and ``last`` marks the file's final slice.
+
+    JSON Lines and CSV files are read lazily, ``size`` (SLICE_SIZE) records
+    at a time, after skipping their first ``start`` records. JSON and Markdown files
+    can't be split before parsing, so they come as one slice of the whole
+    text, starting at record 0.
+    """
+    size = size or SLICE_SIZE
+    fmt = SUFFIXES[Path(path).suffix.lower()]
+    if fmt not in STREAMED_FORMATS:
+        yield 0, fmt, Path(path).read_text(encoding="utf-8"), True
+        return
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            records = (line for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        records = itertools.islice(records, start, None)
+        first = start
+        while True:
+            data = list(itertools.islice(records, size))
+            last = len(data) < size
+            yield first, fmt, data, last
+            if last:
+                return
+            first += size
+
+
+def parse_slice(fmt, data):
+    """Parse a read_slices() slice; unnamed recipes come back as None."""
+    if fmt == "jsonl":
+        return [recipe_from_mapping(json.loads(line)) for line in data]
+    if fmt == "csv":
+        return [recipe_from_mapping(row) for row in data]
+    return PARSERS[fmt](data)
+
+
+def parse_file(path):
+    """Parse a recipe file by its extension; unnamed recipes are dropped."""
+    return [
+        recipe
+        for _, fmt, data, _ in read_slices(path)
+        for recipe in parse_slice(fmt, data)
+        if recipe is not None
+    ]
@@ -0,0 +1,96 @@
+"""
+Ranked full-text recipe search.
+
+PostgreSQL queries the generated ``search_vector`` column (GIN-indexed, see
+migration 0002) with websearch syntax, ranking with SearchRank and
+highlighting with SearchHeadline. Other databases fall back to the Haystack
+Whoosh index (recipe.search_indexes).
+"""
+
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import connection
+from django.db.models import TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from haystack.query import SearchQuerySet
+
+from .models import Recipe
+
+SEARCH_CONFIG = "english"
+SEARCH_RESULT_LIMIT = 50
+
+# Headline delimiters that can't occur in recipe text; swapped for <mark>
+# after the rest of the snippet has been escaped
+_START, _STOP = "\x02", "\x03"
+
+
+def search_recipes(query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Return up to ``limit`` Recipes matching ``query``, best match first.
+
+    Each recipe gets a ``rank`` (higher is better) and a ``snippet`` of
+    matching ingredient/instruction text with the terms in <mark> tags.
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+    if connection.vendor == "postgresql":
+        return _search_postgres(query, limit)
+    return _search_index(query, limit)
+
+
+def _search_postgres(query, limit):
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+    # Constant column reference, no user input reaches the SQL
+    vector = RawSQL(  # noqa: S611
+        f"{Recipe._meta.db_table}.search_vector", [], output_field=SearchVectorField()
+    )
+    recipes = list(
+        Recipe.objects.annotate(search=vector)
+        .filter(search=search_query)
+        .annotate(
+            rank=SearchRank(vector, search_query),
+            headline=SearchHeadline(
+                Concat(
+                    "ingredients", Value("\n"), "instructions", output_field=TextField()
+                ),
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=_START,
+                stop_sel=_STOP,
+                max_fragments=2,
+                fragment_delimiter=" … ",
+            ),
+        )
+        .order_by("-rank", "name")[:limit]
+    )
+    for recipe in recipes:
+        recipe.snippet = mark_safe(  # noqa: S308 - escaped before marking up
+            escape(recipe.headline).replace(_START, "<mark>").replace(_STOP, "</mark>")
+        )
+    return recipes
+
+
+def _search_index(query, limit):
+    results = list(
+        SearchQuerySet().models(Recipe).auto_query(query).highlight()[:limit]
+    )
+    recipes = Recipe.objects.in_bulk([result.pk for result in results])
+    found = []
+    for result in results:
+        recipe = recipes.get(int(result.pk))
+        if recipe is None:
+            continue  # Deleted, index update still queued
+        recipe.rank = result.score
+        # Whoosh escapes the text itself and wraps terms in highlight spans
+        highlighted = (result.highlighted or {}).get("text") or [""]
+        recipe.snippet = mark_safe(highlighted[0])  # noqa: S308
+        found.append(recipe)
+    return found
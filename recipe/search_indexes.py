@@ -0,0 +1,13 @@
+from haystack import indexes
+
+from .models import Recipe
+
+
+class RecipeIndex(indexes.SearchIndex, indexes.Indexable):
+    """Whoosh fallback for recipe.search where PostgreSQL isn't available."""
+
+    text = indexes.CharField(document=True, use_template=True)
+    name = indexes.CharField(model_attr="name")
+
+    def get_model(self):
+        return Recipe
@@ -1 +1,161 @@
-# Create your tests here.
+import json
+import re
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from meals.models import Ingredient
+from meals.models import Recipe as MealRecipe
+from pantry.search_queue import process_index_queue
+
+from .importer import RecipeImport, RecipeImportError, discover_files
+from .models import ImportCheckpoint, Recipe
+from .parsers import ingredient_name, parse_slice, read_slices
+from .search import search_recipes
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_matches_first_and_highlights(
+    client, django_capture_on_commit_callbacks
+):
+    Recipe.objects.bulk_create(
+        [
+            Recipe(
+                name="Tomato soup",
+                ingredients="tomatoes, stock, basil",
+                instructions="Simmer and blend.",
+            ),
+            Recipe(
+                name="Bruschetta",
+                ingredients="bread, garlic",
+                instructions="Top the toast with chopped tomatoes.",
+            ),
+            Recipe(name="Pancakes", ingredients="flour, eggs", instructions="Fry."),
+        ]
+    )
+    # bulk_create skips the signal processor, so queue the documents here
+    with django_capture_on_commit_callbacks(execute=True):
+        for recipe in Recipe.objects.all():
+            recipe.save()
+    process_index_queue()
+
+    results = search_recipes("tomato")
+    assert [recipe.name for recipe in results] == ["Tomato soup", "Bruschetta"]
+    assert results[0].rank >= results[1].rank
+    assert "tomato" in results[1].snippet.lower()
+    assert search_recipes("  ") == []
+
+    response = client.get(reverse("recipe:search_recipes"), {"q": "tomato"})
+    assert response.status_code == 200
+    assert list(response.context["recipes"]) == results
+    assert client.get(reverse("recipe:search_recipes")).status_code == 200
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.mark.django_db
+def test_import_recipes_resumes_from_checkpoint(tmp_path):
+    user = User.objects.create_user("cook")
+    Ingredient.objects.create(name="Eggs")
+    (tmp_path / "a.json").write_text(
+        json.dumps(
+            [
+                {"name": "Omelette", "ingredients": ["3 eggs", "1 tbsp butter"]},
+                {"title": "Toast", "ingredients": "2 slices bread; butter"},
+                {"description": "no name"},
+            ]
+        )
+    )
+    (tmp_path / "b.csv").write_text(
+        "name,ingredients,instructions\nPancakes,200 g flour;2 eggs;milk,Fry.\n"
+    )
+    (tmp_path / "c.md").write_text(
+        "# Porridge\nWarming.\n\n## Ingredients\n- 1 cup oats (rolled)\n"
+        "- 2 cups milk, warmed\n\n## Method\nSimmer for 5 minutes.\n"
+    )
+    (tmp_path / "notes.txt").write_text("not a recipe")
+    files = discover_files([tmp_path])
+    assert len(files) == 3
+
+    def stop_after_first_batch(stats):
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        RecipeImport(
+            files, user=user, batch_size=3, workers=2, progress=stop_after_first_batch
+        ).run()
+    checkpoint = ImportCheckpoint.objects.get()
+    assert (checkpoint.path, checkpoint.offset) == (files[1], 1)
+    assert Recipe.objects.count() == MealRecipe.objects.count() == 3
+
+    stats = RecipeImport(files, user=user, batch_size=3, workers=1).run()
+    assert (stats["recipes"], stats["skipped_files"]) == (1, 1)
+    assert not ImportCheckpoint.objects.exists()
+    assert sorted(Recipe.objects.values_list("name", flat=True)) == [
+        "Omelette",
+        "Pancakes",
+        "Porridge",
+        "Toast",
+    ]
+    porridge = MealRecipe.objects.get(title="Porridge")
+    assert porridge.description == "Warming."
+    assert porridge.instructions == "Simmer for 5 minutes."
+    assert sorted(porridge.ingredients.values_list("name", flat=True)) == [
+        "milk",
+        "oats",
+    ]
+    # Existing ingredients are matched regardless of case
+    assert Ingredient.objects.filter(name__iexact="eggs").count() == 1
+    assert MealRecipe.objects.get(title="Pancakes").ingredients.count() == 3
+    assert ingredient_name("1 1/2 cups of plain flour, sifted") == "plain flour"
+
+
+@pytest.mark.django_db
+def test_import_reads_large_files_in_slices(tmp_path, monkeypatch):
+    path = tmp_path / "big.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps({"name": f"Soup {n}"} if n != 2 else {"description": "x"})
+            for n in range(7)
+        )
+    )
+    slices = list(read_slices(path, start=1, size=3))
+    assert [(first, len(data), last) for first, _, data, last in slices] == [
+        (1, 3, False),
+        (4, 3, False),
+        (7, 0, True),
+    ]
+    assert parse_slice("jsonl", slices[0][2])[1] is None
+
+    monkeypatch.setattr("recipe.parsers.SLICE_SIZE", 2)
+    files = [str(path)]
+
+    def stop_after_first_batch(stats):
+        raise Interrupted
+
+    with pytest.raises(Interrupted):
+        RecipeImport(
+            files, targets=["recipe"], batch_size=3, progress=stop_after_first_batch
+        ).run()
+    # The unnamed record counts towards the offset within the file
+    assert ImportCheckpoint.objects.get().offset == 4
+
+    stats = RecipeImport(files, targets=["recipe"], batch_size=3, workers=2).run()
+    assert stats["recipes"] == 3
+    assert stats["files"] == 1
+    assert Recipe.objects.count() == 6
+
+
+@pytest.mark.django_db
+def test_import_reports_malformed_files(tmp_path):
+    (tmp_path / "numbers.json").write_text("[1, 2]")
+    (tmp_path / "huge.csv").write_text(
+        'name,ingredients\nSoup,"' + "x" * 200000 + '"\n'
+    )
+    for path in discover_files([tmp_path]):
+        with pytest.raises(RecipeImportError, match=re.escape(path)):
+            RecipeImport([path], targets=["recipe"], workers=1).run()
+    assert not Recipe.objects.exists()
@@ -3,6 +3,7 @@ from django.shortcuts import redirect, render
 
 from .forms import RecipeForm
 from .models import Recipe
+from .search import search_recipes as find_recipes
 
 
 def add_recipe(request):
@@ -41,8 +42,8 @@ def delete_recipe(request, recipe_id):
 
 
 def search_recipes(request):
-    query = request.GET.get("q")
-    recipes = Recipe.objects.filter(name__icontains=query)
+    query = request.GET.get("q", "").strip()
+    recipes = find_recipes(query)
     return render(
         request, "recipe/search_recipes.html", {"recipes": recipes, "query": query}
     )
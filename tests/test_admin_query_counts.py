@@ -0,0 +1,118 @@
+"""
+Changelist query counts must not grow with the number of rows listed.
+
+Aggregate and related columns are declared through
+config.admin_mixins.AnnotatedListMixin, so each changelist is rendered
+from a fixed number of queries whether it shows 1 row or a full page.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from github_feed.models import Commit, Repository
+from pantry.models import ItemCategory, Location, PantryItem, Stock, StorageUnit
+
+
+def add_locations(user, start, count):
+    locations = Location.objects.bulk_create(
+        Location(name=f"Location {n}", created_by=user)
+        for n in range(start, start + count)
+    )
+    StorageUnit.objects.bulk_create(
+        StorageUnit(name="Shelf", unit_type="pantry", location=location)
+        for location in locations
+    )
+
+
+def add_storage_units(user, start, count):
+    location = Location.objects.create(name=f"Location {start}", created_by=user)
+    item = PantryItem.objects.create(name=f"Item {start}", created_by=user)
+    units = StorageUnit.objects.bulk_create(
+        StorageUnit(name=f"Unit {n}", unit_type="pantry", location=location)
+        for n in range(start, start + count)
+    )
+    Stock.objects.bulk_create(
+        Stock(
+            item=item,
+            storage_unit=unit,
+            quantity=2,
+            expiry_date=date.today() + timedelta(days=3),
+        )
+        for unit in units
+    )
+
+
+def add_pantry_items(user, start, count):
+    category, _ = ItemCategory.objects.get_or_create(name="Dairy")
+    unit = StorageUnit.objects.create(
+        name=f"Unit {start}",
+        unit_type="refrigerator",
+        location=Location.objects.create(name=f"Location {start}", created_by=user),
+    )
+    items = PantryItem.objects.bulk_create(
+        PantryItem(name=f"Item {n}", category=category, created_by=user)
+        for n in range(start, start + count)
+    )
+    Stock.objects.bulk_create(
+        Stock(item=item, storage_unit=unit, quantity=1) for item in items
+    )
+
+
+def add_item_categories(user, start, count):
+    categories = ItemCategory.objects.bulk_create(
+        ItemCategory(name=f"Category {n}") for n in range(start, start + count)
+    )
+    PantryItem.objects.bulk_create(
+        PantryItem(name=f"Item {n}", category=category, created_by=user)
+        for n, category in enumerate(categories, start)
+    )
+
+
+def add_commits(user, start, count):
+    repository = Repository.objects.create(
+        repo_id=start, name=f"repo-{start}", owner="me", html_url="https://x.test"
+    )
+    Commit.objects.bulk_create(
+        Commit(
+            sha=f"{n:040x}",
+            repository=repository,
+            message="Commit",
+            author_name="Me",
+            author_email="me@example.com",
+            date=timezone.now(),
+            html_url="https://x.test",
+        )
+        for n in range(start, start + count)
+    )
+
+
+def changelist_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize(
+    ("url", "add_rows"),
+    [
+        ("/admin/pantry/location/", add_locations),
+        ("/admin/pantry/storageunit/", add_storage_units),
+        ("/admin/pantry/pantryitem/", add_pantry_items),
+        ("/admin/pantry/itemcategory/", add_item_categories),
+        ("/admin/github_feed/commit/", add_commits),
+    ],
+)
+def test_changelist_query_count_is_constant(admin_client, admin_user, url, add_rows):
+    add_rows(admin_user, 0, 1)
+    changelist_queries(admin_client, url)  # Warm caches (sessions, rollups)
+    single = changelist_queries(admin_client, url)
+
+    add_rows(admin_user, 1, 499)
+    changelist_queries(admin_client, url)
+    assert changelist_queries(admin_client, url) == single
+    assert changelist_queries(admin_client, f"{url}?o=2") == single